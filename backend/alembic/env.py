@@ -10,7 +10,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from app.core.config import settings
 from app.core.database import Base
-from app.models import user, goal, habit, habit_version, habit_completion  # Import all models here
+from app.models import user, goal, habit, habit_version, habit_completion, habit_week_count, user_change_counter, habit_streak, goal_week_rollup, completion_week_revision  # Import all models here
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
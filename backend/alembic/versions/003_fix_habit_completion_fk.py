@@ -1,7 +1,7 @@
 """fix habit completion foreign key to prevent cascade deletion
 
 Revision ID: 003_fix_habit_completion_fk
-Revises: 002_add_habit_version_description
+Revises: 002_add_description
 Create Date: 2025-01-02 00:30:00.000000
 
 """
@@ -11,7 +11,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision = '003_fix_habit_completion_fk'
-down_revision = '002_add_habit_version_description'
+down_revision = '002_add_description'
 branch_labels = None
 depends_on = None
 
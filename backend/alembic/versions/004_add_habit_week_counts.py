@@ -0,0 +1,44 @@
+"""add materialized habit_week_counts
+
+Revision ID: 004_add_habit_week_counts
+Revises: 003_fix_habit_completion_fk
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '004_add_habit_week_counts'
+down_revision = '003_fix_habit_completion_fk'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'habit_week_counts',
+        sa.Column('user_id', postgresql.UUID(as_uuid=False), nullable=False),
+        sa.Column('habit_id', postgresql.UUID(as_uuid=False), nullable=False),
+        sa.Column('week_start', sa.Date(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['habit_id'], ['habits.id'], ),
+        sa.PrimaryKeyConstraint('user_id', 'habit_id', 'week_start'),
+        sa.CheckConstraint('count >= 0', name='check_week_count_non_negative'),
+    )
+
+    # Backfill from existing history; weeks start on Monday, which matches
+    # date_trunc('week', ...)
+    op.execute("""
+        INSERT INTO habit_week_counts (user_id, habit_id, week_start, count)
+        SELECT user_id, habit_id, date_trunc('week', date)::date, count(*)
+        FROM habit_completions
+        GROUP BY user_id, habit_id, date_trunc('week', date)::date
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('habit_week_counts')
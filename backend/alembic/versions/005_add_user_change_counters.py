@@ -0,0 +1,33 @@
+"""add user_change_counters for conditional GETs
+
+Revision ID: 005_add_user_change_counters
+Revises: 004_add_habit_week_counts
+Create Date: 2026-10-17 00:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '005_add_user_change_counters'
+down_revision = '004_add_habit_week_counts'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_change_counters',
+        sa.Column('user_id', postgresql.UUID(as_uuid=False), nullable=False),
+        sa.Column('habits', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('goals', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('completions', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_change_counters')
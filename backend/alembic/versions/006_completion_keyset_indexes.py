@@ -0,0 +1,43 @@
+"""completion keyset pagination indexes
+
+Revision ID: 006_completion_keyset_indexes
+Revises: 005_add_user_change_counters
+Create Date: 2026-10-17 00:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006_completion_keyset_indexes'
+down_revision = '005_add_user_change_counters'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Full sort key of the completion listings, so a keyset seek on
+    # (date, created_at, id) is an index range scan. These extend the
+    # (user_id, date) and (habit_id, date) indexes, which they replace.
+    op.create_index(
+        'idx_completions_user_keyset',
+        'habit_completions',
+        ['user_id', sa.text('date DESC'), sa.text('created_at DESC'), sa.text('id DESC')],
+        unique=False,
+    )
+    op.create_index(
+        'idx_completions_habit_keyset',
+        'habit_completions',
+        ['habit_id', sa.text('date DESC'), sa.text('created_at DESC'), sa.text('id DESC')],
+        unique=False,
+    )
+    op.drop_index('idx_completions_user_date', table_name='habit_completions')
+    op.drop_index('idx_completions_habit_date', table_name='habit_completions')
+
+
+def downgrade() -> None:
+    op.create_index('idx_completions_habit_date', 'habit_completions', ['habit_id', 'date'], unique=False)
+    op.create_index('idx_completions_user_date', 'habit_completions', ['user_id', 'date'], unique=False)
+    op.drop_index('idx_completions_habit_keyset', table_name='habit_completions')
+    op.drop_index('idx_completions_user_keyset', table_name='habit_completions')
@@ -0,0 +1,78 @@
+"""add habit_streaks
+
+Revision ID: 007_add_habit_streaks
+Revises: 006_completion_keyset_indexes
+Create Date: 2026-10-17 00:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '007_add_habit_streaks'
+down_revision = '006_completion_keyset_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'habit_streaks',
+        sa.Column('habit_id', postgresql.UUID(as_uuid=False), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=False), nullable=False),
+        sa.Column('current_streak', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('best_streak', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_qualifying_week', sa.Date(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.ForeignKeyConstraint(['habit_id'], ['habits.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('habit_id'),
+    )
+    op.create_index(op.f('ix_habit_streaks_user_id'), 'habit_streaks', ['user_id'], unique=False)
+
+    # Backfill from the weekly counters; same computation as
+    # streak_service._RECOMPUTE_SQL over every habit
+    op.execute("""
+        WITH qualifying AS (
+            SELECT w.habit_id, w.week_start
+            FROM habit_week_counts w
+            CROSS JOIN LATERAL (
+                SELECT v.weekly_target
+                FROM habit_versions v
+                WHERE v.habit_id = w.habit_id
+                  AND v.effective_week_start <= w.week_start
+                ORDER BY v.effective_week_start DESC, v.created_at DESC
+                LIMIT 1
+            ) v
+            WHERE w.count >= v.weekly_target
+        ),
+        runs AS (
+            SELECT habit_id, count(*) AS length, max(week_start) AS last_week
+            FROM (
+                SELECT habit_id, week_start,
+                       week_start - 7 * row_number() OVER (PARTITION BY habit_id ORDER BY week_start)::int AS island
+                FROM qualifying
+            ) islands
+            GROUP BY habit_id, island
+        ),
+        summary AS (
+            SELECT DISTINCT ON (habit_id)
+                habit_id,
+                length AS current_streak,
+                max(length) OVER (PARTITION BY habit_id) AS best_streak,
+                last_week
+            FROM runs
+            ORDER BY habit_id, last_week DESC
+        )
+        INSERT INTO habit_streaks (habit_id, user_id, current_streak, best_streak, last_qualifying_week, updated_at)
+        SELECT h.id, h.user_id, coalesce(r.current_streak, 0), coalesce(r.best_streak, 0), r.last_week, now()
+        FROM habits h
+        LEFT JOIN summary r ON r.habit_id = h.id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_habit_streaks_user_id'), table_name='habit_streaks')
+    op.drop_table('habit_streaks')
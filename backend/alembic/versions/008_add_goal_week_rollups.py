@@ -0,0 +1,43 @@
+"""add goal_week_rollups
+
+Revision ID: 008_add_goal_week_rollups
+Revises: 007_add_habit_streaks
+Create Date: 2026-10-17 00:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '008_add_goal_week_rollups'
+down_revision = '007_add_habit_streaks'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'goal_week_rollups',
+        sa.Column('goal_id', postgresql.UUID(as_uuid=False), nullable=False),
+        sa.Column('week_start', sa.Date(), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=False), nullable=False),
+        sa.Column('target', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('achieved', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['goal_id'], ['goals.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('goal_id', 'week_start'),
+    )
+    op.create_index(op.f('ix_goal_week_rollups_user_id'), 'goal_week_rollups', ['user_id'], unique=False)
+    # Rollup refreshes look up versions by the goal they link to
+    op.create_index(op.f('ix_habit_versions_linked_goal_id'), 'habit_versions', ['linked_goal_id'], unique=False)
+    # Rows are materialized lazily: readers roll each goal forward from its
+    # first linked week on first access, or run
+    # `python manage.py goal-rollups rebuild` to backfill eagerly
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_habit_versions_linked_goal_id'), table_name='habit_versions')
+    op.drop_index(op.f('ix_goal_week_rollups_user_id'), table_name='goal_week_rollups')
+    op.drop_table('goal_week_rollups')
@@ -0,0 +1,34 @@
+"""add completion_week_revisions for the past-week completion cache
+
+Revision ID: 009_completion_week_revisions
+Revises: 008_add_goal_week_rollups
+Create Date: 2026-10-17 01:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '009_completion_week_revisions'
+down_revision = '008_add_goal_week_rollups'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # No backfill: a missing row reads as revision 0, and nothing is cached
+    # before this table exists
+    op.create_table(
+        'completion_week_revisions',
+        sa.Column('user_id', postgresql.UUID(as_uuid=False), nullable=False),
+        sa.Column('week_start', sa.Date(), nullable=False),
+        sa.Column('revision', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('user_id', 'week_start'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('completion_week_revisions')
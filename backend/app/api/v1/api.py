@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import health, users, goals, habits, completions
+from app.api.v1.endpoints import health, admin, users, goals, habits, completions, export, progress, today
 
 api_router = APIRouter()
 
@@ -8,3 +8,7 @@ api_router.include_router(users.router, prefix="/me", tags=["users"])
 api_router.include_router(goals.router, prefix="/goals", tags=["goals"])
 api_router.include_router(habits.router, prefix="/habits", tags=["habits"])
 api_router.include_router(completions.router, prefix="/completions", tags=["completions"])
+api_router.include_router(export.router, prefix="/export", tags=["export"])
+api_router.include_router(progress.router, prefix="/progress", tags=["progress"])
+api_router.include_router(today.router, prefix="/today", tags=["today"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
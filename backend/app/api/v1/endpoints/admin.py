@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, Query
+from app.core.auth import require_admin
+from app.core.errors import ValidationError
+from app.core.slow_queries import SORT_KEYS, query_log
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/slow-queries")
+async def slow_queries(
+    limit: int = Query(20, ge=1, le=500),
+    sort: str = "total",
+):
+    """
+    Top statement fingerprints of this worker by `sort` (total, p99, p95,
+    calls, max or slow), with call counts, p50/p95/p99 and any captured
+    EXPLAIN plan.
+    """
+    if sort not in SORT_KEYS:
+        raise ValidationError(f"sort must be one of {', '.join(SORT_KEYS)}")
+    return {
+        "since": query_log.started_at,
+        "threshold_ms": query_log.threshold_seconds * 1000,
+        "queries": query_log.top(limit, sort),
+    }
+
+
+@router.delete("/slow-queries")
+async def reset_slow_queries():
+    """Clear this worker's statement statistics"""
+    query_log.reset()
+    return {"ok": True}
@@ -1,42 +1,97 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from datetime import date
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.core.auth import get_current_user
+from app.core.query_stats import query_budget
+from app.core.conditional import check_not_modified
+from app.core.fast_json import records
+from app.core.cache import cached_json, invalidate_user
 from app.models.user import User
 from app.models.habit import Habit
 from app.models.habit_completion import HabitCompletion
-from app.schemas.completion import CompletionCreate, CompletionResponse
+from app.schemas.completion import (
+    CompletionCreate,
+    CompletionResponse,
+    CompletionBatchCreate,
+    CompletionBatchResponse,
+)
 from app.core.errors import (
-    HabitNotFoundError,
-    HabitDeletedError,
-    HabitNotActiveForWeekError,
-    WeeklyTargetAlreadyMetError,
-    TextRequiredError,
     InvalidDateError,
     CompletionNotFoundError,
+    ValidationError,
 )
-from app.utils.validators import (
-    validate_habit_exists_and_owned,
-    validate_habit_active_for_week,
-    validate_weekly_target_not_met,
-    validate_text_required,
+from app.utils.date_utils import get_client_today
+from app.services.completion_week_cache import completion_range_json_async
+from app.services.completion_service import (
+    COMPLETION_ORDER,
+    completion_seek_condition,
+    encode_completion_cursor,
+    create_completion_async,
+    create_completions_batch_async,
+    delete_completion_async,
 )
-from app.utils.date_utils import get_week_range, get_client_today
-from app.services.habit_service import get_active_version
 
 router = APIRouter()
 
+# Response fields in schema order, selected as columns by the list endpoints
+COMPLETION_FIELDS = tuple(CompletionResponse.model_fields)
+_COMPLETION_COLUMNS = tuple(getattr(HabitCompletion, field) for field in COMPLETION_FIELDS)
+
+# Keyset pages report where to continue in this header (the body stays a
+# plain list); absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+async def _fetch_completion_page(
+    db: AsyncSession,
+    response: Response,
+    statement,
+    limit: int | None,
+    cursor: str | None,
+    offset: int = 0,
+):
+    """
+    Run a completion listing in COMPLETION_ORDER, seeking past `cursor`.
+    With a limit, fetches one extra row to learn whether another page
+    exists and sets NEXT_CURSOR_HEADER accordingly.
+    """
+    if cursor:
+        statement = statement.where(completion_seek_condition(cursor))
+    statement = statement.order_by(*COMPLETION_ORDER)
+    if limit is not None:
+        statement = statement.limit(limit + 1).offset(offset)
+
+    rows = (await db.execute(statement)).all()
+
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last = dict(zip(COMPLETION_FIELDS, rows[-1]))
+        response.headers[NEXT_CURSOR_HEADER] = encode_completion_cursor(
+            last["date"], last["created_at"], last["id"]
+        )
 
-@router.get("", response_model=List[CompletionResponse])
+    return rows
+
+
+@router.get("", response_model=List[CompletionResponse], dependencies=[query_budget(5)])
 async def list_completions(
+    request: Request,
+    response: Response,
     start: str = Query(..., pattern=r"^\d{4}-\d{2}-\d{2}$"),
     end: str = Query(..., pattern=r"^\d{4}-\d{2}-\d{2}$"),
-    db: Session = Depends(get_db),
+    limit: int | None = Query(default=None, ge=1, le=1000),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
-    """List completions in a date range"""
+    """
+    List completions in a date range, most recent first.
+    Without `limit` the whole range is returned. With it, the range is
+    paged by keyset: follow the X-Next-Cursor header as `cursor`.
+    """
     try:
         start_date = date.fromisoformat(start)
         end_date = date.fromisoformat(end)
@@ -46,52 +101,94 @@ async def list_completions(
     if start_date > end_date:
         raise InvalidDateError("Start date must be <= end date")
     
-    completions = db.query(HabitCompletion).filter(
-        HabitCompletion.user_id == current_user.id,
-        HabitCompletion.date >= start_date,
-        HabitCompletion.date <= end_date,
-    ).order_by(HabitCompletion.date.desc(), HabitCompletion.created_at.desc()).all()
+    not_modified = await check_not_modified(request, response, db, current_user.id, "completions")
+    if not_modified:
+        return not_modified
+    
+    async def build():
+        if limit is None and cursor is None:
+            # Whole range: past weeks come pre-serialized from the week cache
+            return await completion_range_json_async(db, current_user.id, start_date, end_date)
+
+        # Column tuples straight to JSON bytes; a year of completions spends
+        # more time in ORM loading and response_model validation than in SQL
+        rows = await _fetch_completion_page(
+            db,
+            response,
+            select(*_COMPLETION_COLUMNS).where(
+                HabitCompletion.user_id == current_user.id,
+                HabitCompletion.date >= start_date,
+                HabitCompletion.date <= end_date,
+            ),
+            limit,
+            cursor,
+        )
 
-    return completions
+        return records(COMPLETION_FIELDS, rows)
 
+    return await cached_json(current_user.id, response, build)
 
-@router.get("/habits/{habit_id}/completions", response_model=List[CompletionResponse])
+
+@router.get("/habits/{habit_id}/completions", response_model=List[CompletionResponse], dependencies=[query_budget(4)])
 async def get_habit_completions(
+    request: Request,
+    response: Response,
     habit_id: str,
     limit: int = Query(default=20, ge=1, le=100),
     offset: int = Query(default=0, ge=0),
-    db: Session = Depends(get_db),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     """
     Get completions for a specific habit with pagination.
-    Returns most recent completions first.
+    Returns most recent completions first. Page with `cursor` (from the
+    X-Next-Cursor header) for constant cost per page; `offset` is kept
+    for older clients.
     """
-    # Verify habit belongs to user
-    habit = db.query(Habit).filter(
-        Habit.id == habit_id,
-        Habit.user_id == current_user.id
-    ).first()
+    if cursor and offset:
+        raise ValidationError("Use either cursor or offset, not both")
+
+    # Habit ownership is part of the response (404), so habits count too
+    not_modified = await check_not_modified(
+        request, response, db, current_user.id, "habits", "completions"
+    )
+    if not_modified:
+        return not_modified
+
+    async def build():
+        # Verify habit belongs to user
+        habit_found = await db.scalar(
+            select(Habit.id).where(
+                Habit.id == habit_id,
+                Habit.user_id == current_user.id
+            )
+        )
+
+        if not habit_found:
+            raise HTTPException(status_code=404, detail="Habit not found")
 
-    if not habit:
-        raise HTTPException(status_code=404, detail="Habit not found")
+        rows = await _fetch_completion_page(
+            db,
+            response,
+            select(*_COMPLETION_COLUMNS).where(
+                HabitCompletion.habit_id == habit_id,
+                HabitCompletion.user_id == current_user.id,
+            ),
+            limit,
+            cursor,
+            offset,
+        )
 
-    # Query completions with pagination
-    completions = db.query(HabitCompletion).filter(
-        HabitCompletion.habit_id == habit_id,
-        HabitCompletion.user_id == current_user.id,
-    ).order_by(
-        HabitCompletion.date.desc(),
-        HabitCompletion.created_at.desc()
-    ).limit(limit).offset(offset).all()
+        return records(COMPLETION_FIELDS, rows)
 
-    return completions
+    return await cached_json(current_user.id, response, build)
 
 
 @router.post("", response_model=dict, status_code=201)
 async def create_completion(
     completion_data: CompletionCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     """Create a completion instance (today only)"""
@@ -110,50 +207,77 @@ async def create_completion(
     if completion_date > client_today:
         raise InvalidDateError("Completions cannot be created for future dates")
     
-    # Validate habit exists and is owned
-    is_valid, habit = validate_habit_exists_and_owned(
-        db, completion_data.habit_id, current_user.id
-    )
-    if not is_valid:
-        habit_obj = db.query(Habit).filter(Habit.id == completion_data.habit_id).first()
-        if not habit_obj:
-            raise HabitNotFoundError()
-        if habit_obj.is_deleted:
-            raise HabitDeletedError()
-        raise HabitNotFoundError()
-    
-    # Validate habit is active for the week
-    is_active, version = validate_habit_active_for_week(
-        db, completion_data.habit_id, completion_date
+    # Ownership, active version, weekly target and text checks run in the
+    # same statement as the insert, serialized per habit-week
+    result = await create_completion_async(
+        db,
+        current_user.id,
+        completion_data.habit_id,
+        completion_date,
+        completion_data.text,
     )
-    if not is_active:
-        raise HabitNotActiveForWeekError()
+    error = result.error()
+    if error:
+        await db.rollback()
+        raise error
+
+    await db.commit()
+    await invalidate_user(current_user.id)
     
-    # Validate weekly target not met
-    week_start, week_end = get_week_range(completion_date)
-    can_create = validate_weekly_target_not_met(
-        db, completion_data.habit_id, week_start, week_end, current_user.id
-    )
-    if not can_create:
-        raise WeeklyTargetAlreadyMetError()
+    return {"id": result.completion_id, "remaining": result.remaining}
+
+
+@router.post("/batch", response_model=CompletionBatchResponse)
+async def create_completions_batch(
+    batch: CompletionBatchCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Create many completions at once (offline sync replay).
+    Items are validated like POST /api/completions, applied in order, and
+    reported individually; one rejected item does not fail the batch.
+    Items that do not match CompletionCreate (e.g. an offset out of range)
+    fail the request with 422, before anything is written.
+    """
+    results: list[dict] = [{"index": i} for i in range(len(batch.items))]
+    pending = []
     
-    # Validate text if required
-    is_text_valid, error_msg = validate_text_required(version, completion_data.text)
-    if not is_text_valid:
-        raise TextRequiredError(error_msg or "Text is required")
+    for i, item in enumerate(batch.items):
+        try:
+            completion_date = date.fromisoformat(item.date)
+        except ValueError:
+            error = InvalidDateError("Invalid date format")
+        else:
+            client_today = get_client_today(
+                item.client_timezone,
+                item.client_tz_offset_minutes
+            )
+            error = None
+            if completion_date > client_today:
+                error = InvalidDateError("Completions cannot be created for future dates")
+        
+        if error:
+            results[i].update(error.detail)
+        else:
+            pending.append((i, (item.habit_id, completion_date, item.text)))
     
-    # Create completion
-    completion = HabitCompletion(
-        user_id=current_user.id,
-        habit_id=completion_data.habit_id,
-        date=completion_date,
-        text=completion_data.text.strip() if completion_data.text else None,
+    outcomes = await create_completions_batch_async(
+        db, current_user.id, [entry for _, entry in pending]
     )
-    db.add(completion)
-    db.commit()
-    db.refresh(completion)
+    await db.commit()
+    await invalidate_user(current_user.id)
     
-    return {"id": completion.id}
+    created = 0
+    for (i, _), outcome in zip(pending, outcomes):
+        error = outcome.error()
+        if error:
+            results[i].update(error.detail)
+        else:
+            created += 1
+            results[i].update(id=outcome.completion_id, remaining=outcome.remaining)
+    
+    return {"created": created, "results": results}
 
 
 @router.delete("/{completion_id}", response_model=dict)
@@ -161,21 +285,17 @@ async def delete_completion(
     completion_id: str,
     client_timezone: str | None = None,
     client_tz_offset_minutes: int | None = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     """Delete a completion (today only)"""
-    completion = db.query(HabitCompletion).filter(
-        HabitCompletion.id == completion_id,
-        HabitCompletion.user_id == current_user.id,
-    ).first()
+    # No restricted deletion window - users can delete any completion they own
+    deleted = await delete_completion_async(db, current_user.id, completion_id)
     
-    if not completion:
+    if not deleted:
         raise CompletionNotFoundError()
     
-    # No restricted deletion window - users can delete any completion they own
-    
-    db.delete(completion)
-    db.commit()
+    await db.commit()
+    await invalidate_user(current_user.id)
     
     return {"ok": True}
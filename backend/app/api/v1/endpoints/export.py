@@ -0,0 +1,152 @@
+import csv
+import io
+import uuid
+from datetime import date, datetime
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from app.core.auth import get_current_user
+from app.core.database import AsyncSessionLocal
+from app.core.errors import ValidationError
+from app.core.fast_json import encode
+from app.models.user import User
+from app.services.export_service import (
+    EXPORT_RESOURCES,
+    export_fields,
+    stream_export_batches,
+)
+from app.utils.cursors import decode_cursor, encode_cursor
+
+router = APIRouter()
+
+# NDJSON record type per export section
+RECORD_TYPES = {
+    "goals": "goal",
+    "habits": "habit",
+    "versions": "habit_version",
+    "completions": "completion",
+}
+
+_RESOURCE_PATTERN = "^(" + "|".join(EXPORT_RESOURCES) + ")$"
+
+
+@router.get("")
+async def export_history(
+    format: str = Query(default="ndjson", pattern="^(ndjson|csv)$"),
+    resource: str | None = Query(default=None, pattern=_RESOURCE_PATTERN),
+    cursor: str | None = None,
+    after_id: str | None = None,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Stream the user's complete history (including deleted goals and habits).
+
+    NDJSON (default) emits every resource in order, one {"type", "data"}
+    record per line, a {"type": "cursor"} checkpoint after each batch and a
+    final {"type": "end"} line; a download that stops before "end" resumes
+    from its last checkpoint with `cursor`. `resource` limits the export
+    to one section.
+
+    CSV exports one `resource` (default completions) with a header row,
+    ordered by id; resume with `after_id` set to the last id received.
+
+    Rows are read through server-side cursors in one read-only snapshot, so
+    memory use does not grow with history size. Send Accept-Encoding: gzip
+    to have the stream compressed on the fly.
+    """
+    if cursor is not None and after_id is not None:
+        raise ValidationError("Use either cursor or after_id, not both")
+
+    if format == "csv":
+        if cursor is not None:
+            raise ValidationError("CSV exports resume with after_id")
+        resource = resource or "completions"
+        resources = (resource,)
+    else:
+        if after_id is not None:
+            raise ValidationError("NDJSON exports resume with cursor")
+        resources = (resource,) if resource else tuple(EXPORT_RESOURCES)
+        if cursor is not None:
+            position = decode_cursor(cursor, "resource", "after")
+            if position["resource"] not in resources:
+                raise ValidationError("Invalid cursor")
+            resources = resources[resources.index(position["resource"]):]
+            after_id = position["after"]
+
+    if after_id is not None:
+        try:
+            after_id = str(uuid.UUID(after_id))
+        except ValueError:
+            raise ValidationError("Invalid cursor" if cursor else "Invalid after_id")
+
+    filename = f"habits-export-{date.today().isoformat()}"
+    if format == "csv":
+        body = _csv_stream(current_user.id, resource, after_id)
+        media_type = "text/csv; charset=utf-8"
+        filename += f"-{resource}.csv"
+    else:
+        body = _ndjson_stream(current_user.id, resources, after_id)
+        media_type = "application/x-ndjson"
+        filename += ".ndjson"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+async def _export_batches(user_id: str, resources: tuple[str, ...], after_id: str | None):
+    # Request-scoped sessions are closed before a streaming body runs, so
+    # the stream owns its session. One REPEATABLE READ transaction keeps all
+    # sections consistent with each other.
+    async with AsyncSessionLocal() as db:
+        await db.connection(execution_options={
+            "isolation_level": "REPEATABLE READ",
+            "postgresql_readonly": True,
+        })
+        async for resource, rows in stream_export_batches(db, user_id, resources, after_id):
+            yield resource, rows
+
+
+async def _ndjson_stream(user_id: str, resources: tuple[str, ...], after_id: str | None):
+    async for resource, rows in _export_batches(user_id, resources, after_id):
+        fields = export_fields(resource)
+        record_type = RECORD_TYPES[resource]
+        lines = [
+            encode({"type": record_type, "data": dict(zip(fields, row))})
+            for row in rows
+        ]
+        lines.append(encode({
+            "type": "cursor",
+            "cursor": encode_cursor({"resource": resource, "after": rows[-1][0]}),
+        }))
+        yield b"\n".join(lines) + b"\n"
+
+    yield encode({"type": "end"}) + b"\n"
+
+
+def _csv_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+
+async def _csv_stream(user_id: str, resource: str, after_id: str | None):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(export_fields(resource))
+
+    async for _, rows in _export_batches(user_id, (resource,), after_id):
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    # Header only (or the tail of a resumed export with nothing left)
+    if buffer.tell():
+        yield buffer.getvalue().encode()
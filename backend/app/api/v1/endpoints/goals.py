@@ -1,35 +1,158 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select, func, extract
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from app.core.database import get_db
+from datetime import date
+from app.core.database import get_async_db
 from app.core.auth import get_current_user
+from app.core.query_stats import query_budget
+from app.core.conditional import check_not_modified
+from app.core.cache import cached_json, invalidate_user
+from app.core.fast_json import records
 from app.models.user import User
 from app.models.goal import Goal
-from app.schemas.goal import GoalCreate, GoalUpdate, GoalResponse
+from app.models.goal_week_rollup import GoalWeekRollup
+from app.schemas.goal import GoalCreate, GoalUpdate, GoalResponse, GoalProgressResponse
 from app.core.errors import GoalNotFoundError, GoalDeletedError, ValidationError
-from app.utils.validators import validate_goal_exists_and_owned
+from app.utils.validators import validate_goal_exists_and_owned_async
+from app.utils.date_utils import get_week_start
+from app.services.change_counter_service import bump_change_counters_async
+from app.services.goal_rollup_service import roll_forward_goal_rollups_async
 
 router = APIRouter()
 
+# Response fields selected as columns by list_goals (progress is optional)
+GOAL_FIELDS = tuple(field for field in GoalResponse.model_fields if field != "progress")
+_GOAL_COLUMNS = tuple(getattr(Goal, field) for field in GOAL_FIELDS)
 
-@router.get("", response_model=List[GoalResponse])
+
+@router.get("", response_model=List[GoalResponse], dependencies=[query_budget(7)])
 async def list_goals(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    include_progress: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    List all non-deleted goals for the current user.
+    With include_progress, each goal also carries its target and achieved
+    totals for the goal year so far.
+    """
+    if include_progress:
+        # Progress moves with habits and completions, and as weeks pass
+        not_modified = await check_not_modified(
+            request, response, db, current_user.id, "goals", "habits", "completions",
+            vary=(get_week_start(date.today()),),
+        )
+    else:
+        not_modified = await check_not_modified(request, response, db, current_user.id, "goals")
+    if not_modified:
+        return not_modified
+    
+    async def build():
+        statement = select(*_GOAL_COLUMNS).where(
+            Goal.user_id == current_user.id,
+            Goal.is_deleted == False,
+        ).order_by(Goal.year.desc(), Goal.created_at.desc())
+        
+        if not include_progress:
+            return records(GOAL_FIELDS, await db.execute(statement))
+        
+        if await roll_forward_goal_rollups_async(db, current_user.id):
+            await db.commit()
+        
+        # Totals over the rollup weeks starting in each goal's own year
+        totals = (
+            select(
+                GoalWeekRollup.goal_id,
+                func.sum(GoalWeekRollup.target).label("target"),
+                func.sum(GoalWeekRollup.achieved).label("achieved"),
+            )
+            .join(Goal, Goal.id == GoalWeekRollup.goal_id)
+            .where(
+                GoalWeekRollup.user_id == current_user.id,
+                extract("year", GoalWeekRollup.week_start) == Goal.year,
+            )
+            .group_by(GoalWeekRollup.goal_id)
+            .subquery()
+        )
+        rows = await db.execute(
+            statement.add_columns(totals.c.target, totals.c.achieved)
+            .outerjoin(totals, totals.c.goal_id == Goal.id)
+        )
+        
+        goals = []
+        for *goal, target, achieved in rows:
+            item = dict(zip(GOAL_FIELDS, goal))
+            item["progress"] = {"target": target or 0, "achieved": achieved or 0}
+            goals.append(item)
+        return goals
+    
+    return await cached_json(current_user.id, response, build)
+
+
+@router.get("/{goal_id}/progress", response_model=GoalProgressResponse, dependencies=[query_budget(8)])
+async def get_goal_progress(
+    request: Request,
+    response: Response,
+    goal_id: str,
+    year: int | None = Query(default=None, ge=2000, le=2100),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
-    """List all non-deleted goals for the current user"""
-    goals = db.query(Goal).filter(
-        Goal.user_id == current_user.id,
-        Goal.is_deleted == False,
-    ).order_by(Goal.year.desc(), Goal.created_at.desc()).all()
+    """
+    Weekly target vs. achieved for a goal, from its precomputed rollups.
+    Covers the weeks starting in `year` (default: the goal's year) up to the
+    current week; weeks before anything linked to the goal are omitted.
+    """
+    this_week = get_week_start(date.today())
+    # Goal ownership is part of the response (404), so goals count too
+    not_modified = await check_not_modified(
+        request, response, db, current_user.id, "goals", "habits", "completions",
+        vary=(this_week, year),
+    )
+    if not_modified:
+        return not_modified
+    
+    is_valid, goal = await validate_goal_exists_and_owned_async(db, goal_id, current_user.id)
+    if not is_valid:
+        goal_obj = await db.scalar(select(Goal).where(Goal.id == goal_id))
+        if goal_obj and goal_obj.user_id == current_user.id and goal_obj.is_deleted:
+            raise GoalDeletedError()
+        raise GoalNotFoundError()
+    
+    year = year or goal.year
+    if await roll_forward_goal_rollups_async(db, current_user.id, [goal.id]):
+        await db.commit()
+    
+    rows = (await db.execute(
+        select(GoalWeekRollup.week_start, GoalWeekRollup.target, GoalWeekRollup.achieved)
+        .where(
+            GoalWeekRollup.goal_id == goal_id,
+            GoalWeekRollup.week_start >= date(year, 1, 1),
+            GoalWeekRollup.week_start <= min(date(year, 12, 31), this_week),
+        )
+        .order_by(GoalWeekRollup.week_start)
+    )).all()
     
-    return goals
+    weeks = [
+        {"week_start": week_start, "target": target, "achieved": achieved}
+        for week_start, target, achieved in rows
+    ]
+    return {
+        "goal_id": goal_id,
+        "year": year,
+        "target": sum(week["target"] for week in weeks),
+        "achieved": sum(week["achieved"] for week in weeks),
+        "weeks": weeks,
+    }
 
 
 @router.post("", response_model=dict, status_code=201)
 async def create_goal(
     goal_data: GoalCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     """Create a new goal"""
@@ -40,8 +163,9 @@ async def create_goal(
         description=goal_data.description,
     )
     db.add(goal)
-    db.commit()
-    db.refresh(goal)
+    await bump_change_counters_async(db, current_user.id, "goals")
+    await db.commit()
+    await invalidate_user(current_user.id)
     
     return {"id": goal.id}
 
@@ -50,14 +174,14 @@ async def create_goal(
 async def update_goal(
     goal_id: str,
     goal_data: GoalUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     """Update an existing goal"""
-    is_valid, goal = validate_goal_exists_and_owned(db, goal_id, current_user.id)
+    is_valid, goal = await validate_goal_exists_and_owned_async(db, goal_id, current_user.id)
     
     if not is_valid:
-        goal_obj = db.query(Goal).filter(Goal.id == goal_id).first()
+        goal_obj = await db.scalar(select(Goal).where(Goal.id == goal_id))
         if not goal_obj:
             raise GoalNotFoundError()
         if goal_obj.is_deleted:
@@ -68,7 +192,9 @@ async def update_goal(
     goal.year = goal_data.year
     goal.description = goal_data.description
     
-    db.commit()
+    await bump_change_counters_async(db, current_user.id, "goals")
+    await db.commit()
+    await invalidate_user(current_user.id)
     
     return {"ok": True}
 
@@ -76,14 +202,14 @@ async def update_goal(
 @router.delete("/{goal_id}", response_model=dict)
 async def delete_goal(
     goal_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     """Soft delete a goal"""
-    is_valid, goal = validate_goal_exists_and_owned(db, goal_id, current_user.id)
+    is_valid, goal = await validate_goal_exists_and_owned_async(db, goal_id, current_user.id)
     
     if not is_valid:
-        goal_obj = db.query(Goal).filter(Goal.id == goal_id).first()
+        goal_obj = await db.scalar(select(Goal).where(Goal.id == goal_id))
         if not goal_obj:
             raise GoalNotFoundError()
         if goal_obj.is_deleted:
@@ -91,6 +217,8 @@ async def delete_goal(
         raise GoalNotFoundError("Goal not found or access denied")
     
     goal.is_deleted = True
-    db.commit()
+    await bump_change_counters_async(db, current_user.id, "goals")
+    await db.commit()
+    await invalidate_user(current_user.id)
     
     return {"ok": True}
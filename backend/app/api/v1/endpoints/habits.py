@@ -1,15 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from datetime import date
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.core.auth import get_current_user
+from app.core.query_stats import query_budget
+from app.core.conditional import check_not_modified
+from app.core.fast_json import json_response
+from app.core.cache import cached_json, invalidate_user
 from app.models.user import User
 from app.models.habit import Habit
 from app.models.habit_version import HabitVersion
 from app.models.goal import Goal
-from app.schemas.habit import HabitCreate, HabitUpdate, HabitResponse
+from app.models.habit_streak import HabitStreak
+from app.schemas.habit import (
+    HabitCreate,
+    HabitUpdate,
+    HabitResponse,
+    HabitVersionResponse,
+    HabitActiveVersions,
+    HabitHeatmapResponse,
+    HabitOrderUpdate,
+)
 from app.core.errors import (
+    InvalidDateError,
     HabitNotFoundError,
     HabitDeletedError,
     GoalNotFoundError,
@@ -17,62 +32,216 @@ from app.core.errors import (
     ValidationError,
 )
 from app.utils.validators import (
-    validate_habit_exists_and_owned,
-    validate_goal_exists_and_owned,
+    validate_habit_exists_and_owned_async,
+    validate_goal_exists_and_owned_async,
+)
+from app.utils.date_utils import get_week_start, get_next_monday, count_week_starts, iter_week_starts, MAX_RANGE_WEEKS
+from app.services.version_resolver import load_version_index_async
+from app.services.change_counter_service import bump_change_counters_async
+from app.services.streak_service import effective_current_streak, refresh_streaks_async
+from app.services.goal_rollup_service import refresh_goal_rollups_async
+from app.services.habit_service import (
+    VERSIONED_FIELDS,
+    apply_version_update_async,
+    get_active_version_async,
+    normalize_habit_ids,
+    reorder_habits_async,
 )
-from app.utils.date_utils import get_week_start, get_next_monday
+from app.services.heatmap_service import HEATMAP_ENCODINGS, habit_heatmap_async
 
 router = APIRouter()
 
+# Columns selected by list_habits; versions in HabitVersionResponse order
+_HABIT_COLUMNS = (
+    Habit.id,
+    Habit.name,
+    Habit.order_index,
+    Habit.is_deleted,
+    Habit.created_at,
+    Habit.updated_at,
+)
+_STREAK_COLUMNS = (
+    HabitStreak.current_streak,
+    HabitStreak.best_streak,
+    HabitStreak.last_qualifying_week,
+)
+VERSION_FIELDS = tuple(HabitVersionResponse.model_fields)
+_VERSION_COLUMNS = tuple(getattr(HabitVersion, field) for field in VERSION_FIELDS)
 
-@router.get("", response_model=List[HabitResponse])
+
+@router.get("", response_model=List[HabitResponse], dependencies=[query_budget(4)])
 async def list_habits(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    include_streaks: bool = False,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
-    """List all habits with their versions (including deleted for historical views)"""
-    habits = db.query(Habit).options(
-        joinedload(Habit.versions)
-    ).filter(
-        Habit.user_id == current_user.id,
-        # Removed is_deleted filter - frontend handles display logic
-    ).order_by(Habit.order_index.asc(), Habit.created_at.asc()).all()
-
-    # Build response using pre-loaded versions
-    result = []
-    for habit in habits:
-        # Versions are already loaded via joinedload
-        latest_version = habit.versions[0] if habit.versions else None
-        linked_goal_id = latest_version.linked_goal_id if latest_version else None
-
-        result.append({
-            "id": habit.id,
-            "name": habit.name,
-            "order_index": habit.order_index,
-            "linked_goal_id": linked_goal_id,
-            "is_deleted": habit.is_deleted,
-            "created_at": habit.created_at,
-            "updated_at": habit.updated_at,
-            "versions": habit.versions,
-        })
+    """
+    List all habits with their versions (including deleted for historical views).
+    With include_streaks, each habit also carries its persisted streak.
+    """
+    this_week = get_week_start(date.today())
+    if include_streaks:
+        # Streaks move with completions, and lapse as weeks pass
+        not_modified = await check_not_modified(
+            request, response, db, current_user.id, "habits", "completions",
+            vary=(this_week,),
+        )
+    else:
+        not_modified = await check_not_modified(request, response, db, current_user.id, "habits")
+    if not_modified:
+        return not_modified
+
+    async def build():
+        # Two column queries encoded straight to JSON bytes: no ORM identity
+        # map, no joinedload row duplication, no response_model re-validation.
+        # Streak state rides along on the habit query as an outer join.
+        habit_query = select(*_HABIT_COLUMNS)
+        if include_streaks:
+            habit_query = habit_query.add_columns(*_STREAK_COLUMNS).outerjoin(
+                HabitStreak, HabitStreak.habit_id == Habit.id
+            )
+        habit_rows = (await db.execute(
+            habit_query.where(
+                Habit.user_id == current_user.id,
+                # Removed is_deleted filter - frontend handles display logic
+            ).order_by(Habit.order_index.asc(), Habit.created_at.asc())
+        )).all()
+
+        version_rows = await db.execute(
+            select(HabitVersion.habit_id, *_VERSION_COLUMNS)
+            .join(Habit, Habit.id == HabitVersion.habit_id)
+            .where(Habit.user_id == current_user.id)
+            # Same order as Habit.versions: latest effective week first
+            .order_by(HabitVersion.effective_week_start.desc(), HabitVersion.created_at.desc())
+        )
+        versions_by_habit: dict[str, list[dict]] = {}
+        for habit_id, *version in version_rows:
+            versions_by_habit.setdefault(habit_id, []).append(dict(zip(VERSION_FIELDS, version)))
+
+        result = []
+        for habit_id, name, order_index, is_deleted, created_at, updated_at, *streak in habit_rows:
+            versions = versions_by_habit.get(habit_id, [])
+            latest_version = versions[0] if versions else None
+            linked_goal_id = latest_version["linked_goal_id"] if latest_version else None
+
+            habit = {
+                "id": habit_id,
+                "name": name,
+                "order_index": order_index,
+                "linked_goal_id": linked_goal_id,
+                "is_deleted": is_deleted,
+                "created_at": created_at,
+                "updated_at": updated_at,
+                "versions": versions,
+            }
+            if include_streaks:
+                current_streak, best_streak, last_week = streak
+                habit["streak"] = {
+                    "current": effective_current_streak(current_streak or 0, last_week, this_week),
+                    "best": best_streak or 0,
+                    "last_qualifying_week": last_week,
+                }
+            result.append(habit)
+        return result
+
+    # Built only on a cache miss; the cache is keyed by the ETag above
+    return await cached_json(current_user.id, response, build)
 
+
+@router.get("/active-versions", response_model=List[HabitActiveVersions], dependencies=[query_budget(4)])
+async def list_active_versions(
+    request: Request,
+    response: Response,
+    start: str = Query(..., pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    end: str = Query(..., pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Active version of every habit for every week in a date range.
+    Resolved server-side from one version query, so clients do not need
+    to replay version history per progress-grid cell.
+    """
+    try:
+        start_date = date.fromisoformat(start)
+        end_date = date.fromisoformat(end)
+    except ValueError:
+        raise InvalidDateError("Invalid date format. Use YYYY-MM-DD")
+    
+    if start_date > end_date:
+        raise InvalidDateError("Start date must be <= end date")
+    
+    if count_week_starts(start_date, end_date) > MAX_RANGE_WEEKS:
+        raise ValidationError(f"Date range must not exceed {MAX_RANGE_WEEKS} weeks")
+    weeks = iter_week_starts(start_date, end_date)
+    
+    not_modified = await check_not_modified(request, response, db, current_user.id, "habits")
+    if not_modified:
+        return not_modified
+    
+    habit_ids = (await db.scalars(
+        select(Habit.id).where(Habit.user_id == current_user.id)
+        .order_by(Habit.order_index.asc(), Habit.created_at.asc())
+    )).all()
+    index = await load_version_index_async(db, habit_ids, start_date, end_date)
+    
+    result = []
+    for habit_id in habit_ids:
+        resolved = {}
+        for week_start in weeks:
+            version = index.resolve(habit_id, week_start)
+            if version is not None:
+                resolved[week_start] = version.id
+        result.append({"habit_id": habit_id, "weeks": resolved})
+    
     return result
 
 
+@router.get("/heatmap", response_model=HabitHeatmapResponse, dependencies=[query_budget(4)])
+async def get_habit_heatmap(
+    request: Request,
+    response: Response,
+    year: int | None = Query(default=None, ge=2000, le=2100),
+    encoding: str = Query(default="counts"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Completions per day for every habit over a year, for calendar views.
+    Days run in whole Monday-aligned weeks from `start`; `encoding=bitset`
+    sends one bit per day instead of a count.
+    """
+    if encoding not in HEATMAP_ENCODINGS:
+        raise ValidationError(f"encoding must be one of: {', '.join(HEATMAP_ENCODINGS)}")
+    year = year or date.today().year
+    
+    not_modified = await check_not_modified(
+        request, response, db, current_user.id, "habits", "completions",
+        vary=(year, encoding),
+    )
+    if not_modified:
+        return not_modified
+    
+    heatmap = await habit_heatmap_async(db, current_user.id, year, encoding)
+    return json_response(heatmap, response)
+
+
 @router.post("", response_model=dict, status_code=201)
 async def create_habit(
     habit_data: HabitCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     """Create a new habit (effective immediately)"""
     # Validate linked goal if provided
     if habit_data.linked_goal_id:
-        is_valid, _ = validate_goal_exists_and_owned(
+        is_valid, _ = await validate_goal_exists_and_owned_async(
             db, habit_data.linked_goal_id, current_user.id
         )
         if not is_valid:
-            goal = db.query(Goal).filter(Goal.id == habit_data.linked_goal_id).first()
+            goal = await db.scalar(select(Goal).where(Goal.id == habit_data.linked_goal_id))
             if not goal:
                 raise GoalNotFoundError()
             if goal.is_deleted:
@@ -86,7 +255,7 @@ async def create_habit(
         order_index=habit_data.order_index,
     )
     db.add(habit)
-    db.flush()  # Get habit.id
+    await db.flush()  # Get habit.id
     
     # Calculate current week start (using today's date)
     today = date.today()
@@ -102,24 +271,58 @@ async def create_habit(
         effective_week_start=current_week_start,
     )
     db.add(version)
-    db.commit()
-    db.refresh(habit)
+    await db.flush()
+    await bump_change_counters_async(db, current_user.id, "habits")
+    await refresh_goal_rollups_async(db, current_user.id, [version.linked_goal_id], current_week_start)
+    await db.commit()
+    await invalidate_user(current_user.id)
     
     return {"id": habit.id}
 
 
+@router.patch("/order", response_model=dict)
+async def reorder_habits(
+    order: HabitOrderUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Reorder habits in one statement: order_index becomes each habit's
+    position in `habit_ids`. No versions are written.
+    """
+    habit_ids = normalize_habit_ids(order.habit_ids)
+    if habit_ids is None:
+        raise HabitNotFoundError()
+    # Compared canonically: an upper- and a lower-case id are one habit
+    if len(set(habit_ids)) != len(habit_ids):
+        raise ValidationError("habit_ids must not contain duplicates")
+    
+    if not await reorder_habits_async(db, current_user.id, habit_ids):
+        await db.rollback()
+        raise HabitNotFoundError()
+    
+    await bump_change_counters_async(db, current_user.id, "habits")
+    await db.commit()
+    await invalidate_user(current_user.id)
+    
+    return {"ok": True}
+
+
 @router.put("/{habit_id}", response_model=dict)
 async def update_habit(
     habit_id: str,
     habit_data: HabitUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Update a habit (changes effective immediately from current week)"""
+    """
+    Update a habit. Versioned settings change from the current week on;
+    name and order apply to the habit as a whole.
+    """
     # Validate habit exists and is owned
-    is_valid, habit = validate_habit_exists_and_owned(db, habit_id, current_user.id)
+    is_valid, habit = await validate_habit_exists_and_owned_async(db, habit_id, current_user.id)
     if not is_valid:
-        habit_obj = db.query(Habit).filter(Habit.id == habit_id).first()
+        habit_obj = await db.scalar(select(Habit).where(Habit.id == habit_id))
         if not habit_obj:
             raise HabitNotFoundError()
         if habit_obj.is_deleted:
@@ -128,11 +331,11 @@ async def update_habit(
     
     # Validate linked goal if provided
     if habit_data.linked_goal_id:
-        is_valid, _ = validate_goal_exists_and_owned(
+        is_valid, _ = await validate_goal_exists_and_owned_async(
             db, habit_data.linked_goal_id, current_user.id
         )
         if not is_valid:
-            goal = db.query(Goal).filter(Goal.id == habit_data.linked_goal_id).first()
+            goal = await db.scalar(select(Goal).where(Goal.id == habit_data.linked_goal_id))
             if not goal:
                 raise GoalNotFoundError()
             if goal.is_deleted:
@@ -147,17 +350,28 @@ async def update_habit(
     today = date.today()
     current_week_start = get_week_start(today)
 
-    # Create new version effective immediately from current week
-    version = HabitVersion(
-        habit_id=habit.id,
-        weekly_target=habit_data.weekly_target,
-        requires_text_on_completion=habit_data.requires_text_on_completion,
-        linked_goal_id=habit_data.linked_goal_id,
-        description=habit_data.description,
-        effective_week_start=current_week_start,
+    # Versioned settings take effect from the current week; unchanged
+    # settings or a second edit in the same week add no version
+    values = {field: getattr(habit_data, field) for field in VERSIONED_FIELDS}
+    values["linked_goal_id"] = values["linked_goal_id"] or None
+    previous, changed = await apply_version_update_async(
+        db, habit.id, values, current_week_start
     )
-    db.add(version)
-    db.commit()
+    await db.flush()
+    # Counter row before streaks and rollups, the order completion writes
+    # lock them in, so an edit and a tap by the same user cannot deadlock
+    await bump_change_counters_async(db, current_user.id, "habits")
+    if changed:
+        # The new target applies from this week on, which can change streaks
+        await refresh_streaks_async(db, current_user.id, [habit.id])
+        await refresh_goal_rollups_async(
+            db,
+            current_user.id,
+            [previous["linked_goal_id"] if previous else None, values["linked_goal_id"]],
+            current_week_start,
+        )
+    await db.commit()
+    await invalidate_user(current_user.id)
     
     return {"ok": True}
 
@@ -165,18 +379,26 @@ async def update_habit(
 @router.delete("/{habit_id}", response_model=dict)
 async def delete_habit(
     habit_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     """Soft delete a habit"""
-    is_valid, habit = validate_habit_exists_and_owned(db, habit_id, current_user.id)
+    is_valid, habit = await validate_habit_exists_and_owned_async(db, habit_id, current_user.id)
     if not is_valid:
-        habit_obj = db.query(Habit).filter(Habit.id == habit_id).first()
+        habit_obj = await db.scalar(select(Habit).where(Habit.id == habit_id))
         if not habit_obj:
             raise HabitNotFoundError()
         raise HabitNotFoundError()
     
     habit.is_deleted = True
-    db.commit()
+    await db.flush()
+    # This week's goal target drops to what the habit already achieved
+    current_week_start = get_week_start(date.today())
+    await bump_change_counters_async(db, current_user.id, "habits")
+    version = await get_active_version_async(db, habit.id, current_week_start)
+    if version:
+        await refresh_goal_rollups_async(db, current_user.id, [version.linked_goal_id], current_week_start)
+    await db.commit()
+    await invalidate_user(current_user.id)
     
     return {"ok": True}
@@ -1,4 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from app.core.auth import require_admin
+from app.core.database import get_pool_status
+from app.core import cache
+from app.services import completion_week_cache
 
 router = APIRouter()
 
@@ -7,3 +11,18 @@ router = APIRouter()
 async def health_check():
     """Health check endpoint"""
     return {"status": "ok"}
+
+
+@router.get("/db-pool", dependencies=[Depends(require_admin)])
+async def db_pool_status():
+    """Connection pool occupancy and checkout wait statistics (X-Admin-Token)"""
+    return get_pool_status()
+
+
+@router.get("/cache", dependencies=[Depends(require_admin)])
+async def cache_status():
+    """Hit, miss, eviction and invalidation counters of each cache (X-Admin-Token)"""
+    return {
+        "responses": cache.response_cache.stats(),
+        "completion_weeks": completion_week_cache.week_cache.stats(),
+    }
@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Depends
+from app.core import cache
+from app.core.auth import require_admin
+from app.core.database import async_engine, async_pool_stats, engine, pool_stats
+from app.core.identity_cache import identity_cache, token_cache
+from app.core.metrics import metrics_response, registry
+from app.services import completion_week_cache
+
+router = APIRouter()
+
+_POOLS = (("async", async_engine, async_pool_stats), ("sync", engine, pool_stats))
+_AUTH_CACHES = (("token", token_cache), ("identity", identity_cache))
+
+
+def _response_caches():
+    return (
+        ("responses", cache.response_cache),
+        ("completion_weeks", completion_week_cache.week_cache),
+    )
+
+
+def _pool_connections() -> dict[tuple, float]:
+    samples = {}
+    for name, db_engine, _ in _POOLS:
+        pool = db_engine.pool
+        # NullPool keeps no connections to report
+        if hasattr(pool, "checkedout"):
+            samples[(name, "checked_out")] = pool.checkedout()
+            samples[(name, "idle")] = pool.checkedin()
+            samples[(name, "overflow")] = max(pool.overflow(), 0)
+    return samples
+
+
+registry.callback(
+    "db_pool_connections", "Pooled connections by state", "gauge", ("pool", "state"),
+    _pool_connections,
+)
+registry.callback(
+    "db_pool_checkout_timeouts_total", "Checkouts that gave up waiting for a connection",
+    "counter", ("pool",),
+    lambda: {(name,): stats.timeouts for name, _, stats in _POOLS},
+)
+registry.callback(
+    "auth_cache_requests_total", "Auth cache lookups by result", "counter", ("cache", "result"),
+    lambda: {
+        key: value
+        for name, lru in _AUTH_CACHES
+        for key, value in (((name, "hit"), lru.hits), ((name, "miss"), lru.misses))
+    },
+)
+registry.callback(
+    "response_cache_requests_total", "Response cache lookups by result", "counter",
+    ("cache", "result"),
+    lambda: {
+        key: value
+        for name, backend in _response_caches()
+        for key, value in (((name, "hit"), backend.hits), ((name, "miss"), backend.misses))
+    },
+)
+
+
+@router.get("", include_in_schema=False, dependencies=[Depends(require_admin)])
+async def metrics():
+    """Prometheus text exposition of this worker's metrics (ADMIN_TOKEN as bearer)"""
+    return metrics_response()
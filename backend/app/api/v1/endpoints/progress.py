@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+from datetime import date
+from app.core.database import get_async_db
+from app.core.auth import get_current_user
+from app.core.conditional import check_not_modified
+from app.core.query_stats import query_budget
+from app.core.errors import InvalidDateError, ValidationError
+from app.models.user import User
+from app.schemas.progress import HabitWeeklyProgress
+from app.services.progress_service import weekly_progress_async
+from app.utils.date_utils import count_week_starts, MAX_RANGE_WEEKS
+
+router = APIRouter()
+
+
+@router.get("/weekly", response_model=List[HabitWeeklyProgress], dependencies=[query_budget(5)])
+async def get_weekly_progress(
+    request: Request,
+    response: Response,
+    start: str = Query(..., pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    end: str = Query(..., pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Per habit, per week: the active version's target, the completions done
+    and what remains. Sized by habits x weeks, not by completions.
+    """
+    try:
+        start_date = date.fromisoformat(start)
+        end_date = date.fromisoformat(end)
+    except ValueError:
+        raise InvalidDateError("Invalid date format. Use YYYY-MM-DD")
+    
+    if start_date > end_date:
+        raise InvalidDateError("Start date must be <= end date")
+    
+    if count_week_starts(start_date, end_date) > MAX_RANGE_WEEKS:
+        raise ValidationError(f"Date range must not exceed {MAX_RANGE_WEEKS} weeks")
+    
+    not_modified = await check_not_modified(
+        request, response, db, current_user.id, "habits", "completions"
+    )
+    if not_modified:
+        return not_modified
+    
+    return await weekly_progress_async(db, current_user.id, start_date, end_date)
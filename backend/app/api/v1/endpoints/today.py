@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
+from app.core.auth import get_current_user
+from app.core.query_stats import query_budget
+from app.core.conditional import check_not_modified
+from app.core.fast_json import json_response
+from app.models.user import User
+from app.schemas.today import TodayResponse
+from app.schemas.user import UserResponse
+from app.services.today_service import today_async
+from app.utils.date_utils import get_client_today
+
+router = APIRouter()
+
+_USER_FIELDS = tuple(UserResponse.model_fields)
+
+
+@router.get("", response_model=TodayResponse, dependencies=[query_budget(6)])
+async def get_today(
+    request: Request,
+    response: Response,
+    tz: str | None = None,
+    # Real offsets run from UTC-12:00 to UTC+14:00
+    tz_offset_minutes: int | None = Query(None, ge=-840, le=840),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    The daily page in one request: the user, this week's active habits with
+    their version, done and remaining counts, goals and completions.
+    The week is the one containing the client's today (`tz`, an IANA name,
+    or `tz_offset_minutes`; UTC if neither is given).
+    """
+    today = get_client_today(tz, tz_offset_minutes)
+    
+    not_modified = await check_not_modified(
+        request, response, db, current_user.id, "habits", "goals", "completions",
+        vary=(today,),
+    )
+    if not_modified:
+        return not_modified
+    
+    content = await today_async(db, current_user.id, today)
+    content = {
+        "user": {field: getattr(current_user, field) for field in _USER_FIELDS},
+        **content,
+    }
+    return json_response(content, response)
@@ -1,6 +1,4 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.core.database import get_db
 from app.models.user import User
 from app.schemas.user import UserResponse
 from app.core.auth import get_current_user
@@ -1,11 +1,16 @@
 from fastapi import Depends, HTTPException, status, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 from typing import Optional
-from app.core.database import get_db
+import hmac
+import time
+from app.core.database import get_async_db
 from app.core.config import settings
+from app.core.errors import ForbiddenError
+from app.core.identity_cache import token_cache, identity_cache, token_digest
 from app.models.user import User
+from app.services.user_service import get_or_create_user_async
 
 security = HTTPBearer(auto_error=False)
 
@@ -28,9 +33,33 @@ def verify_token(token: str) -> dict:
         )
 
 
+def verify_token_cached(token: str) -> dict:
+    """
+    Verify a JWT, reusing the decoded payload for tokens seen before.
+
+    Entries are keyed on a SHA-256 digest of the raw token and expire at the
+    token's own `exp` claim, so an expired token always falls through to a
+    full decode (and its JWTError).
+    """
+    key = token_digest(token)
+    payload = token_cache.get(key)
+    if payload is not None:
+        return payload
+
+    payload = verify_token(token)
+    exp = payload.get("exp")
+    expires_at = (
+        float(exp)
+        if isinstance(exp, (int, float))
+        else time.time() + settings.AUTH_IDENTITY_CACHE_TTL_SECONDS
+    )
+    token_cache.set(key, payload, expires_at)
+    return payload
+
+
 async def get_current_user(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> User:
     """
     Dependency to get the current authenticated user from JWT token.
@@ -43,7 +72,7 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    token_data = verify_token(credentials.credentials)
+    token_data = verify_token_cached(credentials.credentials)
 
     # Extract user identifier from token
     # NextAuth typically includes 'sub' (subject) or 'email'
@@ -56,17 +85,38 @@ async def get_current_user(
             detail="Invalid token payload",
         )
 
-    # Find or create user
-    user = db.query(User).filter(User.google_user_id == google_user_id).first()
-
-    if not user:
-        # Create new user on first login
-        user = User(
-            google_user_id=google_user_id,
-            email=user_email,
+    # Resolve (or create on first login) the user, skipping the DB when
+    # this subject was resolved recently
+    identity = identity_cache.get(google_user_id)
+    if identity is None:
+        identity = await get_or_create_user_async(db, google_user_id, user_email)
+        identity_cache.set(
+            google_user_id,
+            identity,
+            time.time() + settings.AUTH_IDENTITY_CACHE_TTL_SECONDS,
         )
-        db.add(user)
-        db.commit()
-        db.refresh(user)
 
-    return user
+    # Fresh transient instance per request; never attached to a session
+    return User(
+        id=identity.id,
+        google_user_id=identity.google_user_id,
+        email=identity.email,
+        created_at=identity.created_at,
+        updated_at=identity.updated_at,
+    )
+
+
+async def require_admin(
+    x_admin_token: Optional[str] = Header(None),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+) -> None:
+    """
+    Dependency for operator endpoints: the X-Admin-Token header, or a bearer
+    token (what a Prometheus scrape sends), must match ADMIN_TOKEN. With no
+    ADMIN_TOKEN configured they are disabled.
+    """
+    if not settings.ADMIN_TOKEN:
+        raise ForbiddenError("Admin endpoints are disabled")
+    token = x_admin_token or (credentials.credentials if credentials else None)
+    if not token or not hmac.compare_digest(token, settings.ADMIN_TOKEN):
+        raise ForbiddenError("Invalid admin token")
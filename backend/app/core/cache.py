@@ -0,0 +1,262 @@
+import threading
+import time
+from typing import Any, Awaitable, Callable
+
+import orjson
+from fastapi import Response
+
+from app.core.config import settings
+from app.core.fast_json import encode, raw_json_response
+from app.core.identity_cache import LRUCache
+
+
+class CacheBackend:
+    """
+    Per-user namespaced byte store behind the response cache.
+
+    Entries are keyed by (user, key) and a whole user's namespace can be
+    invalidated at once. Backends only have to be best effort: callers key
+    entries so that a stale one can never be looked up (see cached_json),
+    and invalidation just frees them early.
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    async def get(self, user_id: str, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    async def get_many(self, user_id: str, keys: list[str]) -> list[bytes | None]:
+        return [await self.get(user_id, key) for key in keys]
+
+    async def set(self, user_id: str, key: str, value: bytes) -> None:
+        raise NotImplementedError
+
+    async def invalidate(self, user_id: str) -> None:
+        raise NotImplementedError
+
+    @property
+    def evictions(self) -> int:
+        return 0
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+        }
+
+
+class NullCacheBackend(CacheBackend):
+    """Caching disabled: every lookup misses and nothing is stored"""
+
+    async def get(self, user_id: str, key: str) -> bytes | None:
+        self.misses += 1
+        return None
+
+    async def set(self, user_id: str, key: str, value: bytes) -> None:
+        pass
+
+    async def invalidate(self, user_id: str) -> None:
+        self.invalidations += 1
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    In-process TTL + LRU store (per worker).
+
+    A user's namespace is a generation number; invalidating bumps it, so
+    the old entries become unreachable and age out of the LRU.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        super().__init__()
+        self.ttl_seconds = ttl_seconds
+        self._entries: LRUCache[bytes] = LRUCache(max_entries)
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, user_id: str, key: str) -> tuple[str, int, str]:
+        return user_id, self._generations.get(user_id, 0), key
+
+    async def get(self, user_id: str, key: str) -> bytes | None:
+        value = self._entries.get(self._key(user_id, key))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, user_id: str, key: str, value: bytes) -> None:
+        self._entries.set(self._key(user_id, key), value, time.time() + self.ttl_seconds)
+
+    async def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        self.invalidations += 1
+
+    @property
+    def evictions(self) -> int:
+        return self._entries.evictions
+
+    def stats(self) -> dict[str, Any]:
+        return {**super().stats(), "entries": len(self._entries)}
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Shared store in Redis, for deployments with several workers.
+
+    Needs the optional `redis` package; pass `client` to use any object
+    with the redis.asyncio interface (e.g. fakeredis in tests). Entries
+    expire after the TTL and, like the memory backend, hang off a per-user
+    generation counter. Redis errors count as misses so the cache can never
+    fail a request. Evictions happen server-side and show up in Redis's own
+    `evicted_keys` stat rather than here.
+    """
+
+    def __init__(
+        self,
+        url: str = "",
+        ttl_seconds: float = 300,
+        prefix: str = "habits:cache",
+        client: Any = None,
+    ):
+        super().__init__()
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError as e:
+                raise RuntimeError(
+                    "CACHE_BACKEND=redis requires the redis package (pip install redis)"
+                ) from e
+            client = redis.from_url(url)
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    async def _key(self, user_id: str, key: str) -> str:
+        generation = await self.client.get(f"{self.prefix}:gen:{user_id}")
+        return f"{self.prefix}:{user_id}:{int(generation or 0)}:{key}"
+
+    async def get(self, user_id: str, key: str) -> bytes | None:
+        try:
+            value = await self.client.get(await self._key(user_id, key))
+        except Exception:
+            self.errors += 1
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def get_many(self, user_id: str, keys: list[str]) -> list[bytes | None]:
+        if not keys:
+            return []
+        try:
+            generation = await self.client.get(f"{self.prefix}:gen:{user_id}")
+            namespace = f"{self.prefix}:{user_id}:{int(generation or 0)}"
+            values = await self.client.mget([f"{namespace}:{key}" for key in keys])
+        except Exception:
+            self.errors += 1
+            values = [None] * len(keys)
+        hits = sum(value is not None for value in values)
+        self.hits += hits
+        self.misses += len(values) - hits
+        return values
+
+    async def set(self, user_id: str, key: str, value: bytes) -> None:
+        try:
+            await self.client.set(
+                await self._key(user_id, key), value, px=int(self.ttl_seconds * 1000)
+            )
+        except Exception:
+            self.errors += 1
+
+    async def invalidate(self, user_id: str) -> None:
+        try:
+            await self.client.incr(f"{self.prefix}:gen:{user_id}")
+        except Exception:
+            self.errors += 1
+        self.invalidations += 1
+
+
+def build_cache_backend(
+    max_entries: int,
+    ttl_seconds: float,
+    prefix: str = "habits:cache",
+) -> CacheBackend:
+    """
+    A backend of the kind selected by CACHE_BACKEND (memory | redis | none).
+    max_entries only bounds the memory backend (0 disables it); prefix
+    separates stores that share a Redis.
+    """
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCacheBackend(settings.CACHE_URL, ttl_seconds, prefix)
+    if settings.CACHE_BACKEND == "none" or max_entries <= 0:
+        return NullCacheBackend()
+    return MemoryCacheBackend(max_entries, ttl_seconds)
+
+
+response_cache: CacheBackend = build_cache_backend(
+    settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL_SECONDS
+)
+
+
+async def invalidate_user(user_id: str) -> None:
+    """Drop a user's cached responses; write endpoints call this after commit"""
+    await response_cache.invalidate(user_id)
+
+
+def _pack(headers: dict[str, str], body: bytes) -> bytes:
+    return orjson.dumps(headers) + b"\n" + body
+
+
+def _unpack(value: bytes) -> tuple[dict[str, str], bytes]:
+    headers, body = value.split(b"\n", 1)
+    return orjson.loads(headers), body
+
+
+def _encoded(content: Any) -> bytes:
+    return content if isinstance(content, bytes) else encode(content)
+
+
+async def cached_json(
+    user_id: str,
+    response: Response,
+    build: Callable[[], Awaitable[Any]],
+) -> Response:
+    """
+    JSON response for a conditional GET, served from response_cache when
+    possible.
+
+    Call after check_not_modified: the entry is keyed by the ETag it set,
+    which already covers the user, the revisions of every scope the body
+    reads, the path and query and any `vary` inputs. A cached body is
+    therefore only reused while its revisions are current, in any worker,
+    even if an invalidation was missed. Headers `build` adds to `response`
+    (e.g. X-Next-Cursor) are cached with the body. `build` may return
+    already-encoded JSON bytes.
+    """
+    etag = response.headers.get("etag")
+    if etag is None:
+        return raw_json_response(_encoded(await build()), response)
+
+    cached = await response_cache.get(user_id, etag)
+    if cached is not None:
+        headers, body = _unpack(cached)
+        response.headers.update(headers)
+        return raw_json_response(body, response)
+
+    before = set(response.headers.keys())
+    body = _encoded(await build())
+    added = {key: value for key, value in response.headers.items() if key not in before}
+    await response_cache.set(user_id, etag, _pack(added, body))
+    return raw_json_response(body, response)
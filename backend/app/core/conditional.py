@@ -0,0 +1,80 @@
+import hashlib
+from fastapi import Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.services.change_counter_service import get_change_counters_async
+
+# Bump when the serialized shape of a cached response changes, so clients
+# holding bodies from an older deploy revalidate instead of getting 304s
+ETAG_FORMAT_VERSION = "2"
+
+
+def make_etag(
+    user_id: str,
+    revisions: dict[str, int],
+    request: Request,
+    vary: tuple = (),
+) -> str:
+    """
+    Weak ETag for a user's view of a resource.
+
+    Derived from the user, the revisions of the scopes the response reads,
+    and the request path and query, so different ranges or pages of the
+    same list get different tags. `vary` adds anything else the body
+    depends on (e.g. the current week). Weak because GZip may re-encode
+    the body.
+    """
+    key = "|".join([
+        ETAG_FORMAT_VERSION,
+        user_id,
+        ",".join(str(part) for part in vary),
+        ",".join(f"{scope}={revision}" for scope, revision in sorted(revisions.items())),
+        request.url.path,
+        "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items())),
+    ])
+    return f'W/"{hashlib.sha256(key.encode()).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match comparison (weak, so W/ prefixes are ignored)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+async def check_not_modified(
+    request: Request,
+    response: Response,
+    db: AsyncSession,
+    user_id: str,
+    *scopes: str,
+    vary: tuple = (),
+) -> Response | None:
+    """
+    Conditional GET for list endpoints.
+
+    Looks up the user's change counters (one primary-key read) before any
+    entity query. Returns a 304 response to send as-is when the client's
+    If-None-Match is current; otherwise sets ETag and Cache-Control on
+    `response` and returns None so the endpoint builds the body.
+
+    The counters are read before the entities, so a write racing with the
+    read can only make the tag older than the body, never newer: the
+    client's next request then misses and refetches.
+    """
+    counters = await get_change_counters_async(db, user_id)
+    etag = make_etag(user_id, {scope: counters[scope] for scope in scopes}, request, vary)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
+
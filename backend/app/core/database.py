@@ -1,21 +1,271 @@
+import os
+import threading
+import time
+import uuid
 from sqlalchemy import create_engine
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine, URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 from app.core.config import settings
+from app.core.metrics import registry
+from app.core.query_stats import instrument_engine
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    poolclass=NullPool,
-    connect_args={"sslmode": "require"} if "neon.tech" in settings.DATABASE_URL else {},
-    echo=settings.APP_ENV == "local",
+POOL_MODES = ("auto", "queue", "pgbouncer", "null")
+
+
+class PoolStats:
+    """Running totals for connection checkouts, used to size the pool"""
+
+    def __init__(self, pool: str):
+        self.pool = pool
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record(self, wait_seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait_seconds += wait_seconds
+            if wait_seconds > self.max_wait_seconds:
+                self.max_wait_seconds = wait_seconds
+        POOL_CHECKOUT_SECONDS.observe(wait_seconds, self.pool)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "total_wait_seconds": round(self.total_wait_seconds, 6),
+                "avg_wait_seconds": round(
+                    self.total_wait_seconds / self.checkouts, 6
+                ) if self.checkouts else 0.0,
+                "max_wait_seconds": round(self.max_wait_seconds, 6),
+            }
+
+
+POOL_CHECKOUT_SECONDS = registry.histogram(
+    "db_pool_checkout_seconds", "Time spent waiting for a pooled connection", ("pool",)
 )
 
+pool_stats = PoolStats("sync")
+async_pool_stats = PoolStats("async")
+
+
+class _CheckoutTimingMixin:
+    """Records how long each checkout waited for a connection"""
+
+    stats: PoolStats
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return conn
+
+
+class InstrumentedQueuePool(_CheckoutTimingMixin, QueuePool):
+    stats = pool_stats
+
+
+class InstrumentedAsyncQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    stats = async_pool_stats
+
+
+def resolve_pool_mode(mode: str | None = None) -> str:
+    """
+    Resolve the configured pool mode.
+
+    "auto" picks NullPool on Vercel (each invocation may be a fresh process,
+    so pooled connections would be stranded) and QueuePool everywhere else.
+    """
+    mode = (mode or settings.DB_POOL_MODE).lower()
+    if mode not in POOL_MODES:
+        raise ValueError(f"DB_POOL_MODE must be one of {', '.join(POOL_MODES)}, got {mode!r}")
+    if mode == "auto":
+        return "null" if os.environ.get("VERCEL") else "queue"
+    return mode
+
+
+def build_connect_args(database_url: str | URL, mode: str) -> dict:
+    """Driver-level connect arguments for the given URL and pool mode"""
+    url = make_url(database_url)
+    driver = url.get_driver_name()
+    connect_args: dict = {}
+
+    if driver in ("psycopg2", "psycopg"):
+        if "neon.tech" in (url.host or "") and "sslmode" not in url.query:
+            connect_args["sslmode"] = "require"
+        connect_args["connect_timeout"] = settings.DB_CONNECT_TIMEOUT
+        # PgBouncer in transaction mode rejects unknown startup parameters
+        if settings.DB_STATEMENT_TIMEOUT_MS and mode != "pgbouncer":
+            connect_args["options"] = f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+        if driver == "psycopg" and mode == "pgbouncer":
+            # psycopg 3 prepares statements server-side after a few executions
+            connect_args["prepare_threshold"] = None
+
+    elif driver == "asyncpg":
+        connect_args["timeout"] = settings.DB_CONNECT_TIMEOUT
+        if settings.DB_STATEMENT_TIMEOUT_MS and mode != "pgbouncer":
+            connect_args["server_settings"] = {
+                "statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS),
+            }
+        if mode == "pgbouncer":
+            # asyncpg prepares every statement; under transaction pooling the
+            # next transaction may land on a backend that never saw it
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_cache_size"] = 0
+            connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+
+    return connect_args
+
+
+def to_async_url(database_url: str) -> tuple[URL, dict]:
+    """
+    Translate a libpq-style DATABASE_URL into an asyncpg URL.
+
+    asyncpg does not understand libpq query options such as `sslmode` or
+    `channel_binding`, so they are stripped from the URL and the SSL
+    requirement is returned as connect arguments instead.
+    """
+    url = make_url(database_url)
+    query = dict(url.query)
+    sslmode = query.pop("sslmode", None)
+    query.pop("channel_binding", None)
+
+    connect_args: dict = {}
+    if sslmode and sslmode != "disable":
+        connect_args["ssl"] = sslmode if sslmode != "allow" else "prefer"
+    elif "neon.tech" in (url.host or ""):
+        connect_args["ssl"] = "require"
+
+    url = url.set(drivername="postgresql+asyncpg", query=query)
+    return url, connect_args
+
+
+def create_db_engine(database_url: str | None = None, mode: str | None = None) -> Engine:
+    """
+    Build the application engine for the current deployment.
+
+    Modes:
+        queue:     persistent QueuePool sized by DB_POOL_SIZE/DB_MAX_OVERFLOW
+        pgbouncer: QueuePool in front of PgBouncer transaction pooling; no
+                   server-side prepared statements or session-level settings
+        null:      NullPool, a new connection per checkout (serverless only)
+    """
+    database_url = database_url or settings.DATABASE_URL
+    mode = resolve_pool_mode(mode)
+    kwargs: dict = {
+        "connect_args": build_connect_args(database_url, mode),
+        "echo": settings.APP_ENV == "local",
+    }
+
+    if mode == "null":
+        kwargs["poolclass"] = NullPool
+    else:
+        kwargs.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+            pool_use_lifo=True,
+        )
+
+    return create_engine(database_url, **kwargs)
+
+
+def create_async_db_engine(database_url: str | None = None, mode: str | None = None) -> AsyncEngine:
+    """
+    Build the asyncpg engine used by the API endpoints.
+
+    Takes the same DATABASE_URL and pool settings as create_db_engine.
+    """
+    url, ssl_args = to_async_url(database_url or settings.DATABASE_URL)
+    mode = resolve_pool_mode(mode)
+    kwargs: dict = {
+        "connect_args": {**build_connect_args(url, mode), **ssl_args},
+        "echo": settings.APP_ENV == "local",
+    }
+
+    if mode == "null":
+        kwargs["poolclass"] = NullPool
+    else:
+        kwargs.update(
+            poolclass=InstrumentedAsyncQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+            pool_use_lifo=True,
+        )
+
+    return create_async_engine(url, **kwargs)
+
+
+# Sync engine: Alembic, scripts and maintenance commands
+engine = create_db_engine()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine: request handling
+async_engine = create_async_db_engine()
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+if settings.SQL_INSTRUMENTATION:
+    instrument_engine(engine)
+    instrument_engine(async_engine.sync_engine)
+
 Base = declarative_base()
 
 
+def _describe_pool(pool, stats: PoolStats) -> dict:
+    status = stats.snapshot()
+
+    if isinstance(pool, QueuePool):
+        size = pool.size()
+        checked_out = pool.checkedout()
+        capacity = size + max(pool._max_overflow, 0)
+        status.update({
+            "pool_size": size,
+            "max_overflow": pool._max_overflow,
+            "checked_out": checked_out,
+            "idle": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "saturation": round(checked_out / capacity, 4) if capacity else 0.0,
+        })
+
+    return status
+
+
+def get_pool_status() -> dict:
+    """Current pool occupancy plus cumulative checkout wait statistics"""
+    return {
+        "mode": resolve_pool_mode(),
+        "async": _describe_pool(async_engine.pool, async_pool_stats),
+        "sync": _describe_pool(engine.pool, pool_stats),
+    }
+
+
 def get_db():
     """Dependency for getting database session"""
     db = SessionLocal()
@@ -23,3 +273,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Dependency for getting an async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
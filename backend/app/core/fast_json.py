@@ -0,0 +1,41 @@
+from typing import Any, Iterable, Sequence
+import orjson
+from fastapi import Response
+
+
+def encode(content: Any) -> bytes:
+    """
+    Encode to compact JSON bytes.
+
+    Matches what FastAPI's JSONResponse produces for the same data after
+    response_model validation (compact separators, raw UTF-8, naive
+    datetimes in ISO format with microseconds only when non-zero), so the
+    fast path is a drop-in for the response bytes.
+    """
+    return orjson.dumps(content)
+
+
+def records(fields: Sequence[str], rows: Iterable[Sequence[Any]]) -> list[dict]:
+    """Zip column tuples into dicts keyed (and ordered) by `fields`"""
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def json_response(content: Any, response: Response | None = None) -> Response:
+    """
+    Pre-encoded JSON response that bypasses response_model validation.
+
+    FastAPI does not merge headers set on an injected `response` into a
+    Response the endpoint returns, so pass it to carry them over (ETag etc).
+    """
+    return raw_json_response(encode(content), response)
+
+
+def raw_json_response(body: bytes, response: Response | None = None) -> Response:
+    """json_response for a body that is already encoded"""
+    headers = None
+    if response is not None:
+        headers = {
+            key: value for key, value in response.headers.items()
+            if key != "content-length"
+        }
+    return Response(content=body, headers=headers, media_type="application/json")
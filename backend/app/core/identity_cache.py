@@ -0,0 +1,87 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Generic, Hashable, Optional, TypeVar
+
+from app.core.config import settings
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    """
+    Bounded, thread-safe LRU cache with a per-entry expiry timestamp.
+
+    Entries are evicted when the cache is full (least recently used first)
+    or lazily on lookup once their expiry has passed.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data: "OrderedDict[Hashable, tuple[V, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[V]:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: V, expires_at: float) -> None:
+        if self.max_size <= 0 or expires_at <= time.time():
+            return
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+@dataclass(frozen=True)
+class CachedIdentity:
+    """Column snapshot of a User row, enough to rebuild a detached User"""
+    id: str
+    google_user_id: str
+    email: str
+    created_at: datetime
+    updated_at: datetime
+
+
+# token digest -> verified JWT payload, expiring at the token's own `exp`
+token_cache: LRUCache[dict[str, Any]] = LRUCache(settings.AUTH_TOKEN_CACHE_SIZE)
+
+# google `sub` -> resolved user identity
+identity_cache: LRUCache[CachedIdentity] = LRUCache(settings.AUTH_IDENTITY_CACHE_SIZE)
+
+
+def token_digest(token: str) -> bytes:
+    """Cache key for a raw bearer token (never keep the token itself around)"""
+    return hashlib.sha256(token.encode("utf-8")).digest()
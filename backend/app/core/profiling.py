@@ -0,0 +1,222 @@
+import hashlib
+import hmac
+import logging
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.core.auth import verify_token_cached
+from app.core.identity_cache import identity_cache
+from app.core.metrics import route_template
+
+logger = logging.getLogger("app.profiling")
+
+# Request header carrying a token from sign_profile_token
+PROFILE_HEADER = "X-Profile-Token"
+# Response header naming the profile written for the request
+PROFILE_FILE_HEADER = "X-Profile-File"
+
+PROFILE_FORMATS = {"speedscope": ".speedscope.json", "html": ".html"}
+
+# Longest validity sign_profile_token will issue
+MAX_TOKEN_TTL_SECONDS = 24 * 3600
+
+
+def _token_signature(secret: str, expires: int) -> str:
+    return hmac.new(secret.encode(), f"profile:{expires}".encode(), hashlib.sha256).hexdigest()
+
+
+def sign_profile_token(secret: str, ttl_seconds: int, now: float | None = None) -> str:
+    """
+    Value for the X-Profile-Token header, valid for ttl_seconds (capped at
+    MAX_TOKEN_TTL_SECONDS). Any request carrying it is profiled, subject to
+    the rate limit.
+    """
+    if not secret:
+        raise ValueError("PROFILE_SECRET is not set")
+    expires = int((time.time() if now is None else now) + min(ttl_seconds, MAX_TOKEN_TTL_SECONDS))
+    return f"{expires}.{_token_signature(secret, expires)}"
+
+
+def verify_profile_token(token: str, secret: str, now: float | None = None) -> bool:
+    if not secret:
+        return False
+    expires, _, signature = token.partition(".")
+    # isdigit() alone accepts digits int() rejects, such as "²"
+    if not (expires.isascii() and expires.isdigit() and len(expires) <= 12):
+        return False
+    if int(expires) <= (time.time() if now is None else now):
+        return False
+    return hmac.compare_digest(signature, _token_signature(secret, int(expires)))
+
+
+class ProfileRateLimiter:
+    """
+    At most `per_minute` profiles per sliding minute and one at a time, per
+    worker. Requests that do not get a slot are served unprofiled.
+    """
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self._starts: deque[float] = deque()
+        self._active = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def acquire(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            while self._starts and self._starts[0] <= now - 60:
+                self._starts.popleft()
+            if self._active or len(self._starts) >= self.per_minute:
+                self.rejected += 1
+                return False
+            self._starts.append(now)
+            self._active = True
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self._active = False
+
+
+def _bearer_subject(headers: Headers) -> dict | None:
+    """Verified JWT payload of the request, if it has a valid bearer token"""
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return verify_token_cached(token)
+    except Exception:
+        return None
+
+
+def _user_id(payload: dict | None) -> str | None:
+    """User id for a token subject the auth dependency has already resolved"""
+    if payload is None:
+        return None
+    identity = identity_cache.get(payload.get("sub"))
+    return identity.id if identity is not None else None
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", value).strip("_") or "root"
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in sampling profiler around single requests (pyinstrument, in async
+    mode so only the profiled request's task is sampled).
+
+    A request is profiled when it carries a valid X-Profile-Token, or when
+    its user is listed in PROFILE_USERS (user id, Google subject or email),
+    and the rate limiter has a slot. The profile is written to PROFILE_DIR
+    as `<utc time>-<method>-<route>-<user id>.<format>` and named in the
+    X-Profile-File response header; only the newest PROFILE_MAX_FILES are
+    kept.
+
+    Needs the optional `pyinstrument` package.
+    """
+
+    def __init__(
+        self,
+        app,
+        directory: str,
+        secret: str = "",
+        users: tuple[str, ...] = (),
+        output_format: str = "speedscope",
+        interval_seconds: float = 0.001,
+        max_per_minute: int = 6,
+        max_files: int = 200,
+    ):
+        try:
+            from pyinstrument import Profiler
+        except ImportError as e:
+            raise RuntimeError(
+                "PROFILE_ENABLED requires the pyinstrument package (pip install pyinstrument)"
+            ) from e
+        if output_format not in PROFILE_FORMATS:
+            raise ValueError(
+                f"PROFILE_FORMAT must be one of {', '.join(PROFILE_FORMATS)}, got {output_format!r}"
+            )
+        self.app = app
+        self.profiler_class = Profiler
+        self.directory = Path(directory)
+        self.secret = secret
+        self.users = frozenset(users)
+        self.output_format = output_format
+        self.interval_seconds = interval_seconds
+        self.max_files = max_files
+        self.limiter = ProfileRateLimiter(max_per_minute)
+
+    def _requested(self, headers: Headers) -> bool:
+        token = headers.get(PROFILE_HEADER)
+        if token and verify_profile_token(token, self.secret):
+            return True
+        if not self.users:
+            return False
+        payload = _bearer_subject(headers)
+        if payload is None:
+            return False
+        candidates = {payload.get("sub"), payload.get("email"), _user_id(payload)}
+        return not self.users.isdisjoint(candidates)
+
+    def _filename(self, scope, headers: Headers) -> str:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        user_id = _user_id(_bearer_subject(headers)) or "anonymous"
+        route = _slug(route_template(scope))
+        return f"{stamp}-{scope['method']}-{route}-{user_id}{PROFILE_FORMATS[self.output_format]}"
+
+    def _write(self, session, filename: str) -> None:
+        from pyinstrument.renderers import HTMLRenderer, SpeedscopeRenderer
+
+        renderer = SpeedscopeRenderer() if self.output_format == "speedscope" else HTMLRenderer()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / filename).write_text(renderer.render(session), encoding="utf-8")
+
+        if self.max_files > 0:
+            # Names start with the UTC time, so name order is age order
+            profiles = sorted(self.directory.glob(f"*{PROFILE_FORMATS[self.output_format]}"))
+            for stale in profiles[:max(len(profiles) - self.max_files, 0)]:
+                stale.unlink(missing_ok=True)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        if not self._requested(headers) or not self.limiter.acquire():
+            await self.app(scope, receive, send)
+            return
+
+        filename = None
+
+        async def send_with_profile(message):
+            nonlocal filename
+            if message["type"] == "http.response.start":
+                # Routed and authenticated by now, so route and user are known
+                filename = self._filename(scope, headers)
+                MutableHeaders(scope=message).append(PROFILE_FILE_HEADER, filename)
+            await send(message)
+
+        try:
+            profiler = self.profiler_class(interval=self.interval_seconds, async_mode="enabled")
+            profiler.start()
+            try:
+                await self.app(scope, receive, send_with_profile)
+            finally:
+                session = profiler.stop()
+                filename = filename or self._filename(scope, headers)
+                try:
+                    await run_in_threadpool(self._write, session, filename)
+                except Exception:
+                    logger.exception("could not write profile %s", filename)
+        finally:
+            self.limiter.release()
@@ -0,0 +1,226 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from fnmatch import fnmatchcase
+from typing import Iterator
+
+from fastapi import Depends
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import ORMExecuteState, Session
+from starlette.datastructures import MutableHeaders
+
+from app.core.config import settings
+from app.core.slow_queries import query_log
+
+logger = logging.getLogger("app.sql")
+
+# Relationships that must be loaded up front (selectinload/joinedload or an
+# explicit query). A lazy load on one of them inside a strict request is an
+# N+1 waiting to happen, so it fails instead of quietly issuing SQL.
+STRICT_LAZY_LOADS = ("Habit.versions", "Habit.completions", "User.*")
+
+# Longest slowest-statement text kept in log records
+STATEMENT_LOG_CHARS = 500
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """A strict request issued more statements than its declared budget"""
+
+
+class LazyLoadError(RuntimeError):
+    """A strict request lazy loaded a relationship in STRICT_LAZY_LOADS"""
+
+
+class QueryStats:
+    """Statements issued while handling one request (or track_queries block)"""
+
+    def __init__(self, budget: int | None = None, strict: bool = False):
+        self.budget = budget
+        self.strict = strict
+        self.count = 0
+        self.total_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement: str | None = None
+        self.lazy_loads: list[str] = []
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        if seconds >= self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.count > self.budget
+
+    def check_budget(self) -> None:
+        """Raise QueryBudgetExceeded if strict and over budget"""
+        if self.strict and self.over_budget:
+            raise QueryBudgetExceeded(
+                f"{self.count} queries issued, budget is {self.budget}"
+                f" (slowest: {self.slowest_statement!r})"
+            )
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: DB total with the count, and the slowest statement"""
+        return (
+            f'db;dur={self.total_seconds * 1000:.3f};desc="{self.count} queries", '
+            f"db-slowest;dur={self.slowest_seconds * 1000:.3f}"
+        )
+
+    def log_fields(self) -> dict:
+        statement = self.slowest_statement
+        if statement is not None:
+            statement = " ".join(statement.split())[:STATEMENT_LOG_CHARS]
+        return {
+            "db_queries": self.count,
+            "db_time_ms": round(self.total_seconds * 1000, 3),
+            "db_slowest_ms": round(self.slowest_seconds * 1000, 3),
+            "db_slowest_statement": statement,
+            "db_query_budget": self.budget,
+            "db_lazy_loads": self.lazy_loads,
+        }
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def current_query_stats() -> QueryStats | None:
+    """Stats of the request being handled, if instrumentation is on"""
+    return _current.get()
+
+
+@contextmanager
+def track_queries(budget: int | None = None, strict: bool = True) -> Iterator[QueryStats]:
+    """
+    Collect the statements issued inside the block, e.g. in a test or a
+    script. Strict by default: lazy loads in STRICT_LAZY_LOADS raise as they
+    happen, and exceeding `budget` raises on exit.
+    """
+    stats = QueryStats(budget, strict)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+    stats.check_budget()
+
+
+def query_budget(max_queries: int):
+    """
+    Route dependency declaring how many statements a request may issue,
+    authentication included:
+
+        @router.get("", dependencies=[query_budget(4)])
+    """
+    async def declare() -> None:
+        stats = _current.get()
+        if stats is not None:
+            stats.budget = max_queries
+
+    return Depends(declare)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if settings.SLOW_QUERY_LOG_ENABLED or _current.get() is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    seconds = time.perf_counter() - started
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, seconds)
+    if settings.SLOW_QUERY_LOG_ENABLED:
+        query_log.after_execute(conn, statement, parameters, executemany, seconds)
+
+
+def _on_orm_execute(orm_execute_state: ORMExecuteState) -> None:
+    stats = _current.get()
+    if stats is None or not orm_execute_state.is_select:
+        return
+    state = orm_execute_state.lazy_loaded_from
+    if state is None:
+        return
+
+    name = f"{state.class_.__name__}.{orm_execute_state.loader_strategy_path[-1].key}"
+    stats.lazy_loads.append(name)
+    if stats.strict and any(fnmatchcase(name, pattern) for pattern in STRICT_LAZY_LOADS):
+        raise LazyLoadError(f"lazy load of {name}; load it up front instead")
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Time every statement `engine` executes (pass AsyncEngine.sync_engine for async)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+event.listen(Session, "do_orm_execute", _on_orm_execute)
+
+
+class QueryStatsMiddleware:
+    """
+    Per-request SQL instrumentation.
+
+    Adds a Server-Timing header (app time to first byte, DB time and query
+    count, slowest statement) and logs one `app.sql` record per request with
+    the same numbers as structured fields. In strict mode (SQL_STRICT_MODE,
+    meant for tests) a request over its query_budget fails with
+    QueryBudgetExceeded, and lazy loads in STRICT_LAZY_LOADS with
+    LazyLoadError.
+    """
+
+    def __init__(self, app, strict: bool = False):
+        self.app = app
+        self.strict = strict
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(strict=self.strict)
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = None
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                stats.check_budget()
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    f"app;dur={(time.perf_counter() - started) * 1000:.3f}, {stats.server_timing()}",
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            endpoint = scope.get("endpoint")
+            logger.log(
+                logging.WARNING if stats.over_budget else logging.INFO,
+                "%s %s: %d queries in %.1f ms",
+                scope["method"],
+                scope["path"],
+                stats.count,
+                stats.total_seconds * 1000,
+                extra={
+                    "http_method": scope["method"],
+                    "http_path": scope["path"],
+                    "http_endpoint": getattr(endpoint, "__name__", None),
+                    "http_status": status,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                    **stats.log_fields(),
+                },
+            )
+        stats.check_budget()
@@ -0,0 +1,236 @@
+import hashlib
+import logging
+import math
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.sql.slow")
+
+SORT_KEYS = ("total", "p99", "p95", "calls", "max", "slow")
+
+# Statement text -> (fingerprint, normalized SQL). SQLAlchemy sends the same
+# handful of strings over and over, so normalizing is paid once per string;
+# the cap only matters for statements with literals inlined.
+_FINGERPRINT_CACHE_SIZE = 4096
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"(?<![\w$.])\d+(?:\.\d+)?\b")
+_PLACEHOLDERS = re.compile(r"\$\d+|%\(\w+\)s|%s|(?<![:\w]):\w+")
+# A list of placeholders, each possibly cast (asyncpg: `$1::VARCHAR`)
+_LISTS = re.compile(r"\(\s*\?(?:::[\w\[\]]+)?(?:\s*,\s*\?(?:::[\w\[\]]+)?)+\s*\)")
+_VALUES_ROWS = re.compile(r"(\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+")
+_SPACES = re.compile(r"\s+")
+# Row-locking clause of a SELECT, wherever the line breaks fall
+_LOCKING = re.compile(r"\bfor\s+(no\s+key\s+)?(update|share|key\s+share)\b")
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    SQL with comments, literals and bind placeholders replaced by `?` and
+    IN / VALUES lists collapsed, so statements differing only in values or
+    list length normalize the same.
+    """
+    sql = _COMMENTS.sub(" ", statement)
+    sql = _STRINGS.sub("?", sql)
+    sql = _PLACEHOLDERS.sub("?", sql)
+    sql = _NUMBERS.sub("?", sql)
+    sql = _LISTS.sub("(...)", sql)
+    sql = _VALUES_ROWS.sub(r"\1", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def _explainable(statement: str) -> bool:
+    """Plain reads only: EXPLAIN ANALYZE runs the statement again"""
+    head = statement.lstrip().lower()
+    return head.startswith("select") and not _LOCKING.search(head)
+
+
+class FingerprintStats:
+    """Counters and a rolling window of durations for one normalized statement"""
+
+    def __init__(self, fingerprint: str, sql: str, window: int):
+        self.fingerprint = fingerprint
+        self.sql = sql
+        self.calls = 0
+        self.slow_calls = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seen = 0.0
+        self.durations: deque[float] = deque(maxlen=window)
+        self.plan: str | None = None
+        self.plan_seconds: float | None = None
+        self.plan_captured_at = 0.0
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.durations)
+        return {
+            "fingerprint": self.fingerprint,
+            "sql": self.sql,
+            "calls": self.calls,
+            "slow_calls": self.slow_calls,
+            "total_ms": round(self.total_seconds * 1000, 3),
+            "mean_ms": round(self.total_seconds * 1000 / self.calls, 3) if self.calls else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 3),
+            "p50_ms": round(_percentile(ordered, 0.50) * 1000, 3),
+            "p95_ms": round(_percentile(ordered, 0.95) * 1000, 3),
+            "p99_ms": round(_percentile(ordered, 0.99) * 1000, 3),
+            "window": len(ordered),
+            "last_seen": self.last_seen,
+            "plan": self.plan,
+            "plan_ms": round(self.plan_seconds * 1000, 3) if self.plan_seconds is not None else None,
+        }
+
+
+class SlowQueryLog:
+    """
+    In-process statement statistics keyed by SQL fingerprint (per worker).
+
+    Every statement an instrumented engine runs is counted, with the last
+    `window` durations kept for p50/p95/p99. Statements slower than
+    `threshold_seconds` are also logged to `app.sql.slow`, and with
+    `explain` on, a slow plain SELECT gets an `EXPLAIN (ANALYZE, BUFFERS)`
+    captured in its own transaction, at most once per fingerprint every
+    `explain_interval_seconds`. Only the `max_fingerprints` most recently
+    seen fingerprints are kept.
+    """
+
+    def __init__(
+        self,
+        threshold_seconds: float,
+        window: int = 1000,
+        max_fingerprints: int = 500,
+        explain: bool = False,
+        explain_interval_seconds: float = 300,
+    ):
+        self.threshold_seconds = threshold_seconds
+        self.window = window
+        self.max_fingerprints = max_fingerprints
+        self.explain = explain
+        self.explain_interval_seconds = explain_interval_seconds
+        self._stats: "OrderedDict[str, FingerprintStats]" = OrderedDict()
+        self._fingerprints: dict[str, tuple[str, str]] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def fingerprint(self, statement: str) -> tuple[str, str]:
+        """(fingerprint, normalized SQL) for a statement"""
+        cached = self._fingerprints.get(statement)
+        if cached is None:
+            sql = normalize_sql(statement)
+            cached = (hashlib.sha1(sql.encode()).hexdigest()[:16], sql)
+            if len(self._fingerprints) >= _FINGERPRINT_CACHE_SIZE:
+                self._fingerprints.clear()
+            self._fingerprints[statement] = cached
+        return cached
+
+    def record(self, statement: str, seconds: float) -> FingerprintStats:
+        fingerprint, sql = self.fingerprint(statement)
+        now = time.time()
+        with self._lock:
+            stats = self._stats.get(fingerprint)
+            if stats is None:
+                stats = self._stats[fingerprint] = FingerprintStats(fingerprint, sql, self.window)
+                while len(self._stats) > self.max_fingerprints:
+                    self._stats.popitem(last=False)
+            else:
+                self._stats.move_to_end(fingerprint)
+            stats.calls += 1
+            stats.total_seconds += seconds
+            stats.last_seen = now
+            stats.durations.append(seconds)
+            if seconds > stats.max_seconds:
+                stats.max_seconds = seconds
+            if seconds >= self.threshold_seconds:
+                stats.slow_calls += 1
+        return stats
+
+    def after_execute(self, conn, statement, parameters, executemany: bool, seconds: float) -> None:
+        """Engine hook, called by query_stats once the statement has run"""
+        stats = self.record(statement, seconds)
+        if seconds < self.threshold_seconds:
+            return
+
+        logger.warning(
+            "slow query %s: %.1f ms",
+            stats.fingerprint,
+            seconds * 1000,
+            extra={
+                "db_fingerprint": stats.fingerprint,
+                "db_duration_ms": round(seconds * 1000, 3),
+                "db_statement": stats.sql,
+            },
+        )
+        if (
+            self.explain
+            and not executemany
+            and _explainable(statement)
+            and time.time() - stats.plan_captured_at >= self.explain_interval_seconds
+        ):
+            stats.plan_captured_at = time.time()
+            self._capture_plan(conn, statement, parameters, stats, seconds)
+
+    def _capture_plan(self, conn, statement, parameters, stats: FingerprintStats, seconds: float) -> None:
+        """
+        EXPLAIN (ANALYZE, BUFFERS) the statement inside a savepoint of the
+        transaction it ran in, on a raw DBAPI cursor so the statement's own
+        result is untouched and no engine events fire. Failures are logged
+        and rolled back to the savepoint.
+        """
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.execute("SAVEPOINT slow_query_explain")
+            try:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+                plan = "\n".join(row[0] for row in cursor.fetchall())
+                cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+            except Exception:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                raise
+        except Exception:
+            logger.exception("could not capture a plan for %s", stats.fingerprint)
+            return
+        finally:
+            cursor.close()
+
+        with self._lock:
+            stats.plan = plan
+            stats.plan_seconds = seconds
+
+    def top(self, limit: int = 20, sort: str = "total") -> list[dict]:
+        """The `limit` fingerprints with the highest `sort` (one of SORT_KEYS)"""
+        if sort not in SORT_KEYS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_KEYS)}, got {sort!r}")
+        with self._lock:
+            snapshots = [stats.snapshot() for stats in self._stats.values()]
+        key = {
+            "total": "total_ms", "p99": "p99_ms", "p95": "p95_ms",
+            "calls": "calls", "max": "max_ms", "slow": "slow_calls",
+        }[sort]
+        snapshots.sort(key=lambda item: item[key], reverse=True)
+        return snapshots[:limit]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+        self.started_at = time.time()
+
+
+query_log = SlowQueryLog(
+    threshold_seconds=settings.SLOW_QUERY_THRESHOLD_MS / 1000,
+    window=settings.SLOW_QUERY_WINDOW,
+    max_fingerprints=settings.SLOW_QUERY_MAX_FINGERPRINTS,
+    explain=settings.SLOW_QUERY_EXPLAIN,
+    explain_interval_seconds=settings.SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS,
+)
@@ -3,5 +3,21 @@ from app.models.goal import Goal
 from app.models.habit import Habit
 from app.models.habit_version import HabitVersion
 from app.models.habit_completion import HabitCompletion
+from app.models.habit_week_count import HabitWeekCount
+from app.models.user_change_counter import UserChangeCounter
+from app.models.habit_streak import HabitStreak
+from app.models.goal_week_rollup import GoalWeekRollup
+from app.models.completion_week_revision import CompletionWeekRevision
 
-__all__ = ["User", "Goal", "Habit", "HabitVersion", "HabitCompletion"]
+__all__ = [
+    "User",
+    "Goal",
+    "Habit",
+    "HabitVersion",
+    "HabitCompletion",
+    "HabitWeekCount",
+    "UserChangeCounter",
+    "HabitStreak",
+    "GoalWeekRollup",
+    "CompletionWeekRevision",
+]
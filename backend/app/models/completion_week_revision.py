@@ -0,0 +1,18 @@
+from sqlalchemy import Column, BigInteger, Date, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from app.core.database import Base
+
+
+class CompletionWeekRevision(Base):
+    """
+    Revision of one user's completions in one week.
+
+    Bumped in the same statement as every completion insert or delete in
+    that week, so a serialized copy of the week stays valid for as long as
+    the revision it was built under is current.
+    """
+    __tablename__ = "completion_week_revisions"
+
+    user_id = Column(UUID(as_uuid=False), ForeignKey("users.id"), primary_key=True)
+    week_start = Column(Date, primary_key=True)
+    revision = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, Date, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from app.core.database import Base
+
+
+class GoalWeekRollup(Base):
+    """
+    Weekly target vs. achieved completions across the habits linked to a
+    goal, maintained by goal_rollup_service.
+
+    A habit contributes to the goal its active version links to that week:
+    the version's weekly target, and its completions capped at that target
+    so over-completing one habit cannot mask another.
+    """
+    __tablename__ = "goal_week_rollups"
+
+    goal_id = Column(UUID(as_uuid=False), ForeignKey("goals.id"), primary_key=True)
+    week_start = Column(Date, primary_key=True)
+    user_id = Column(UUID(as_uuid=False), ForeignKey("users.id"), nullable=False, index=True)
+    target = Column(Integer, nullable=False, default=0)
+    achieved = Column(Integer, nullable=False, default=0)
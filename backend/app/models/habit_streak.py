@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, Date, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+from app.core.database import Base
+
+
+class HabitStreak(Base):
+    """
+    Persisted streak state of a habit, maintained by streak_service.
+
+    A week qualifies when its completions reach the active version's
+    weekly target. current_streak is the length of the run of consecutive
+    qualifying weeks ending at last_qualifying_week; whether that run is
+    still live depends on today's date (see effective_current_streak).
+    """
+    __tablename__ = "habit_streaks"
+
+    habit_id = Column(UUID(as_uuid=False), ForeignKey("habits.id"), primary_key=True)
+    user_id = Column(UUID(as_uuid=False), ForeignKey("users.id"), nullable=False, index=True)
+    current_streak = Column(Integer, nullable=False, default=0)
+    best_streak = Column(Integer, nullable=False, default=0)
+    last_qualifying_week = Column(Date, nullable=True)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, Date, ForeignKey, CheckConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from app.core.database import Base
+
+
+class HabitWeekCount(Base):
+    """
+    Materialized completion count per habit-week.
+
+    Maintained in the same transaction as every completion insert and
+    delete, so target checks and progress views never COUNT(*) history.
+    """
+    __tablename__ = "habit_week_counts"
+    __table_args__ = (
+        CheckConstraint("count >= 0", name="check_week_count_non_negative"),
+    )
+
+    user_id = Column(UUID(as_uuid=False), ForeignKey("users.id"), primary_key=True)
+    habit_id = Column(UUID(as_uuid=False), ForeignKey("habits.id"), primary_key=True)
+    week_start = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
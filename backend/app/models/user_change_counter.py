@@ -0,0 +1,18 @@
+from sqlalchemy import Column, BigInteger, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from app.core.database import Base
+
+
+class UserChangeCounter(Base):
+    """
+    Per-user revision numbers, one per cached resource family.
+
+    Bumped in the same transaction as every write to that family, so a
+    read can tell whether a client's copy is current from this row alone.
+    """
+    __tablename__ = "user_change_counters"
+
+    user_id = Column(UUID(as_uuid=False), ForeignKey("users.id"), primary_key=True)
+    habits = Column(BigInteger, nullable=False, default=0)
+    goals = Column(BigInteger, nullable=False, default=0)
+    completions = Column(BigInteger, nullable=False, default=0)
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import date, datetime
-from typing import Optional
+from typing import Optional, List
 
 
 class CompletionCreate(BaseModel):
@@ -8,7 +8,25 @@ class CompletionCreate(BaseModel):
     date: str = Field(..., pattern=r"^\d{4}-\d{2}-\d{2}$")
     text: Optional[str] = None
     client_timezone: Optional[str] = None
-    client_tz_offset_minutes: Optional[int] = None
+    # Real offsets run from UTC-12:00 to UTC+14:00
+    client_tz_offset_minutes: Optional[int] = Field(None, ge=-840, le=840)
+
+
+class CompletionBatchCreate(BaseModel):
+    items: List[CompletionCreate] = Field(..., min_length=1, max_length=500)
+
+
+class CompletionBatchItemResult(BaseModel):
+    index: int
+    id: Optional[str] = None
+    remaining: Optional[int] = None
+    errorCode: Optional[str] = None
+    message: Optional[str] = None
+
+
+class CompletionBatchResponse(BaseModel):
+    created: int
+    results: List[CompletionBatchItemResult]
 
 
 class CompletionResponse(BaseModel):
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
-from datetime import datetime
-from typing import Optional
+from datetime import date, datetime
+from typing import List, Optional
 
 
 class GoalCreate(BaseModel):
@@ -15,6 +15,13 @@ class GoalUpdate(BaseModel):
     description: Optional[str] = None
 
 
+class GoalProgressSummary(BaseModel):
+    # Sums over the goal year's weeks so far; achieved counts each
+    # habit-week up to its target
+    target: int
+    achieved: int
+
+
 class GoalResponse(BaseModel):
     id: str
     title: str
@@ -22,6 +29,23 @@ class GoalResponse(BaseModel):
     description: Optional[str]
     created_at: datetime
     updated_at: datetime
+    # Only with include_progress
+    progress: Optional[GoalProgressSummary] = None
 
     class Config:
         from_attributes = True
+
+
+class GoalWeekProgress(BaseModel):
+    week_start: date
+    target: int
+    achieved: int
+
+
+class GoalProgressResponse(BaseModel):
+    goal_id: str
+    year: int
+    target: int
+    achieved: int
+    # Weeks starting in the year, through the current week, oldest first
+    weeks: List[GoalWeekProgress]
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import date, datetime
-from typing import Optional, List
+from typing import Optional, List, Dict
 
 
 class HabitVersionResponse(BaseModel):
@@ -17,6 +17,13 @@ class HabitVersionResponse(BaseModel):
         from_attributes = True
 
 
+class HabitStreakResponse(BaseModel):
+    # Consecutive weeks meeting the target, still live as of this week
+    current: int
+    best: int
+    last_qualifying_week: Optional[date]
+
+
 class HabitResponse(BaseModel):
     id: str
     name: str
@@ -26,11 +33,37 @@ class HabitResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     versions: List[HabitVersionResponse]
+    # Only present when requested with include_streaks
+    streak: Optional[HabitStreakResponse] = None
 
     class Config:
         from_attributes = True
 
 
+class HabitActiveVersions(BaseModel):
+    habit_id: str
+    # week_start -> id of the version active that week (weeks before the
+    # habit's first version are omitted)
+    weeks: Dict[date, str]
+
+
+class HabitHeatmapRow(BaseModel):
+    habit_id: str
+    # One of these, per the requested encoding: completions per grid day,
+    # or base64 of one bit per grid day (first day in the high bit)
+    counts: Optional[List[int]] = None
+    bitset: Optional[str] = None
+
+
+class HabitHeatmapResponse(BaseModel):
+    year: int
+    # Monday on or before Jan 1; the grid is `days` long, in whole weeks
+    start: date
+    days: int
+    encoding: str
+    habits: List[HabitHeatmapRow]
+
+
 class HabitCreate(BaseModel):
     name: str = Field(..., min_length=1, max_length=80)
     weekly_target: int = Field(..., ge=1)
@@ -39,7 +72,7 @@ class HabitCreate(BaseModel):
     description: Optional[str] = None
     order_index: int = 0
     client_timezone: Optional[str] = None
-    client_tz_offset_minutes: Optional[int] = None
+    client_tz_offset_minutes: Optional[int] = Field(None, ge=-840, le=840)
 
 
 class HabitUpdate(BaseModel):
@@ -50,4 +83,10 @@ class HabitUpdate(BaseModel):
     description: Optional[str] = None
     order_index: int = 0
     client_timezone: Optional[str] = None
-    client_tz_offset_minutes: Optional[int] = None
+    client_tz_offset_minutes: Optional[int] = Field(None, ge=-840, le=840)
+
+
+class HabitOrderUpdate(BaseModel):
+    # Habits in their new display order; order_index becomes the position.
+    # Habits left out keep their current order_index.
+    habit_ids: List[str] = Field(..., min_length=1, max_length=500)
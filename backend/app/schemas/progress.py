@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from datetime import date
+from typing import List
+
+
+class WeekProgress(BaseModel):
+    week_start: date
+    target: int
+    done: int
+    remaining: int
+
+
+class HabitWeeklyProgress(BaseModel):
+    habit_id: str
+    # Weeks where the habit has an active version, oldest first
+    weeks: List[WeekProgress]
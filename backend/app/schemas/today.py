@@ -0,0 +1,32 @@
+from pydantic import BaseModel
+from datetime import date, datetime
+from typing import List
+from app.schemas.user import UserResponse
+from app.schemas.goal import GoalResponse
+from app.schemas.habit import HabitVersionResponse
+from app.schemas.completion import CompletionResponse
+
+
+class TodayHabit(BaseModel):
+    id: str
+    name: str
+    order_index: int
+    created_at: datetime
+    updated_at: datetime
+    # Version active for the client's current week
+    version: HabitVersionResponse
+    completed: int
+    remaining: int
+
+
+class TodayResponse(BaseModel):
+    user: UserResponse
+    # The client's local date and the week containing it
+    today: date
+    week_start: date
+    week_end: date
+    # Non-deleted habits with a version active this week
+    habits: List[TodayHabit]
+    goals: List[GoalResponse]
+    # This week's completions, most recent first
+    completions: List[CompletionResponse]
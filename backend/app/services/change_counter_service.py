@@ -0,0 +1,65 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from app.models.user_change_counter import UserChangeCounter
+
+# Resource families with their own revision counter
+SCOPES = ("habits", "goals", "completions")
+
+
+async def bump_change_counters_async(
+    db: AsyncSession,
+    user_id: str,
+    *scopes: str,
+) -> None:
+    """
+    Increment the user's revision for each scope. Call inside the write's
+    transaction, before commit, and before touching streaks or goal
+    rollups: completion writes lock this row first, so any other order can
+    deadlock against them.
+    
+    Args:
+        db: Async database session
+        user_id: UUID of the user
+        scopes: One or more of SCOPES
+    """
+    for scope in scopes:
+        if scope not in SCOPES:
+            raise ValueError(f"Unknown change counter scope: {scope}")
+    
+    column = UserChangeCounter.__table__.c
+    stmt = insert(UserChangeCounter).values(
+        user_id=user_id,
+        **{scope: 1 for scope in scopes},
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[UserChangeCounter.user_id],
+            set_={scope: column[scope] + 1 for scope in scopes},
+        )
+    )
+
+
+async def get_change_counters_async(
+    db: AsyncSession,
+    user_id: str,
+) -> dict[str, int]:
+    """
+    Current revision of every scope for the user, in one primary-key lookup.
+    
+    Args:
+        db: Async database session
+        user_id: UUID of the user
+    
+    Returns:
+        {scope: revision}; 0 for scopes never written
+    """
+    row = (await db.execute(
+        select(*(getattr(UserChangeCounter, scope) for scope in SCOPES)).where(
+            UserChangeCounter.user_id == user_id
+        )
+    )).first()
+    
+    if row is None:
+        return dict.fromkeys(SCOPES, 0)
+    return dict(zip(SCOPES, row))
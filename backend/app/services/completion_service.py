@@ -1,7 +1,37 @@
-from datetime import date
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Iterable
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, text, tuple_, bindparam, Boolean, Date, DateTime, Integer, String
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from app.models.habit import Habit
 from app.models.habit_completion import HabitCompletion
+from app.models.habit_week_count import HabitWeekCount
+from app.services.change_counter_service import bump_change_counters_async
+from app.services.streak_service import apply_week_qualification_async, qualification_changed
+from app.services.goal_rollup_service import apply_completion_delta_async, refresh_goal_rollups_async
+from app.core.errors import (
+    APIError,
+    HabitNotFoundError,
+    HabitDeletedError,
+    HabitNotActiveForWeekError,
+    WeeklyTargetAlreadyMetError,
+    TextRequiredError,
+    ValidationError,
+)
+from app.utils.cursors import decode_cursor, encode_cursor
+from app.utils.date_utils import get_week_range, get_week_start
+
+# Sort key of every completion listing. id makes it total, so keyset
+# cursors never skip or repeat rows that tie on (date, created_at); the
+# idx_completions_*_keyset indexes match it.
+COMPLETION_ORDER = (
+    HabitCompletion.date.desc(),
+    HabitCompletion.created_at.desc(),
+    HabitCompletion.id.desc(),
+)
 
 
 def calculate_remaining(
@@ -33,16 +63,9 @@ def calculate_remaining(
     
     weekly_target = version.weekly_target
     
-    # Count completions in the week
-    completed_count = (
-        db.query(func.count(HabitCompletion.id))
-        .filter(
-            HabitCompletion.habit_id == habit_id,
-            HabitCompletion.user_id == user_id,
-            HabitCompletion.date >= week_start,
-            HabitCompletion.date <= week_end,
-        )
-        .scalar() or 0
+    # Read the materialized weekly count
+    completed_count = count_completions_in_week(
+        db, habit_id, week_start, week_end, user_id
     )
     
     remaining = weekly_target - completed_count
@@ -59,25 +82,621 @@ def count_completions_in_week(
     """
     Count completion instances for a habit in a given week.
     
+    Reads habit_week_counts, which is kept in step with habit_completions
+    by every write path, so this is a primary-key lookup.
+    
     Args:
         db: Database session
         habit_id: UUID of the habit
         week_start: Monday date of the week
-        week_end: Sunday date of the week
+        week_end: Sunday date of the week (implied by week_start)
         user_id: UUID of the user
     
     Returns:
         Count of completion instances
     """
-    count = (
-        db.query(func.count(HabitCompletion.id))
-        .filter(
-            HabitCompletion.habit_id == habit_id,
-            HabitCompletion.user_id == user_id,
-            HabitCompletion.date >= week_start,
-            HabitCompletion.date <= week_end,
+    count = db.scalar(_week_count_query(habit_id, week_start, user_id))
+    
+    return count or 0
+
+
+async def calculate_remaining_async(
+    db: AsyncSession,
+    habit_id: str,
+    week_start: date,
+    week_end: date,
+    user_id: str,
+) -> int:
+    """
+    Async variant of calculate_remaining.
+    
+    Returns:
+        Number of remaining instances (never negative, minimum 0)
+    """
+    from app.services.habit_service import get_active_version_async
+    
+    version = await get_active_version_async(db, habit_id, week_start)
+    if not version:
+        return 0
+    
+    completed_count = await count_completions_in_week_async(
+        db, habit_id, week_start, week_end, user_id
+    )
+    
+    return max(0, version.weekly_target - completed_count)
+
+
+async def count_completions_in_week_async(
+    db: AsyncSession,
+    habit_id: str,
+    week_start: date,
+    week_end: date,
+    user_id: str,
+) -> int:
+    """
+    Async variant of count_completions_in_week.
+    
+    Returns:
+        Count of completion instances
+    """
+    count = await db.scalar(_week_count_query(habit_id, week_start, user_id))
+    
+    return count or 0
+
+
+def encode_completion_cursor(completion_date: date, created_at: datetime, completion_id: str) -> str:
+    """Keyset cursor positioned just after the given completion"""
+    return encode_cursor({
+        "date": completion_date.isoformat(),
+        "created_at": created_at.isoformat(),
+        "id": completion_id,
+    })
+
+
+def completion_seek_condition(cursor: str):
+    """
+    WHERE clause selecting the completions after a cursor in COMPLETION_ORDER.
+    
+    A row comparison, so Postgres runs it as an index range scan from the
+    cursor position instead of counting past skipped rows like OFFSET.
+    
+    Raises:
+        ValidationError: If the cursor is malformed
+    """
+    position = decode_cursor(cursor, "date", "created_at", "id")
+    try:
+        key = (
+            date.fromisoformat(position["date"]),
+            datetime.fromisoformat(position["created_at"]),
+            str(uuid.UUID(position["id"])),
         )
-        .scalar() or 0
+    except (TypeError, ValueError):
+        raise ValidationError("Invalid cursor")
+    
+    return tuple_(
+        HabitCompletion.date,
+        HabitCompletion.created_at,
+        HabitCompletion.id,
+    ) < key
+
+
+def _week_count_query(habit_id: str, week_start: date, user_id: str):
+    return select(HabitWeekCount.count).where(
+        HabitWeekCount.user_id == user_id,
+        HabitWeekCount.habit_id == habit_id,
+        HabitWeekCount.week_start == get_week_start(week_start),
     )
+
+
+# Ownership, active-version resolution, the weekly counter bump and the
+# conditional INSERT in one statement. The counter upsert is what makes the
+# target check atomic: ON CONFLICT DO UPDATE locks the counter row and
+# evaluates its WHERE against the latest committed count, so concurrent
+# taps queue on the row instead of all passing a stale check. A successful
+# insert also bumps the user's completions revision (see
+# change_counter_service) and the week's revision (see
+# completion_week_cache). The trailing SELECT always yields one row so a
+# rejected insert still reports why.
+_CREATE_COMPLETION_SQL = text("""
+WITH habit AS (
+    SELECT h.id, h.user_id = :user_id AS owned, h.is_deleted
+    FROM habits h
+    WHERE h.id = :habit_id
+),
+version AS (
+    SELECT v.weekly_target, v.requires_text_on_completion, v.linked_goal_id
+    FROM habit_versions v
+    WHERE v.habit_id = :habit_id
+      AND v.effective_week_start <= :week_start
+    ORDER BY v.effective_week_start DESC, v.created_at DESC
+    LIMIT 1
+),
+current_count AS (
+    SELECT w.count
+    FROM habit_week_counts w
+    WHERE w.user_id = :user_id
+      AND w.habit_id = :habit_id
+      AND w.week_start = :week_start
+),
+bumped AS (
+    INSERT INTO habit_week_counts (user_id, habit_id, week_start, count)
+    SELECT :user_id, :habit_id, :week_start, 1
+    FROM habit, version
+    WHERE habit.owned
+      AND NOT habit.is_deleted
+      AND (NOT version.requires_text_on_completion OR :has_text)
+    ON CONFLICT (user_id, habit_id, week_start) DO UPDATE
+        SET count = habit_week_counts.count + 1
+        WHERE habit_week_counts.count < (SELECT weekly_target FROM version)
+    RETURNING count
+),
+inserted AS (
+    INSERT INTO habit_completions (id, user_id, habit_id, date, text, created_at, updated_at)
+    SELECT :completion_id, :user_id, :habit_id, :date, :text, :now, :now
+    FROM bumped
+    RETURNING id
+),
+touched AS (
+    INSERT INTO user_change_counters (user_id, completions)
+    SELECT :user_id, 1 FROM inserted
+    ON CONFLICT (user_id) DO UPDATE
+        SET completions = user_change_counters.completions + 1
+),
+week_touched AS (
+    INSERT INTO completion_week_revisions (user_id, week_start, revision)
+    SELECT :user_id, :week_start, 1 FROM inserted
+    ON CONFLICT (user_id, week_start) DO UPDATE
+        SET revision = completion_week_revisions.revision + 1
+)
+SELECT
+    (SELECT count(*) FROM habit) > 0 AS habit_found,
+    (SELECT owned FROM habit) AS owned,
+    (SELECT is_deleted FROM habit) AS is_deleted,
+    (SELECT weekly_target FROM version) AS weekly_target,
+    (SELECT requires_text_on_completion FROM version) AS requires_text,
+    (SELECT linked_goal_id FROM version) AS linked_goal_id,
+    coalesce((SELECT count - 1 FROM bumped), (SELECT count FROM current_count), 0) AS completed,
+    (SELECT id FROM inserted) AS completion_id
+""").bindparams(
+    bindparam("user_id", type_=UUID(as_uuid=False)),
+    bindparam("habit_id", type_=UUID(as_uuid=False)),
+    bindparam("completion_id", type_=UUID(as_uuid=False)),
+    bindparam("week_start", type_=Date),
+    bindparam("date", type_=Date),
+    bindparam("text", type_=String),
+    bindparam("now", type_=DateTime),
+    bindparam("has_text", type_=Boolean),
+).columns(
+    habit_found=Boolean,
+    owned=Boolean,
+    is_deleted=Boolean,
+    weekly_target=Integer,
+    requires_text=Boolean,
+    linked_goal_id=UUID(as_uuid=False),
+    completed=Integer,
+    completion_id=UUID(as_uuid=False),
+)
+
+_PAIRS_PARAMS = (
+    bindparam("user_id", type_=UUID(as_uuid=False)),
+    bindparam("habit_ids", type_=ARRAY(UUID(as_uuid=False))),
+    bindparam("week_starts", type_=ARRAY(Date)),
+)
+
+# Make sure a counter row exists for every owned habit-week in a batch, in
+# key order so overlapping batches wait on each other instead of deadlocking
+_ENSURE_WEEK_COUNTS_SQL = text("""
+INSERT INTO habit_week_counts (user_id, habit_id, week_start, count)
+SELECT :user_id, p.habit_id, p.week_start, 0
+FROM unnest(:habit_ids, :week_starts) AS p(habit_id, week_start)
+JOIN habits h ON h.id = p.habit_id AND h.user_id = :user_id
+ORDER BY p.habit_id, p.week_start
+ON CONFLICT (user_id, habit_id, week_start) DO NOTHING
+""").bindparams(*_PAIRS_PARAMS)
+
+# FOR UPDATE both serializes concurrent writers and, under READ COMMITTED,
+# returns the latest committed count of each row it had to wait for
+_LOCK_WEEK_COUNTS_SQL = text("""
+SELECT w.habit_id, w.week_start, w.count
+FROM habit_week_counts w
+JOIN unnest(:habit_ids, :week_starts) AS p(habit_id, week_start)
+  ON w.habit_id = p.habit_id AND w.week_start = p.week_start
+WHERE w.user_id = :user_id
+ORDER BY w.habit_id, w.week_start
+FOR UPDATE OF w
+""").bindparams(*_PAIRS_PARAMS).columns(
+    habit_id=UUID(as_uuid=False),
+    week_start=Date,
+    count=Integer,
+)
+
+_ADD_WEEK_COUNTS_SQL = text("""
+UPDATE habit_week_counts w
+SET count = w.count + d.delta
+FROM unnest(:habit_ids, :week_starts, :deltas) AS d(habit_id, week_start, delta)
+WHERE w.user_id = :user_id
+  AND w.habit_id = d.habit_id
+  AND w.week_start = d.week_start
+""").bindparams(*_PAIRS_PARAMS, bindparam("deltas", type_=ARRAY(Integer)))
+
+# Delete, decrement and bump the completions and week revisions in one
+# statement; reports the deleted row's habit and date so callers can
+# invalidate anything derived from that week
+_DELETE_COMPLETION_SQL = text("""
+WITH deleted AS (
+    DELETE FROM habit_completions
+    WHERE id = :completion_id AND user_id = :user_id
+    RETURNING habit_id, date
+),
+decremented AS (
+    UPDATE habit_week_counts w
+    SET count = w.count - 1
+    FROM deleted
+    WHERE w.user_id = :user_id
+      AND w.habit_id = deleted.habit_id
+      AND w.week_start = date_trunc('week', deleted.date)::date
+      AND w.count > 0
+    RETURNING w.count
+),
+touched AS (
+    INSERT INTO user_change_counters (user_id, completions)
+    SELECT :user_id, 1 FROM deleted
+    ON CONFLICT (user_id) DO UPDATE
+        SET completions = user_change_counters.completions + 1
+),
+week_touched AS (
+    INSERT INTO completion_week_revisions (user_id, week_start, revision)
+    SELECT :user_id, date_trunc('week', date)::date, 1 FROM deleted
+    ON CONFLICT (user_id, week_start) DO UPDATE
+        SET revision = completion_week_revisions.revision + 1
+)
+SELECT habit_id, date, (SELECT count FROM decremented) AS week_count FROM deleted
+""").bindparams(
+    bindparam("completion_id", type_=UUID(as_uuid=False)),
+    bindparam("user_id", type_=UUID(as_uuid=False)),
+).columns(habit_id=UUID(as_uuid=False), date=Date, week_count=Integer)
+
+
+# Batch counterpart of the week_touched CTEs, one row per distinct week in
+# week order (the same order concurrent batches lock them in)
+_BUMP_WEEK_REVISIONS_SQL = text("""
+INSERT INTO completion_week_revisions (user_id, week_start, revision)
+SELECT :user_id, w.week_start, 1
+FROM unnest(:week_starts) AS w(week_start)
+ORDER BY w.week_start
+ON CONFLICT (user_id, week_start) DO UPDATE
+    SET revision = completion_week_revisions.revision + 1
+""").bindparams(_PAIRS_PARAMS[0], _PAIRS_PARAMS[2])
+
+
+def _pairs_params(user_id: str, pairs) -> dict:
+    pairs = sorted(pairs)
+    return {
+        "user_id": user_id,
+        "habit_ids": [habit_id for habit_id, _ in pairs],
+        "week_starts": [week_start for _, week_start in pairs],
+    }
+
+
+@dataclass(frozen=True)
+class CompletionInsertResult:
+    """Outcome of create_completion_async"""
+    habit_found: bool
+    owned: bool | None
+    is_deleted: bool | None
+    weekly_target: int | None
+    requires_text: bool | None
+    completed: int
+    completion_id: str | None
+    has_text: bool = False
+    linked_goal_id: str | None = None
+
+    @property
+    def remaining(self) -> int:
+        """Remaining instances for the week, counting the new completion"""
+        if self.weekly_target is None:
+            return 0
+        done = self.completed + (1 if self.completion_id else 0)
+        return max(0, self.weekly_target - done)
+
+    def error(self) -> APIError | None:
+        """The canonical API error for a rejected insert, None on success"""
+        if self.completion_id:
+            return None
+        if not self.habit_found:
+            return HabitNotFoundError()
+        if self.is_deleted:
+            return HabitDeletedError()
+        if not self.owned:
+            return HabitNotFoundError()
+        if self.weekly_target is None:
+            return HabitNotActiveForWeekError()
+        if (
+            self.completed < self.weekly_target
+            and self.requires_text
+            and not self.has_text
+        ):
+            return TextRequiredError("Text is required for this habit")
+        return WeeklyTargetAlreadyMetError()
+
+
+async def create_completion_async(
+    db: AsyncSession,
+    user_id: str,
+    habit_id: str,
+    completion_date: date,
+    completion_text: str | None,
+) -> CompletionInsertResult:
+    """
+    Validate and insert a completion in one statement, atomically with
+    respect to the weekly target.
     
-    return count
+    Does not commit; the caller owns the transaction (the counter row lock
+    is released on commit or rollback).
+    
+    Args:
+        db: Async database session
+        user_id: UUID of the user
+        habit_id: UUID of the habit
+        completion_date: Date of the completion
+        completion_text: Optional completion text (stripped before insert)
+    
+    Returns:
+        CompletionInsertResult; check .error() for rejections
+    """
+    week_start, _ = get_week_range(completion_date)
+    stripped = completion_text.strip() if completion_text else None
+
+    row = (await db.execute(
+        _CREATE_COMPLETION_SQL,
+        {
+            "user_id": user_id,
+            "habit_id": habit_id,
+            "completion_id": str(uuid.uuid4()),
+            "week_start": week_start,
+            "date": completion_date,
+            "text": stripped,
+            "now": datetime.utcnow(),
+            "has_text": bool(stripped),
+        },
+    )).one()
+
+    result = CompletionInsertResult(
+        habit_found=row.habit_found,
+        owned=row.owned,
+        is_deleted=row.is_deleted,
+        weekly_target=row.weekly_target,
+        requires_text=row.requires_text,
+        completed=row.completed or 0,
+        completion_id=row.completion_id,
+        has_text=bool(stripped),
+        linked_goal_id=row.linked_goal_id,
+    )
+
+    if result.completion_id and qualification_changed(
+        result.completed, result.completed + 1, result.weekly_target
+    ):
+        await apply_week_qualification_async(db, user_id, habit_id, week_start, True)
+
+    # Accepted completions are always under the target, so count in full
+    if result.completion_id and result.linked_goal_id:
+        await apply_completion_delta_async(db, user_id, result.linked_goal_id, week_start, 1)
+
+    return result
+
+
+async def count_completions_by_week_async(
+    db: AsyncSession,
+    user_id: str,
+    habit_ids: Iterable[str],
+    start: date,
+    end: date,
+) -> dict[tuple[str, date], int]:
+    """
+    Completion counts per (habit, week) for many habits in one query.
+    
+    Args:
+        db: Async database session
+        user_id: UUID of the user
+        habit_ids: Habits to count
+        start: Any date in the first week
+        end: Any date in the last week
+    
+    Returns:
+        {(habit_id, week_start): count}; weeks without completions are absent
+    """
+    habit_ids = list(set(habit_ids))
+    if not habit_ids:
+        return {}
+    
+    result = await db.execute(
+        select(HabitWeekCount.habit_id, HabitWeekCount.week_start, HabitWeekCount.count)
+        .where(
+            HabitWeekCount.user_id == user_id,
+            HabitWeekCount.habit_id.in_(habit_ids),
+            HabitWeekCount.week_start >= get_week_start(start),
+            HabitWeekCount.week_start <= end,
+            HabitWeekCount.count > 0,
+        )
+    )
+    
+    return {(habit_id, week): count for habit_id, week, count in result}
+
+
+async def create_completions_batch_async(
+    db: AsyncSession,
+    user_id: str,
+    items: list[tuple[str, date, str | None]],
+) -> list[CompletionInsertResult]:
+    """
+    Validate and insert many completions with set-based queries.
+    
+    Items are applied in order, so a later item for the same habit-week sees
+    the earlier accepted ones in its count. Accepted rows go in with one
+    multi-row INSERT. Does not commit.
+    
+    Args:
+        db: Async database session
+        user_id: UUID of the user
+        items: (habit_id, completion_date, text) per completion
+    
+    Returns:
+        One CompletionInsertResult per item, in input order
+    """
+    from app.services.habit_service import resolve_version_targets_async
+    
+    keyed = []
+    for habit_id, completion_date, completion_text in items:
+        week_start, _ = get_week_range(completion_date)
+        keyed.append((_normalize_uuid(habit_id), week_start))
+    
+    known = {habit_id for habit_id, _ in keyed if habit_id}
+    pairs = {(habit_id, week_start) for habit_id, week_start in keyed if habit_id}
+    
+    running = {}
+    if pairs:
+        await db.execute(_ENSURE_WEEK_COUNTS_SQL, _pairs_params(user_id, pairs))
+        locked = await db.execute(_LOCK_WEEK_COUNTS_SQL, _pairs_params(user_id, pairs))
+        running = {(row.habit_id, row.week_start): row.count for row in locked}
+    initial = dict(running)
+    
+    habits = {}
+    if known:
+        rows = await db.execute(
+            select(Habit.id, Habit.user_id, Habit.is_deleted).where(Habit.id.in_(known))
+        )
+        habits = {row.id: row for row in rows}
+    
+    targets = await resolve_version_targets_async(db, pairs)
+    
+    now = datetime.utcnow()
+    results: list[CompletionInsertResult] = []
+    rows_to_insert = []
+    added: dict[tuple[str, date], int] = {}
+    
+    for (habit_id, week_start), (_, completion_date, completion_text) in zip(keyed, items):
+        habit = habits.get(habit_id)
+        target = targets.get((habit_id, week_start))
+        completed = running.get((habit_id, week_start), 0)
+        stripped = completion_text.strip() if completion_text else None
+        
+        accepted = (
+            habit is not None
+            and habit.user_id == user_id
+            and not habit.is_deleted
+            and target is not None
+            and completed < target[0]
+            and (not target[1] or bool(stripped))
+        )
+        
+        completion_id = None
+        if accepted:
+            completion_id = str(uuid.uuid4())
+            running[(habit_id, week_start)] = completed + 1
+            added[(habit_id, week_start)] = added.get((habit_id, week_start), 0) + 1
+            rows_to_insert.append({
+                "id": completion_id,
+                "user_id": user_id,
+                "habit_id": habit_id,
+                "date": completion_date,
+                "text": stripped,
+                "created_at": now,
+                "updated_at": now,
+            })
+        
+        results.append(CompletionInsertResult(
+            habit_found=habit is not None,
+            owned=habit.user_id == user_id if habit else None,
+            is_deleted=habit.is_deleted if habit else None,
+            weekly_target=target[0] if target else None,
+            requires_text=target[1] if target else None,
+            completed=completed,
+            completion_id=completion_id,
+            has_text=bool(stripped),
+            linked_goal_id=target[2] if target else None,
+        ))
+    
+    if rows_to_insert:
+        await db.execute(insert(HabitCompletion).values(rows_to_insert))
+        params = _pairs_params(user_id, added)
+        params["deltas"] = [added[pair] for pair in zip(params["habit_ids"], params["week_starts"])]
+        await db.execute(_ADD_WEEK_COUNTS_SQL, params)
+        await bump_change_counters_async(db, user_id, "completions")
+        await db.execute(_BUMP_WEEK_REVISIONS_SQL, {
+            "user_id": user_id,
+            "week_starts": sorted({week_start for _, week_start in added}),
+        })
+        
+        for habit_id, week_start in sorted(added):
+            target = targets[(habit_id, week_start)][0]
+            if qualification_changed(initial[(habit_id, week_start)], running[(habit_id, week_start)], target):
+                await apply_week_qualification_async(db, user_id, habit_id, week_start, True)
+        
+        goal_deltas: dict[tuple[str, date], int] = {}
+        for (habit_id, week_start), delta in added.items():
+            goal_id = targets[(habit_id, week_start)][2]
+            if goal_id:
+                goal_deltas[(goal_id, week_start)] = goal_deltas.get((goal_id, week_start), 0) + delta
+        for (goal_id, week_start), delta in sorted(goal_deltas.items()):
+            await apply_completion_delta_async(db, user_id, goal_id, week_start, delta)
+    
+    return results
+
+
+async def delete_completion_async(
+    db: AsyncSession,
+    user_id: str,
+    completion_id: str,
+) -> tuple[str, date] | None:
+    """
+    Delete a completion and decrement its weekly counter in one statement,
+    then update the habit's streak if the week dropped below its target
+    and the linked goal's rollup for the week.
+    
+    Does not commit.
+    
+    Args:
+        db: Async database session
+        user_id: UUID of the user
+        completion_id: UUID of the completion
+    
+    Returns:
+        (habit_id, date) of the deleted completion, or None if the user has
+        no such completion
+    """
+    completion_id = _normalize_uuid(completion_id)
+    if completion_id is None:
+        return None
+    
+    row = (await db.execute(
+        _DELETE_COMPLETION_SQL,
+        {"completion_id": completion_id, "user_id": user_id},
+    )).first()
+    
+    if row is None:
+        return None
+    
+    if row.week_count is not None:
+        from app.services.habit_service import get_active_version_async
+        
+        week_start = get_week_start(row.date)
+        version = await get_active_version_async(db, row.habit_id, week_start)
+        if version and qualification_changed(
+            row.week_count + 1, row.week_count, version.weekly_target
+        ):
+            await apply_week_qualification_async(db, user_id, row.habit_id, week_start, False)
+        
+        # Recomputed rather than decremented: the week may be over target
+        # (or capped by the habit's deletion), so -1 is not always right
+        if version and version.linked_goal_id:
+            await refresh_goal_rollups_async(db, user_id, [version.linked_goal_id], week_start)
+    
+    return row.habit_id, row.date
+
+
+def _normalize_uuid(value: str) -> str | None:
+    """Canonical UUID string, or None if value is not a UUID"""
+    try:
+        return str(uuid.UUID(value))
+    except (ValueError, AttributeError, TypeError):
+        return None
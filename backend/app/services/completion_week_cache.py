@@ -0,0 +1,140 @@
+import zlib
+from datetime import date, timedelta
+from itertools import groupby
+from sqlalchemy import select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import build_cache_backend
+from app.core.config import settings
+from app.core.fast_json import encode, records
+from app.models.completion_week_revision import CompletionWeekRevision
+from app.models.habit_completion import HabitCompletion
+from app.schemas.completion import CompletionResponse
+from app.services.completion_service import COMPLETION_ORDER
+from app.utils.date_utils import get_week_start
+
+# Bump when the serialized shape of a completion changes
+WEEK_BLOB_VERSION = "1"
+
+_COMPLETION_FIELDS = tuple(CompletionResponse.model_fields)
+_COMPLETION_COLUMNS = tuple(getattr(HabitCompletion, field) for field in _COMPLETION_FIELDS)
+_DATE = _COMPLETION_FIELDS.index("date")
+
+# (user, week_start, revision) -> zlib-compressed JSON array items of the
+# week's completions in COMPLETION_ORDER. Entries never go stale: a write
+# to the week bumps its revision, so they are only ever evicted or expire.
+week_cache = build_cache_backend(
+    settings.COMPLETION_WEEK_CACHE_MAX_ENTRIES,
+    settings.COMPLETION_WEEK_CACHE_TTL_SECONDS,
+    prefix="habits:completion-weeks",
+)
+
+
+def _week_key(week_start: date, revision: int) -> str:
+    return f"{WEEK_BLOB_VERSION}:{week_start.isoformat()}:{revision}"
+
+
+def _array_items(rows) -> bytes:
+    """Comma-separated JSON objects, i.e. a JSON array without brackets"""
+    return encode(records(_COMPLETION_FIELDS, rows))[1:-1]
+
+
+def cacheable_weeks(start: date, end: date, today: date) -> list[date]:
+    """
+    Weeks served from the cache for a range: those entirely inside
+    [start, end] that ended before the current week. Newest first, and
+    always contiguous, so everything else in the range is a leading and a
+    trailing stretch of days.
+    """
+    first = get_week_start(start)
+    if first < start:
+        first += timedelta(days=7)
+    last = get_week_start(end)
+    if last + timedelta(days=6) > end:
+        last -= timedelta(days=7)
+    last = min(last, get_week_start(today) - timedelta(days=7))
+
+    weeks = []
+    while last >= first:
+        weeks.append(last)
+        last -= timedelta(days=7)
+    return weeks
+
+
+async def completion_range_json_async(
+    db: AsyncSession,
+    user_id: str,
+    start: date,
+    end: date,
+    today: date | None = None,
+) -> bytes:
+    """
+    A user's completions between start and end as JSON bytes, most recent
+    first, assembled from cached past weeks plus a live query for the rest.
+
+    Byte-for-byte what encoding the same rows from one query produces.
+    Week revisions are read before any completion, so a write racing with
+    the request can only leave newer data under an older revision, which
+    no later request will look up.
+
+    Args:
+        db: Async database session
+        user_id: UUID of the user
+        start: First date (inclusive)
+        end: Last date (inclusive)
+        today: Override for the current date
+
+    Returns:
+        JSON array of CompletionResponse objects
+    """
+    base = select(*_COMPLETION_COLUMNS).where(
+        HabitCompletion.user_id == user_id,
+        HabitCompletion.date >= start,
+        HabitCompletion.date <= end,
+    ).order_by(*COMPLETION_ORDER)
+
+    weeks = cacheable_weeks(start, end, today or date.today())
+    if not weeks:
+        return encode(records(_COMPLETION_FIELDS, await db.execute(base)))
+
+    oldest, newest_end = weeks[-1], weeks[0] + timedelta(days=6)
+    revisions = dict((await db.execute(
+        select(CompletionWeekRevision.week_start, CompletionWeekRevision.revision).where(
+            CompletionWeekRevision.user_id == user_id,
+            CompletionWeekRevision.week_start >= oldest,
+            CompletionWeekRevision.week_start <= weeks[0],
+        )
+    )).all())
+    keys = [_week_key(week_start, revisions.get(week_start, 0)) for week_start in weeks]
+    blobs = dict(zip(weeks, await week_cache.get_many(user_id, keys)))
+
+    items: dict[date, bytes] = {}
+    missing = [week_start for week_start, blob in blobs.items() if blob is None]
+    if missing:
+        rows = (await db.execute(
+            select(*_COMPLETION_COLUMNS).where(
+                HabitCompletion.user_id == user_id,
+                HabitCompletion.date >= missing[-1],
+                HabitCompletion.date <= missing[0] + timedelta(days=6),
+            ).order_by(*COMPLETION_ORDER)
+        )).all()
+        by_week = {
+            week_start: list(week_rows)
+            for week_start, week_rows in groupby(rows, key=lambda row: get_week_start(row[_DATE]))
+        }
+        for week_start, key in zip(weeks, keys):
+            if blobs[week_start] is None:
+                items[week_start] = _array_items(by_week.get(week_start, []))
+                await week_cache.set(user_id, key, zlib.compress(items[week_start]))
+
+    live = (await db.execute(
+        base.where(or_(HabitCompletion.date < oldest, HabitCompletion.date > newest_end))
+    )).all()
+    parts = [_array_items(row for row in live if row[_DATE] > newest_end)]
+    for week_start in weeks:
+        if week_start in items:
+            parts.append(items[week_start])
+        else:
+            parts.append(zlib.decompress(blobs[week_start]))
+    parts.append(_array_items(row for row in live if row[_DATE] < oldest))
+
+    return b"[" + b",".join(part for part in parts if part) + b"]"
@@ -0,0 +1,105 @@
+from typing import AsyncIterator
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.goal import Goal
+from app.models.habit import Habit
+from app.models.habit_version import HabitVersion
+from app.models.habit_completion import HabitCompletion
+
+# Rows fetched per server-side cursor round trip
+EXPORT_BATCH_SIZE = 1000
+
+# Export sections in dependency order (goals before the versions linking
+# them, habits before their versions and completions), with the columns
+# each record carries
+EXPORT_RESOURCES = {
+    "goals": (
+        Goal.id,
+        Goal.title,
+        Goal.year,
+        Goal.description,
+        Goal.is_deleted,
+        Goal.created_at,
+        Goal.updated_at,
+    ),
+    "habits": (
+        Habit.id,
+        Habit.name,
+        Habit.order_index,
+        Habit.is_deleted,
+        Habit.created_at,
+        Habit.updated_at,
+    ),
+    "versions": (
+        HabitVersion.id,
+        HabitVersion.habit_id,
+        HabitVersion.weekly_target,
+        HabitVersion.requires_text_on_completion,
+        HabitVersion.linked_goal_id,
+        HabitVersion.description,
+        HabitVersion.effective_week_start,
+        HabitVersion.created_at,
+        HabitVersion.updated_at,
+    ),
+    "completions": (
+        HabitCompletion.id,
+        HabitCompletion.habit_id,
+        HabitCompletion.date,
+        HabitCompletion.text,
+        HabitCompletion.created_at,
+        HabitCompletion.updated_at,
+    ),
+}
+
+
+def export_fields(resource: str) -> tuple[str, ...]:
+    return tuple(column.key for column in EXPORT_RESOURCES[resource])
+
+
+def _export_statement(resource: str, user_id: str, after_id: str | None):
+    columns = EXPORT_RESOURCES[resource]
+    id_column = columns[0]
+
+    statement = select(*columns)
+    if resource == "versions":
+        statement = statement.join(Habit, Habit.id == HabitVersion.habit_id).where(
+            Habit.user_id == user_id
+        )
+    else:
+        statement = statement.where(columns[0].class_.user_id == user_id)
+
+    if after_id is not None:
+        statement = statement.where(id_column > after_id)
+
+    # Primary-key order: unique, index-backed, and what resume cursors seek on
+    return statement.order_by(id_column).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+
+async def stream_export_batches(
+    db: AsyncSession,
+    user_id: str,
+    resources: tuple[str, ...],
+    after_id: str | None = None,
+) -> AsyncIterator[tuple[str, list]]:
+    """
+    Stream a user's rows through server-side cursors, one batch at a time.
+
+    Memory stays at one batch regardless of history size. Run inside a
+    single transaction (ideally REPEATABLE READ) for a consistent snapshot
+    across resources.
+
+    Args:
+        db: Async database session (kept open for the whole iteration)
+        user_id: UUID of the user
+        resources: Keys of EXPORT_RESOURCES, in export order
+        after_id: Resume after this id in the first resource
+
+    Yields:
+        (resource, rows) with rows as column tuples in export_fields order
+    """
+    for position, resource in enumerate(resources):
+        result = await db.stream(
+            _export_statement(resource, user_id, after_id if position == 0 else None)
+        )
+        async for rows in result.partitions():
+            yield resource, rows
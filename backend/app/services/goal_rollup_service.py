@@ -0,0 +1,271 @@
+from datetime import date, timedelta
+from typing import Iterable
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text, bindparam, Date, Integer
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from app.utils.date_utils import get_week_start
+
+_SCOPE_PARAMS = (
+    bindparam("user_id", type_=UUID(as_uuid=False)),
+    bindparam("goal_ids", type_=ARRAY(UUID(as_uuid=False))),
+    bindparam("from_week", type_=Date),
+    bindparam("to_week", type_=Date),
+)
+
+# Recompute every (goal, week) cell in scope, from each goal's first linked
+# week (or from_week, if later) through to_week. Every week in that span
+# gets a row, zeroed when nothing links to the goal that week, so "rolled
+# forward through week X" is just max(week_start). Deleted habits follow
+# the progress page's fair-deletion rule.
+_REFRESH_SQL = text("""
+WITH scope AS (
+    SELECT g.id AS goal_id, g.user_id, min(v.effective_week_start) AS first_week
+    FROM goals g
+    JOIN habit_versions v ON v.linked_goal_id = g.id
+    WHERE (CAST(:user_id AS uuid) IS NULL OR g.user_id = :user_id)
+      AND (CAST(:goal_ids AS uuid[]) IS NULL OR g.id = ANY(:goal_ids))
+    GROUP BY g.id, g.user_id
+),
+cells AS (
+    SELECT s.goal_id, s.user_id, w::date AS week_start
+    FROM scope s
+    CROSS JOIN LATERAL generate_series(
+        greatest(s.first_week, coalesce(CAST(:from_week AS date), s.first_week)),
+        CAST(:to_week AS date),
+        interval '7 days'
+    ) AS w
+),
+contributions AS (
+    SELECT
+        c.goal_id,
+        c.week_start,
+        CASE
+            WHEN h.is_deleted AND c.week_start = date_trunc('week', h.updated_at)::date
+            THEN coalesce(wc.count, 0)
+            ELSE v.weekly_target
+        END AS target,
+        coalesce(wc.count, 0) AS done
+    FROM cells c
+    JOIN habits h ON h.user_id = c.user_id
+    CROSS JOIN LATERAL (
+        SELECT v.weekly_target, v.linked_goal_id
+        FROM habit_versions v
+        WHERE v.habit_id = h.id
+          AND v.effective_week_start <= c.week_start
+        ORDER BY v.effective_week_start DESC, v.created_at DESC
+        LIMIT 1
+    ) v
+    LEFT JOIN habit_week_counts wc
+      ON wc.user_id = h.user_id AND wc.habit_id = h.id AND wc.week_start = c.week_start
+    WHERE v.linked_goal_id = c.goal_id
+      AND (NOT h.is_deleted OR c.week_start <= date_trunc('week', h.updated_at)::date)
+)
+INSERT INTO goal_week_rollups (goal_id, week_start, user_id, target, achieved)
+SELECT
+    c.goal_id,
+    c.week_start,
+    c.user_id,
+    coalesce(sum(x.target), 0),
+    coalesce(sum(least(x.done, x.target)), 0)
+FROM cells c
+LEFT JOIN contributions x ON x.goal_id = c.goal_id AND x.week_start = c.week_start
+GROUP BY c.goal_id, c.week_start, c.user_id
+ON CONFLICT (goal_id, week_start) DO UPDATE SET
+    target = excluded.target,
+    achieved = excluded.achieved
+""").bindparams(*_SCOPE_PARAMS)
+
+# Taken before recomputing, so a concurrent completion's delta either lands
+# first (and is read by the recompute) or waits and applies on top of it
+_LOCK_SQL = text("""
+SELECT goal_id, week_start
+FROM goal_week_rollups
+WHERE goal_id = ANY(:goal_ids)
+  AND week_start BETWEEN :from_week AND :to_week
+ORDER BY goal_id, week_start
+FOR UPDATE
+""").bindparams(_SCOPE_PARAMS[1], _SCOPE_PARAMS[2], _SCOPE_PARAMS[3])
+
+# Rows from before a goal's first linked week, which exist only if the
+# version that linked it earliest has since been removed
+_PRUNE_SQL = text("""
+DELETE FROM goal_week_rollups r
+WHERE r.goal_id = ANY(:goal_ids)
+  AND r.week_start BETWEEN :from_week AND :to_week
+  AND r.week_start < coalesce(
+      (SELECT min(v.effective_week_start) FROM habit_versions v WHERE v.linked_goal_id = r.goal_id),
+      'infinity'::date
+  )
+""").bindparams(_SCOPE_PARAMS[1], _SCOPE_PARAMS[2], _SCOPE_PARAMS[3])
+
+_DELTA_SQL = text("""
+UPDATE goal_week_rollups
+SET achieved = achieved + :delta
+WHERE goal_id = :goal_id AND week_start = :week_start
+""").bindparams(
+    bindparam("goal_id", type_=UUID(as_uuid=False)),
+    bindparam("week_start", type_=Date),
+    bindparam("delta", type_=Integer),
+)
+
+# Per goal: the first week anything linked to it, and the span of weeks
+# materialized so far (a write can materialize a single week ahead of the
+# rest, so the span is checked for gaps)
+_FRONTIER_SQL = text("""
+SELECT
+    g.id AS goal_id,
+    (SELECT min(v.effective_week_start) FROM habit_versions v WHERE v.linked_goal_id = g.id) AS first_week,
+    r.first_row_week,
+    r.last_week,
+    r.weeks
+FROM goals g
+LEFT JOIN LATERAL (
+    SELECT min(week_start) AS first_row_week, max(week_start) AS last_week, count(*) AS weeks
+    FROM goal_week_rollups
+    WHERE goal_id = g.id
+) r ON true
+WHERE g.user_id = :user_id
+  AND (CAST(:goal_ids AS uuid[]) IS NULL OR g.id = ANY(:goal_ids))
+""").bindparams(_SCOPE_PARAMS[0], _SCOPE_PARAMS[1]).columns(
+    goal_id=UUID(as_uuid=False),
+    first_week=Date,
+    first_row_week=Date,
+    last_week=Date,
+    weeks=Integer,
+)
+
+
+async def refresh_goal_rollups_async(
+    db: AsyncSession,
+    user_id: str,
+    goal_ids: Iterable[str | None],
+    from_week: date,
+    to_week: date | None = None,
+) -> None:
+    """
+    Recompute some goals' rollup cells for a range of weeks. Does not commit.
+    
+    Args:
+        db: Async database session
+        user_id: UUID of the user
+        goal_ids: Goals to refresh (None entries are ignored)
+        from_week: Any date in the first week
+        to_week: Any date in the last week (defaults to from_week)
+    """
+    goal_ids = sorted({goal_id for goal_id in goal_ids if goal_id})
+    if not goal_ids:
+        return
+    
+    params = {
+        "user_id": user_id,
+        "goal_ids": goal_ids,
+        "from_week": get_week_start(from_week),
+        "to_week": get_week_start(to_week or from_week),
+    }
+    await db.execute(_LOCK_SQL, params)
+    await db.execute(_PRUNE_SQL, params)
+    await db.execute(_REFRESH_SQL, params)
+
+
+async def apply_completion_delta_async(
+    db: AsyncSession,
+    user_id: str,
+    goal_id: str,
+    week_start: date,
+    delta: int,
+) -> None:
+    """
+    Add an accepted (+1) completion to its goal-week in place.
+    
+    Falls back to recomputing the cell when it has not been materialized
+    yet. Does not commit.
+    
+    Args:
+        db: Async database session
+        user_id: UUID of the user
+        goal_id: Goal linked by the habit's active version that week
+        week_start: Monday of the completion's week
+        delta: Change in capped completions
+    """
+    params = {"goal_id": goal_id, "week_start": get_week_start(week_start), "delta": delta}
+    if (await db.execute(_DELTA_SQL, params)).rowcount == 0:
+        await refresh_goal_rollups_async(db, user_id, [goal_id], week_start)
+
+
+async def roll_forward_goal_rollups_async(
+    db: AsyncSession,
+    user_id: str,
+    goal_ids: Iterable[str] | None = None,
+    today: date | None = None,
+) -> bool:
+    """
+    Materialize weeks that started since a goal was last refreshed.
+    
+    Writes keep the weeks they touch current, but a week nobody has written
+    to yet has no row; readers call this first. Does not commit.
+    
+    Args:
+        db: Async database session
+        user_id: UUID of the user
+        goal_ids: Limit to these goals (all of the user's if None)
+        today: Override for the current date
+    
+    Returns:
+        Whether anything was refreshed (the caller should commit)
+    """
+    this_week = get_week_start(today or date.today())
+    rows = await db.execute(_FRONTIER_SQL, {
+        "user_id": user_id,
+        "goal_ids": sorted(goal_ids) if goal_ids is not None else None,
+    })
+    
+    stale: dict[str, date] = {}
+    for goal_id, first_week, first_row_week, last_week, weeks in rows:
+        if first_week is None:
+            continue
+        contiguous = (
+            first_row_week == first_week
+            and (last_week - first_row_week).days // 7 + 1 == weeks
+        )
+        if not contiguous:
+            start = first_week
+        elif last_week < this_week:
+            start = last_week + timedelta(days=7)
+        else:
+            continue
+        stale[goal_id] = start
+    
+    # One refresh from the earliest stale week: a goal whose own rows start
+    # later is recomputed from there too, which rewrites the same values
+    # (and _REFRESH_SQL never goes back past a goal's first linked week)
+    if stale:
+        await refresh_goal_rollups_async(db, user_id, stale, min(stale.values()), this_week)
+    
+    return bool(stale)
+
+
+def rebuild_goal_rollups(
+    db: Session,
+    user_id: str | None = None,
+) -> int:
+    """
+    Recompute every goal rollup (or one user's) through the current week
+    and commit.
+    
+    Args:
+        db: Database session
+        user_id: Rebuild one user's rollups (all users if None)
+    
+    Returns:
+        Number of goal-week rows written
+    """
+    db.execute(text("LOCK TABLE goal_week_rollups IN SHARE ROW EXCLUSIVE MODE"))
+    written = db.execute(_REFRESH_SQL, {
+        "user_id": user_id,
+        "goal_ids": None,
+        "from_week": None,
+        "to_week": get_week_start(date.today()),
+    }).rowcount
+    db.commit()
+    return written
@@ -1,7 +1,22 @@
-from datetime import date
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Any, Iterable
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, desc, select, text, bindparam, update, values, column, Integer
+from sqlalchemy.dialects.postgresql import UUID
+from app.models.habit import Habit
 from app.models.habit_version import HabitVersion
+from app.services.completion_service import _normalize_uuid
+
+# What a HabitVersion snapshots; name and order_index live on the habit and
+# changing them never needs a new version
+VERSIONED_FIELDS = (
+    "weekly_target",
+    "requires_text_on_completion",
+    "linked_goal_id",
+    "description",
+)
 
 
 def get_active_version(
@@ -37,3 +52,244 @@ def get_active_version(
     )
     
     return version
+
+
+async def get_active_version_async(
+    db: AsyncSession,
+    habit_id: str,
+    week_start: date,
+) -> HabitVersion | None:
+    """
+    Async variant of get_active_version.
+    
+    Args:
+        db: Async database session
+        habit_id: UUID of the habit
+        week_start: Monday date of the week
+    
+    Returns:
+        HabitVersion or None if no version exists
+    """
+    result = await db.execute(
+        select(HabitVersion)
+        .where(
+            HabitVersion.habit_id == habit_id,
+            HabitVersion.effective_week_start <= week_start,
+        )
+        .order_by(
+            desc(HabitVersion.effective_week_start),
+            desc(HabitVersion.created_at)
+        )
+        .limit(1)
+    )
+    
+    return result.scalars().first()
+
+
+async def resolve_version_targets_async(
+    db: AsyncSession,
+    pairs: Iterable[tuple[str, date]],
+) -> dict[tuple[str, date], tuple[int, bool, str | None]]:
+    """
+    Resolve the active version for many (habit_id, week_start) pairs in one
+    query.
+    
+    Args:
+        db: Async database session
+        pairs: (habit_id, week_start) pairs; duplicates are fine
+    
+    Returns:
+        {(habit_id, week_start): (weekly_target, requires_text_on_completion,
+        linked_goal_id)} for every pair that has an active version
+    """
+    from app.services.version_resolver import load_version_index_async
+    
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+    
+    weeks = [week_start for _, week_start in pairs]
+    index = await load_version_index_async(
+        db, (habit_id for habit_id, _ in pairs), min(weeks), max(weeks)
+    )
+    
+    return {
+        pair: (version.weekly_target, version.requires_text_on_completion, version.linked_goal_id)
+        for pair, version in index.resolve_many(pairs).items()
+    }
+
+
+def version_values(version: HabitVersion | None) -> dict[str, Any] | None:
+    """The versioned fields of a version, or None"""
+    if version is None:
+        return None
+    return {field: getattr(version, field) for field in VERSIONED_FIELDS}
+
+
+async def apply_version_update_async(
+    db: AsyncSession,
+    habit_id: str,
+    values: dict[str, Any],
+    week_start: date,
+) -> tuple[dict[str, Any] | None, bool]:
+    """
+    Make `values` the habit's versioned settings from week_start on,
+    writing as little version history as possible. Does not commit.
+    
+    - Unchanged settings write nothing.
+    - A version already effective this week is updated in place, or the
+      week's versions are removed if the edit restores the settings in
+      force before this week.
+    - Otherwise a new version effective this week is added.
+    
+    Args:
+        db: Async database session
+        habit_id: UUID of the habit
+        values: New value of every VERSIONED_FIELDS entry
+        week_start: Monday of the current week
+    
+    Returns:
+        (settings active this week before the update or None, whether
+        they changed)
+    """
+    # Any spelling of the goal's UUID is the same goal, not a change
+    values = {**values, "linked_goal_id": _normalize_uuid(values["linked_goal_id"])}
+    current = await get_active_version_async(db, habit_id, week_start)
+    before = version_values(current)
+    if before == values:
+        return before, False
+    
+    if current is None or current.effective_week_start != week_start:
+        db.add(HabitVersion(habit_id=habit_id, effective_week_start=week_start, **values))
+        return before, True
+    
+    prior = await get_active_version_async(db, habit_id, week_start - timedelta(days=7))
+    if version_values(prior) == values:
+        # Older versions of the same week would resolve in current's place
+        await db.execute(
+            delete(HabitVersion).where(
+                HabitVersion.habit_id == habit_id,
+                HabitVersion.effective_week_start == week_start,
+            )
+        )
+    else:
+        for field, value in values.items():
+            setattr(current, field, value)
+    return before, True
+
+
+# Versions that never change what a week resolves to: those shadowed by a
+# newer version with the same effective week, and those repeating the
+# settings of the version before them. Keeps the earliest of every run.
+_COMPACT_VERSIONS_SQL = text("""
+WITH effective AS (
+    SELECT DISTINCT ON (v.habit_id, v.effective_week_start)
+        v.id,
+        v.habit_id,
+        v.effective_week_start,
+        ROW(v.weekly_target, v.requires_text_on_completion, v.linked_goal_id, v.description) AS settings
+    FROM habit_versions v
+    JOIN habits h ON h.id = v.habit_id
+    WHERE CAST(:user_id AS uuid) IS NULL OR h.user_id = :user_id
+    ORDER BY v.habit_id, v.effective_week_start, v.created_at DESC
+),
+keep AS (
+    SELECT id
+    FROM (
+        SELECT
+            id,
+            settings IS NOT DISTINCT FROM lag(settings) OVER (
+                PARTITION BY habit_id ORDER BY effective_week_start
+            ) AS redundant
+        FROM effective
+    ) compared
+    WHERE NOT redundant
+),
+removed AS (
+    DELETE FROM habit_versions v
+    USING habits h
+    WHERE h.id = v.habit_id
+      AND (CAST(:user_id AS uuid) IS NULL OR h.user_id = :user_id)
+      AND v.id NOT IN (SELECT id FROM keep)
+    RETURNING h.user_id
+),
+touched AS (
+    INSERT INTO user_change_counters (user_id, habits)
+    SELECT DISTINCT user_id, 1 FROM removed
+    ON CONFLICT (user_id) DO UPDATE
+        SET habits = user_change_counters.habits + 1
+)
+SELECT count(*) FROM removed
+""").bindparams(bindparam("user_id", type_=UUID(as_uuid=False)))
+
+
+def compact_habit_versions(
+    db: Session,
+    user_id: str | None = None,
+) -> int:
+    """
+    Delete redundant habit versions and commit.
+    
+    Every habit resolves to the same settings for every week afterwards;
+    only version ids change (to the earliest equivalent version). Streaks,
+    week counts and goal rollups are derived from settings, not ids, and
+    stay valid. Affected users' habits revision is bumped.
+    
+    Args:
+        db: Database session
+        user_id: Compact one user's habits (all users if None)
+    
+    Returns:
+        Number of versions deleted
+    """
+    removed = db.execute(_COMPACT_VERSIONS_SQL, {"user_id": user_id}).scalar_one()
+    db.commit()
+    return removed
+
+
+def normalize_habit_ids(habit_ids: list[str]) -> list[str] | None:
+    """
+    Canonical (lower-case, hyphenated) form of each id, so spellings of the
+    same UUID compare equal; None if any id is not a UUID.
+    """
+    try:
+        return [str(uuid.UUID(habit_id)) for habit_id in habit_ids]
+    except ValueError:
+        return None
+
+
+async def reorder_habits_async(
+    db: AsyncSession,
+    user_id: str,
+    habit_ids: list[str],
+) -> bool:
+    """
+    Set order_index to each habit's position in `habit_ids` with one
+    UPDATE ... FROM (VALUES ...), which doubles as the ownership check.
+    Does not commit; roll back on False.
+    
+    Args:
+        db: Async database session
+        user_id: UUID of the user
+        habit_ids: Distinct habit ids from normalize_habit_ids, in display order
+    
+    Returns:
+        Whether every id was a non-deleted habit of the user (and updated)
+    """
+    new_order = values(
+        column("id", UUID(as_uuid=False)),
+        column("order_index", Integer),
+        name="new_order",
+    ).data([(habit_id, position) for position, habit_id in enumerate(habit_ids)])
+    
+    updated = await db.execute(
+        update(Habit)
+        .where(
+            Habit.id == new_order.c.id,
+            Habit.user_id == user_id,
+            Habit.is_deleted == False,
+        )
+        .values(order_index=new_order.c.order_index, updated_at=datetime.utcnow())
+        .returning(Habit.id)
+    )
+    return len(updated.all()) == len(habit_ids)
@@ -0,0 +1,119 @@
+import base64
+from datetime import date, timedelta
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.habit import Habit
+from app.models.habit_completion import HabitCompletion
+from app.utils.date_utils import get_week_start
+
+HEATMAP_ENCODINGS = ("counts", "bitset")
+
+
+def heatmap_grid(year: int) -> tuple[date, int]:
+    """
+    Whole weeks covering a year: from the Monday on or before Jan 1 through
+    the Sunday on or after Dec 31, so every 7th cell starts a week.
+    
+    Returns:
+        (first grid day, number of days)
+    """
+    start = get_week_start(date(year, 1, 1))
+    end = get_week_start(date(year, 12, 31)) + timedelta(days=6)
+    return start, (end - start).days + 1
+
+
+def bucket_completions(
+    habit_ids: list[str],
+    habit_column: np.ndarray,
+    day_column: np.ndarray,
+    days: int,
+) -> np.ndarray:
+    """
+    Count completions per (habit, day) in one pass.
+    
+    Args:
+        habit_ids: Row order of the result
+        habit_column: Habit id of each completion
+        day_column: Grid day offset of each completion
+        days: Grid width
+    
+    Returns:
+        (len(habit_ids), days) array of counts
+    """
+    if not len(day_column):
+        return np.zeros((len(habit_ids), days), dtype=np.int64)
+    
+    rows = {habit_id: i for i, habit_id in enumerate(habit_ids)}
+    cells = np.fromiter((rows[h] for h in habit_column), dtype=np.int64, count=len(habit_column))
+    cells = cells * days + day_column
+    return np.bincount(cells, minlength=len(habit_ids) * days).reshape(len(habit_ids), days)
+
+
+def encode_bitset(counts: np.ndarray) -> str:
+    """Days with any completion as a base64 bitset, first day in the high bit"""
+    return base64.b64encode(np.packbits(counts > 0).tobytes()).decode("ascii")
+
+
+async def habit_heatmap_async(
+    db: AsyncSession,
+    user_id: str,
+    year: int,
+    encoding: str = "counts",
+) -> dict:
+    """
+    Per-habit completions per day for a year, for calendar views.
+    
+    Completions are read as (habit_id, date) columns only and bucketed
+    with NumPy. Deleted habits are included only if they have completions
+    in the grid.
+    
+    Args:
+        db: Async database session
+        user_id: UUID of the user
+        year: Calendar year
+        encoding: "counts" (int per day) or "bitset" (base64, 1 bit per day)
+    
+    Returns:
+        {year, start, days, encoding, habits: [{habit_id, counts|bitset}]}
+    """
+    start, days = heatmap_grid(year)
+    
+    habits = (await db.execute(
+        select(Habit.id, Habit.is_deleted)
+        .where(Habit.user_id == user_id)
+        .order_by(Habit.order_index.asc(), Habit.created_at.asc())
+    )).all()
+    habit_ids = [habit_id for habit_id, _ in habits]
+    
+    completions = (await db.execute(
+        select(HabitCompletion.habit_id, HabitCompletion.date).where(
+            HabitCompletion.user_id == user_id,
+            HabitCompletion.date >= start,
+            HabitCompletion.date < start + timedelta(days=days),
+        )
+    )).all()
+    
+    habit_column = np.array([habit_id for habit_id, _ in completions], dtype=object)
+    day_column = (
+        np.array([completion_date for _, completion_date in completions], dtype="datetime64[D]")
+        - np.datetime64(start, "D")
+    ).astype(np.int64)
+    counts = bucket_completions(habit_ids, habit_column, day_column, days)
+    
+    result = []
+    for (habit_id, is_deleted), row in zip(habits, counts):
+        if is_deleted and not row.any():
+            continue
+        if encoding == "bitset":
+            result.append({"habit_id": habit_id, "bitset": encode_bitset(row)})
+        else:
+            result.append({"habit_id": habit_id, "counts": row.tolist()})
+    
+    return {
+        "year": year,
+        "start": start,
+        "days": days,
+        "encoding": encoding,
+        "habits": result,
+    }
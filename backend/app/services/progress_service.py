@@ -0,0 +1,71 @@
+from datetime import date
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.habit import Habit
+from app.services.completion_service import count_completions_by_week_async
+from app.services.version_resolver import load_version_index_async
+from app.utils.date_utils import get_week_start, iter_week_starts
+
+
+async def weekly_progress_async(
+    db: AsyncSession,
+    user_id: str,
+    start: date,
+    end: date,
+) -> list[dict]:
+    """
+    Target, done and remaining for every habit-week in a range.
+    
+    Three queries regardless of range or history size: the user's habits,
+    the versions that can be active in the range (resolved in memory by a
+    VersionIndex), and the materialized habit_week_counts rows for the
+    range. Deleted habits follow the progress page's fair-deletion rule:
+    weeks after the deletion week are omitted and the deletion week's
+    target is capped at what was done.
+    
+    Args:
+        db: Async database session
+        user_id: UUID of the user
+        start: Any date in the first week
+        end: Any date in the last week
+    
+    Returns:
+        [{"habit_id", "weeks": [{"week_start", "target", "done", "remaining"}]}]
+        in habit display order
+    """
+    habits = (await db.execute(
+        select(Habit.id, Habit.is_deleted, Habit.updated_at)
+        .where(Habit.user_id == user_id)
+        .order_by(Habit.order_index.asc(), Habit.created_at.asc())
+    )).all()
+    habit_ids = [habit.id for habit in habits]
+    
+    index = await load_version_index_async(db, habit_ids, start, end)
+    counts = await count_completions_by_week_async(db, user_id, habit_ids, start, end)
+    weeks = iter_week_starts(start, end)
+    
+    progress = []
+    for habit in habits:
+        deletion_week = get_week_start(habit.updated_at.date()) if habit.is_deleted else None
+        
+        habit_weeks = []
+        for week_start in weeks:
+            if deletion_week is not None and week_start > deletion_week:
+                break
+            
+            version = index.resolve(habit.id, week_start)
+            if version is None:
+                continue
+            
+            done = counts.get((habit.id, week_start), 0)
+            target = done if week_start == deletion_week else version.weekly_target
+            habit_weeks.append({
+                "week_start": week_start,
+                "target": target,
+                "done": done,
+                "remaining": max(0, target - done),
+            })
+        
+        progress.append({"habit_id": habit.id, "weeks": habit_weeks})
+    
+    return progress
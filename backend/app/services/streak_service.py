@@ -0,0 +1,229 @@
+from datetime import date, timedelta
+from typing import Iterable
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text, bindparam, Date, Integer
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from app.utils.date_utils import get_week_start
+
+_SCOPE_PARAMS = (
+    bindparam("user_id", type_=UUID(as_uuid=False)),
+    bindparam("habit_ids", type_=ARRAY(UUID(as_uuid=False))),
+)
+
+# Streak state from scratch for every habit in scope. A week qualifies when
+# its materialized count reaches the target of the version active that
+# week; consecutive qualifying weeks form islands (week_start minus
+# 7 * row_number is constant within one), the latest island is the current
+# run and the longest is the best. Habits with no qualifying week get a
+# zeroed row, so every habit in scope ends up with state.
+_RECOMPUTE_SQL = text("""
+WITH scope AS (
+    SELECT h.id, h.user_id
+    FROM habits h
+    WHERE (CAST(:user_id AS uuid) IS NULL OR h.user_id = :user_id)
+      AND (CAST(:habit_ids AS uuid[]) IS NULL OR h.id = ANY(:habit_ids))
+),
+qualifying AS (
+    SELECT w.habit_id, w.week_start
+    FROM habit_week_counts w
+    JOIN scope s ON s.id = w.habit_id AND s.user_id = w.user_id
+    CROSS JOIN LATERAL (
+        SELECT v.weekly_target
+        FROM habit_versions v
+        WHERE v.habit_id = w.habit_id
+          AND v.effective_week_start <= w.week_start
+        ORDER BY v.effective_week_start DESC, v.created_at DESC
+        LIMIT 1
+    ) v
+    WHERE w.count >= v.weekly_target
+),
+runs AS (
+    SELECT habit_id, count(*) AS length, max(week_start) AS last_week
+    FROM (
+        SELECT habit_id, week_start,
+               week_start - 7 * row_number() OVER (PARTITION BY habit_id ORDER BY week_start)::int AS island
+        FROM qualifying
+    ) islands
+    GROUP BY habit_id, island
+),
+summary AS (
+    SELECT DISTINCT ON (habit_id)
+        habit_id,
+        length AS current_streak,
+        max(length) OVER (PARTITION BY habit_id) AS best_streak,
+        last_week
+    FROM runs
+    ORDER BY habit_id, last_week DESC
+)
+INSERT INTO habit_streaks (habit_id, user_id, current_streak, best_streak, last_qualifying_week, updated_at)
+SELECT s.id, s.user_id, coalesce(r.current_streak, 0), coalesce(r.best_streak, 0), r.last_week, now()
+FROM scope s
+LEFT JOIN summary r ON r.habit_id = s.id
+ON CONFLICT (habit_id) DO UPDATE SET
+    current_streak = excluded.current_streak,
+    best_streak = excluded.best_streak,
+    last_qualifying_week = excluded.last_qualifying_week,
+    updated_at = excluded.updated_at
+""").bindparams(*_SCOPE_PARAMS)
+
+# Make sure each habit has a state row, in key order; returns the rows
+# created here, whose state was never computed
+_ENSURE_SQL = text("""
+INSERT INTO habit_streaks (habit_id, user_id, current_streak, best_streak, updated_at)
+SELECT id, :user_id, 0, 0, now()
+FROM unnest(CAST(:habit_ids AS uuid[])) AS id
+ORDER BY id
+ON CONFLICT (habit_id) DO NOTHING
+RETURNING habit_id
+""").bindparams(*_SCOPE_PARAMS).columns(habit_id=UUID(as_uuid=False))
+
+_LOCK_SQL = text("""
+SELECT habit_id, current_streak, last_qualifying_week
+FROM habit_streaks
+WHERE habit_id = ANY(:habit_ids)
+ORDER BY habit_id
+FOR UPDATE
+""").bindparams(_SCOPE_PARAMS[1]).columns(
+    habit_id=UUID(as_uuid=False),
+    current_streak=Integer,
+    last_qualifying_week=Date,
+)
+
+_EXTEND_SQL = text("""
+UPDATE habit_streaks
+SET current_streak = :current_streak,
+    best_streak = greatest(best_streak, :current_streak),
+    last_qualifying_week = :week_start,
+    updated_at = now()
+WHERE habit_id = :habit_id
+""").bindparams(
+    bindparam("habit_id", type_=UUID(as_uuid=False)),
+    bindparam("current_streak", type_=Integer),
+    bindparam("week_start", type_=Date),
+)
+
+
+def effective_current_streak(
+    current_streak: int,
+    last_qualifying_week: date | None,
+    today: date | None = None,
+) -> int:
+    """
+    The live streak as of today.
+    
+    The current week does not break a streak until it is over, so a run
+    ending this week or last week is live; anything older has lapsed.
+    """
+    if last_qualifying_week is None:
+        return 0
+    this_week = get_week_start(today or date.today())
+    if last_qualifying_week >= this_week - timedelta(days=7):
+        return current_streak
+    return 0
+
+
+def qualification_changed(before: int, after: int, weekly_target: int | None) -> bool:
+    """Whether a week's count moving from before to after crosses its target"""
+    if weekly_target is None:
+        return False
+    return (before >= weekly_target) != (after >= weekly_target)
+
+
+async def refresh_streaks_async(
+    db: AsyncSession,
+    user_id: str,
+    habit_ids: Iterable[str],
+) -> None:
+    """
+    Lock and fully recompute streak state for some of a user's habits.
+    
+    For changes the incremental path cannot apply in place: a week losing
+    its qualification, a backdated week, or a new version changing targets.
+    Cost is bounded by the habits' own week history. Does not commit.
+    
+    Args:
+        db: Async database session
+        user_id: UUID of the user
+        habit_ids: Habits to recompute
+    """
+    habit_ids = sorted(set(habit_ids))
+    if not habit_ids:
+        return
+    
+    params = {"user_id": user_id, "habit_ids": habit_ids}
+    await db.execute(_ENSURE_SQL, params)
+    await db.execute(_LOCK_SQL, {"habit_ids": habit_ids})
+    await db.execute(_RECOMPUTE_SQL, params)
+
+
+async def apply_week_qualification_async(
+    db: AsyncSession,
+    user_id: str,
+    habit_id: str,
+    week_start: date,
+    qualifies: bool,
+) -> None:
+    """
+    Update a habit's streak after one of its weeks gained or lost
+    qualification. Call only when qualification_changed() is true.
+    
+    Meeting the target in the week after the current run, or in any later
+    week, updates the state row in place. Everything else falls back to
+    refresh_streaks_async for this habit. Does not commit; the state row
+    stays locked until the caller's transaction ends.
+    
+    Args:
+        db: Async database session
+        user_id: UUID of the user
+        habit_id: UUID of the habit
+        week_start: Monday of the week that changed
+        qualifies: Whether the week now meets its target
+    """
+    params = {"user_id": user_id, "habit_ids": [habit_id]}
+    created = (await db.execute(_ENSURE_SQL, params)).first() is not None
+    state = (await db.execute(_LOCK_SQL, {"habit_ids": [habit_id]})).one()
+    last_week = state.last_qualifying_week
+    
+    if qualifies and not created:
+        if last_week is None or week_start > last_week + timedelta(days=7):
+            # First qualifying week, or a new run after a gap
+            current_streak = 1
+        elif week_start == last_week + timedelta(days=7):
+            current_streak = state.current_streak + 1
+        else:
+            current_streak = None
+        
+        if current_streak is not None:
+            await db.execute(_EXTEND_SQL, {
+                "habit_id": habit_id,
+                "current_streak": current_streak,
+                "week_start": week_start,
+            })
+            return
+    
+    await db.execute(_RECOMPUTE_SQL, params)
+
+
+def rebuild_streaks(
+    db: Session,
+    user_id: str | None = None,
+) -> int:
+    """
+    Recompute streak state for every habit (or one user's) and commit.
+    
+    Holds a SHARE ROW EXCLUSIVE lock on habit_streaks, so writers that
+    would change a streak wait and then apply their change on top of the
+    rebuilt state.
+    
+    Args:
+        db: Database session
+        user_id: Rebuild one user's streaks (all users if None)
+    
+    Returns:
+        Number of habits written
+    """
+    db.execute(text("LOCK TABLE habit_streaks IN SHARE ROW EXCLUSIVE MODE"))
+    written = db.execute(_RECOMPUTE_SQL, {"user_id": user_id, "habit_ids": None}).rowcount
+    db.commit()
+    return written
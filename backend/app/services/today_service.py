@@ -0,0 +1,91 @@
+from datetime import date
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.goal import Goal
+from app.models.habit import Habit
+from app.models.habit_completion import HabitCompletion
+from app.schemas.completion import CompletionResponse
+from app.schemas.goal import GoalResponse
+from app.schemas.habit import HabitVersionResponse
+from app.services.completion_service import COMPLETION_ORDER
+from app.services.version_resolver import load_version_index_async
+from app.utils.date_utils import get_week_range
+
+_HABIT_FIELDS = ("id", "name", "order_index", "created_at", "updated_at")
+_VERSION_FIELDS = tuple(HabitVersionResponse.model_fields)
+_GOAL_FIELDS = tuple(field for field in GoalResponse.model_fields if field != "progress")
+_COMPLETION_FIELDS = tuple(CompletionResponse.model_fields)
+
+
+async def today_async(
+    db: AsyncSession,
+    user_id: str,
+    today: date,
+) -> dict:
+    """
+    Everything the daily page shows for the week containing `today`.
+    
+    Four queries on one session: the user's live habits, the versions in
+    force this week (resolved by a VersionIndex), their goals, and this
+    week's completions, which also give the done/remaining counts.
+    
+    Args:
+        db: Async database session
+        user_id: UUID of the user
+        today: The client's local date
+    
+    Returns:
+        {today, week_start, week_end, habits, goals, completions}
+    """
+    week_start, week_end = get_week_range(today)
+    
+    habit_rows = (await db.execute(
+        select(*(getattr(Habit, field) for field in _HABIT_FIELDS))
+        .where(Habit.user_id == user_id, Habit.is_deleted == False)
+        .order_by(Habit.order_index.asc(), Habit.created_at.asc())
+    )).all()
+    index = await load_version_index_async(
+        db, (row.id for row in habit_rows), week_start, week_start
+    )
+    
+    goal_rows = (await db.execute(
+        select(*(getattr(Goal, field) for field in _GOAL_FIELDS))
+        .where(Goal.user_id == user_id, Goal.is_deleted == False)
+        .order_by(Goal.year.desc(), Goal.created_at.desc())
+    )).all()
+    
+    completion_rows = (await db.execute(
+        select(*(getattr(HabitCompletion, field) for field in _COMPLETION_FIELDS))
+        .where(
+            HabitCompletion.user_id == user_id,
+            HabitCompletion.date >= week_start,
+            HabitCompletion.date <= week_end,
+        )
+        .order_by(*COMPLETION_ORDER)
+    )).all()
+    
+    completed: dict[str, int] = {}
+    for row in completion_rows:
+        completed[row.habit_id] = completed.get(row.habit_id, 0) + 1
+    
+    habits = []
+    for row in habit_rows:
+        version = index.resolve(row.id, week_start)
+        if version is None:
+            continue
+        done = completed.get(row.id, 0)
+        habits.append({
+            **dict(zip(_HABIT_FIELDS, row)),
+            "version": {field: getattr(version, field) for field in _VERSION_FIELDS},
+            "completed": done,
+            "remaining": max(0, version.weekly_target - done),
+        })
+    
+    return {
+        "today": today,
+        "week_start": week_start,
+        "week_end": week_end,
+        "habits": habits,
+        "goals": [dict(zip(_GOAL_FIELDS, row)) for row in goal_rows],
+        "completions": [dict(zip(_COMPLETION_FIELDS, row)) for row in completion_rows],
+    }
@@ -0,0 +1,96 @@
+import uuid
+from datetime import datetime
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from app.models.user import User
+from app.core.identity_cache import CachedIdentity
+
+_USER_COLUMNS = (
+    User.id,
+    User.google_user_id,
+    User.email,
+    User.created_at,
+    User.updated_at,
+)
+
+
+def _get_or_create_statement(google_user_id: str, email: str):
+    """
+    INSERT ... ON CONFLICT DO NOTHING inside a CTE, unioned with a lookup of
+    the existing row, so first login and returning users both cost one
+    round trip.
+    """
+    now = datetime.utcnow()
+
+    inserted = (
+        insert(User)
+        .values(
+            id=str(uuid.uuid4()),
+            google_user_id=google_user_id,
+            email=email,
+            created_at=now,
+            updated_at=now,
+        )
+        .on_conflict_do_nothing(index_elements=[User.google_user_id])
+        .returning(*_USER_COLUMNS)
+        .cte("inserted")
+    )
+
+    return (
+        select(*inserted.c)
+        .union_all(select(*_USER_COLUMNS).where(User.google_user_id == google_user_id))
+        .limit(1)
+    )
+
+
+def get_or_create_user(
+    db: Session,
+    google_user_id: str,
+    email: str,
+) -> CachedIdentity:
+    """
+    Fetch the user for a Google subject, creating it on first login.
+
+    Args:
+        db: Database session
+        google_user_id: Google `sub` claim
+        email: Email claim from the token
+
+    Returns:
+        CachedIdentity snapshot of the user row
+    """
+    row = db.execute(_get_or_create_statement(google_user_id, email)).first()
+    db.commit()
+
+    if row is None:
+        # A concurrent first login committed after our snapshot was taken;
+        # its row is visible to a fresh statement.
+        row = db.execute(
+            select(*_USER_COLUMNS).where(User.google_user_id == google_user_id)
+        ).first()
+
+    return CachedIdentity(**row._mapping)
+
+
+async def get_or_create_user_async(
+    db: AsyncSession,
+    google_user_id: str,
+    email: str,
+) -> CachedIdentity:
+    """
+    Async variant of get_or_create_user.
+
+    Returns:
+        CachedIdentity snapshot of the user row
+    """
+    row = (await db.execute(_get_or_create_statement(google_user_id, email))).first()
+    await db.commit()
+
+    if row is None:
+        row = (await db.execute(
+            select(*_USER_COLUMNS).where(User.google_user_id == google_user_id)
+        )).first()
+
+    return CachedIdentity(**row._mapping)
@@ -0,0 +1,157 @@
+from bisect import bisect_right
+from datetime import date, datetime
+from typing import Iterable
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, union_all
+from app.models.habit import Habit
+from app.models.habit_version import HabitVersion
+from app.utils.date_utils import get_week_start
+
+
+class VersionIndex:
+    """
+    In-memory per-habit interval index over HabitVersion rows.
+
+    Versions of each habit are kept sorted by (effective_week_start,
+    created_at). The active version for a week is the last entry whose
+    effective_week_start <= week_start, which is a single bisect; among
+    versions sharing an effective week the most recently created wins,
+    matching get_active_version.
+    """
+
+    def __init__(self, versions: Iterable[HabitVersion] = ()):
+        self._keys: dict[str, list[tuple[date, datetime]]] = {}
+        self._versions: dict[str, list[HabitVersion]] = {}
+
+        grouped: dict[str, list[HabitVersion]] = {}
+        for version in versions:
+            grouped.setdefault(version.habit_id, []).append(version)
+
+        for habit_id, habit_versions in grouped.items():
+            habit_versions.sort(key=lambda v: (v.effective_week_start, v.created_at))
+            self._versions[habit_id] = habit_versions
+            self._keys[habit_id] = [
+                (v.effective_week_start, v.created_at) for v in habit_versions
+            ]
+
+    @classmethod
+    def from_habits(cls, habits: Iterable[Habit]) -> "VersionIndex":
+        """Build from habits whose versions are already loaded (no queries)"""
+        return cls(version for habit in habits for version in habit.versions)
+
+    def resolve(self, habit_id: str, week_start: date) -> HabitVersion | None:
+        """
+        Active version of a habit for the week containing week_start.
+
+        Returns:
+            HabitVersion or None if no version is effective yet
+        """
+        keys = self._keys.get(habit_id)
+        if not keys:
+            return None
+
+        # Sorts after every version effective on or before this week
+        position = bisect_right(keys, (get_week_start(week_start), datetime.max))
+        if position == 0:
+            return None
+        return self._versions[habit_id][position - 1]
+
+    def resolve_many(
+        self,
+        pairs: Iterable[tuple[str, date]],
+    ) -> dict[tuple[str, date], HabitVersion]:
+        """
+        Resolve many (habit_id, week_start) pairs.
+
+        Returns:
+            {(habit_id, week_start): HabitVersion} for pairs with an active
+            version; pairs without one are absent
+        """
+        resolved = {}
+        for habit_id, week_start in pairs:
+            version = self.resolve(habit_id, week_start)
+            if version is not None:
+                resolved[(habit_id, week_start)] = version
+        return resolved
+
+    def habit_ids(self) -> list[str]:
+        return list(self._versions)
+
+
+def _versions_statement(habit_ids: list[str], start_week: date, end_week: date):
+    """
+    Every version that can be active for some week in [start_week, end_week]:
+    the one in force at start_week (DISTINCT ON picks it per habit) plus any
+    that take effect later in the range.
+    """
+    in_force_at_start = (
+        select(HabitVersion)
+        .where(
+            HabitVersion.habit_id.in_(habit_ids),
+            HabitVersion.effective_week_start <= start_week,
+        )
+        .distinct(HabitVersion.habit_id)
+        .order_by(
+            HabitVersion.habit_id,
+            HabitVersion.effective_week_start.desc(),
+            HabitVersion.created_at.desc(),
+        )
+    )
+    within_range = select(HabitVersion).where(
+        HabitVersion.habit_id.in_(habit_ids),
+        HabitVersion.effective_week_start > start_week,
+        HabitVersion.effective_week_start <= end_week,
+    )
+
+    return select(HabitVersion).from_statement(
+        union_all(in_force_at_start, within_range)
+    )
+
+
+def load_version_index(
+    db: Session,
+    habit_ids: Iterable[str],
+    start: date,
+    end: date,
+) -> VersionIndex:
+    """
+    Load everything needed to resolve any of the habits for any week
+    between start and end, in one query.
+
+    Args:
+        db: Database session
+        habit_ids: Habits to index
+        start: Any date in the first week
+        end: Any date in the last week
+
+    Returns:
+        VersionIndex covering the range
+    """
+    habit_ids = sorted(set(habit_ids))
+    if not habit_ids:
+        return VersionIndex()
+
+    statement = _versions_statement(habit_ids, get_week_start(start), get_week_start(end))
+    return VersionIndex(db.execute(statement).scalars().all())
+
+
+async def load_version_index_async(
+    db: AsyncSession,
+    habit_ids: Iterable[str],
+    start: date,
+    end: date,
+) -> VersionIndex:
+    """
+    Async variant of load_version_index.
+
+    Returns:
+        VersionIndex covering the range
+    """
+    habit_ids = sorted(set(habit_ids))
+    if not habit_ids:
+        return VersionIndex()
+
+    statement = _versions_statement(habit_ids, get_week_start(start), get_week_start(end))
+    result = await db.execute(statement)
+    return VersionIndex(result.scalars().all())
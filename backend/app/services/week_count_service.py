@@ -0,0 +1,88 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text, bindparam
+from sqlalchemy.dialects.postgresql import UUID
+
+_USER_PARAM = bindparam("user_id", type_=UUID(as_uuid=False))
+
+# Stored counters vs. counts recomputed from habit_completions, for every
+# habit-week where the two disagree (including missing counter rows)
+_DRIFT_SQL = text("""
+WITH actual AS (
+    SELECT user_id, habit_id, date_trunc('week', date)::date AS week_start, count(*) AS count
+    FROM habit_completions
+    WHERE CAST(:user_id AS uuid) IS NULL OR user_id = :user_id
+    GROUP BY user_id, habit_id, date_trunc('week', date)::date
+),
+stored AS (
+    SELECT user_id, habit_id, week_start, count
+    FROM habit_week_counts
+    WHERE CAST(:user_id AS uuid) IS NULL OR user_id = :user_id
+)
+SELECT
+    coalesce(a.user_id, s.user_id) AS user_id,
+    coalesce(a.habit_id, s.habit_id) AS habit_id,
+    coalesce(a.week_start, s.week_start) AS week_start,
+    coalesce(s.count, 0) AS stored,
+    coalesce(a.count, 0) AS actual
+FROM actual a
+FULL OUTER JOIN stored s
+  ON s.user_id = a.user_id AND s.habit_id = a.habit_id AND s.week_start = a.week_start
+WHERE coalesce(s.count, 0) <> coalesce(a.count, 0)
+ORDER BY 1, 2, 3
+""").bindparams(_USER_PARAM)
+
+_DELETE_SQL = text("""
+DELETE FROM habit_week_counts
+WHERE CAST(:user_id AS uuid) IS NULL OR user_id = :user_id
+""").bindparams(_USER_PARAM)
+
+_BACKFILL_SQL = text("""
+INSERT INTO habit_week_counts (user_id, habit_id, week_start, count)
+SELECT user_id, habit_id, date_trunc('week', date)::date, count(*)
+FROM habit_completions
+WHERE CAST(:user_id AS uuid) IS NULL OR user_id = :user_id
+GROUP BY user_id, habit_id, date_trunc('week', date)::date
+""").bindparams(_USER_PARAM)
+
+
+def find_week_count_drift(
+    db: Session,
+    user_id: str | None = None,
+) -> list[dict]:
+    """
+    Compare habit_week_counts with the completions they summarize.
+    
+    Args:
+        db: Database session
+        user_id: Restrict the check to one user (all users if None)
+    
+    Returns:
+        One dict per inconsistent habit-week with stored and actual counts
+    """
+    rows = db.execute(_DRIFT_SQL, {"user_id": user_id})
+    return [dict(row._mapping) for row in rows]
+
+
+def rebuild_week_counts(
+    db: Session,
+    user_id: str | None = None,
+) -> int:
+    """
+    Recompute habit_week_counts from habit_completions and commit.
+    
+    Runs under a SHARE ROW EXCLUSIVE lock on the counters, which waits for
+    in-flight completion writes and blocks new ones until the rebuild
+    commits, so no increment can be lost between the delete and the insert.
+    
+    Args:
+        db: Database session
+        user_id: Rebuild one user's counters (all users if None)
+    
+    Returns:
+        Number of counter rows written
+    """
+    db.execute(text("LOCK TABLE habit_week_counts IN SHARE ROW EXCLUSIVE MODE"))
+    db.execute(_DELETE_SQL, {"user_id": user_id})
+    written = db.execute(_BACKFILL_SQL, {"user_id": user_id}).rowcount
+    db.commit()
+    return written
@@ -0,0 +1,37 @@
+import base64
+import binascii
+import json
+from app.core.errors import ValidationError
+
+
+def encode_cursor(position: dict) -> str:
+    """
+    Opaque, URL-safe token for a resume position.
+
+    Values must be JSON-serializable; callers convert dates and datetimes
+    to ISO strings and back.
+    """
+    raw = json.dumps(position, separators=(",", ":"), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(token: str, *required: str) -> dict:
+    """
+    Decode a token from encode_cursor. Every cursor position is stored as
+    strings, so the required keys must hold strings too.
+
+    Raises:
+        ValidationError: If the token is malformed or lacks a required key
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        position = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise ValidationError("Invalid cursor")
+
+    if not isinstance(position, dict) or any(
+        not isinstance(position.get(key), str) for key in required
+    ):
+        raise ValidationError("Invalid cursor")
+
+    return position
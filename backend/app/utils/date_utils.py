@@ -1,5 +1,5 @@
 from datetime import date, datetime, timedelta
-from typing import Tuple
+from typing import List, Tuple
 import pytz
 
 
@@ -32,6 +32,28 @@ def get_week_range(d: date) -> Tuple[date, date]:
     return (week_start, week_end)
 
 
+# Longest range the week-by-week endpoints will expand (five years)
+MAX_RANGE_WEEKS = 261
+
+
+def count_week_starts(start: date, end: date) -> int:
+    """
+    Number of weeks iter_week_starts(start, end) returns, without building
+    them; check it against MAX_RANGE_WEEKS before expanding a range.
+    """
+    return max((get_week_start(end) - get_week_start(start)).days // 7 + 1, 0)
+
+
+def iter_week_starts(start: date, end: date) -> List[date]:
+    """
+    Get the Monday of every week from the week containing start through the
+    week containing end (inclusive).
+    """
+    first = get_week_start(start)
+    # Never steps past the last Monday, which may be the last before date.max
+    return [first + timedelta(weeks=n) for n in range(count_week_starts(start, end))]
+
+
 def get_next_monday(d: date) -> date:
     """
     Get the next Monday after the given date.
@@ -1,10 +1,15 @@
 from datetime import date
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.habit import Habit
 from app.models.habit_version import HabitVersion
 from app.models.goal import Goal
-from app.services.habit_service import get_active_version
-from app.services.completion_service import count_completions_in_week
+from app.services.habit_service import get_active_version, get_active_version_async
+from app.services.completion_service import (
+    count_completions_in_week,
+    count_completions_in_week_async,
+)
 from app.utils.date_utils import get_week_range, validate_today
 
 
@@ -118,3 +123,100 @@ def validate_goal_exists_and_owned(
         return (False, None)
     
     return (True, goal)
+
+
+async def validate_habit_exists_and_owned_async(
+    db: AsyncSession,
+    habit_id: str,
+    user_id: str,
+) -> tuple[bool, Habit | None]:
+    """
+    Async variant of validate_habit_exists_and_owned.
+    
+    Returns:
+        (is_valid, habit_object)
+    """
+    habit = await db.scalar(
+        select(Habit).where(
+            Habit.id == habit_id,
+            Habit.user_id == user_id,
+            Habit.is_deleted == False,
+        )
+    )
+    
+    if not habit:
+        return (False, None)
+    
+    return (True, habit)
+
+
+async def validate_habit_active_for_week_async(
+    db: AsyncSession,
+    habit_id: str,
+    target_date: date,
+) -> tuple[bool, HabitVersion | None]:
+    """
+    Async variant of validate_habit_active_for_week.
+    
+    Returns:
+        (is_valid, version_object)
+    """
+    week_start, week_end = get_week_range(target_date)
+    version = await get_active_version_async(db, habit_id, week_start)
+    
+    if not version:
+        return (False, None)
+    
+    return (True, version)
+
+
+async def validate_weekly_target_not_met_async(
+    db: AsyncSession,
+    habit_id: str,
+    week_start: date,
+    week_end: date,
+    user_id: str,
+) -> bool:
+    """
+    Async variant of validate_weekly_target_not_met.
+    
+    Returns:
+        True if target not met (can create completion), False otherwise
+    """
+    version = await get_active_version_async(db, habit_id, week_start)
+    if not version:
+        return False
+    
+    completed = await count_completions_in_week_async(
+        db, habit_id, week_start, week_end, user_id
+    )
+    
+    return completed < version.weekly_target
+
+
+async def validate_goal_exists_and_owned_async(
+    db: AsyncSession,
+    goal_id: str | None,
+    user_id: str,
+) -> tuple[bool, Goal | None]:
+    """
+    Async variant of validate_goal_exists_and_owned.
+    
+    Returns:
+        (is_valid, goal_object)
+    """
+    if goal_id is None:
+        return (True, None)
+    
+    goal = await db.scalar(
+        select(Goal).where(
+            Goal.id == goal_id,
+            Goal.user_id == user_id,
+            Goal.is_deleted == False,
+        )
+    )
+    
+    if not goal:
+        return (False, None)
+    
+    return (True, goal)
@@ -0,0 +1,94 @@
+"""
+Throughput of blocking vs. native async database access under slow queries.
+
+Serves two routes from an in-process ASGI app, both declared `async def`:
+
+    /blocking  sync Session on the event loop (the old endpoint pattern)
+    /native    AsyncSession via the asyncpg engine
+
+and fires concurrent requests at each. Every request runs
+`SELECT pg_sleep(:delay)`, so a route that blocks the loop serializes and a
+native async route overlaps its waits.
+
+Usage (from backend/, with DATABASE_URL pointing at a running Postgres):
+
+    python -m benchmarks.async_db --concurrency 20 --requests 100 --delay 0.05
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import SessionLocal, async_engine, get_async_db
+
+SLOW_QUERY = text("SELECT pg_sleep(:delay)")
+
+
+def build_app(delay: float) -> FastAPI:
+    bench = FastAPI()
+
+    @bench.get("/blocking")
+    async def blocking():
+        # Session is closed inline: with get_db the connection would only be
+        # returned during dependency teardown, which a blocked loop cannot
+        # reach once the pool is exhausted.
+        with SessionLocal() as db:
+            db.execute(SLOW_QUERY, {"delay": delay})
+        return {"ok": True}
+
+    @bench.get("/native")
+    async def native(db: AsyncSession = Depends(get_async_db)):
+        await db.execute(SLOW_QUERY, {"delay": delay})
+        return {"ok": True}
+
+    return bench
+
+
+async def run(client: httpx.AsyncClient, path: str, concurrency: int, requests: int) -> float:
+    """Issue `requests` GETs with at most `concurrency` in flight; return req/s"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            response = await client.get(path)
+            response.raise_for_status()
+
+    # Warm the pool so connection setup is not part of the measurement
+    await asyncio.gather(*(client.get(path) for _ in range(min(concurrency, 5))))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return requests / (time.perf_counter() - started)
+
+
+async def main(args: argparse.Namespace) -> None:
+    bench = build_app(args.delay)
+    transport = httpx.ASGITransport(app=bench)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results = {}
+        for path in ("/blocking", "/native"):
+            results[path] = await run(client, path, args.concurrency, args.requests)
+
+    await async_engine.dispose()
+
+    print(f"concurrency={args.concurrency} requests={args.requests} delay={args.delay}s")
+    for path, rps in results.items():
+        print(f"  {path:<10} {rps:8.1f} req/s")
+    print(f"  speedup    {results['/native'] / results['/blocking']:8.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--delay", type=float, default=0.05, help="seconds slept per query")
+    asyncio.run(main(parser.parse_args()))
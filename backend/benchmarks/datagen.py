@@ -0,0 +1,212 @@
+"""
+Deterministic synthetic data for load benchmarks.
+
+Fills the database with `--users` users, each with goals for every year in
+range, `--habits` habits with up to `--versions` versions (target and goal
+link changes spread over the period) and `--years` years of completions
+ending at `--end`. Weekly completions follow a per-habit adherence rate and
+never exceed the active version's target, exactly as the API would allow.
+Materialized week counts, streaks and goal rollups are rebuilt afterwards.
+
+The same seed, sizes and end date always produce the same rows and ids.
+Users are `bench-<n>` (Google subject) / `bench<n>@example.com`; see
+benchmarks.load for driving traffic at them. Existing bench users are
+removed first. Restart the API after regenerating, so no worker serves
+cached weeks of the previous run.
+
+Usage (from backend/, with DATABASE_URL pointing at the docker-compose
+Postgres and migrations applied):
+
+    python -m benchmarks.datagen --users 50 --habits 8 --versions 3 --years 2
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, text
+
+from app.core.database import SessionLocal
+from app.models.goal import Goal
+from app.models.habit import Habit
+from app.models.habit_completion import HabitCompletion
+from app.models.habit_version import HabitVersion
+from app.models.user import User
+from app.services.goal_rollup_service import rebuild_goal_rollups
+from app.services.streak_service import rebuild_streaks
+from app.services.week_count_service import rebuild_week_counts
+from app.utils.date_utils import get_week_start
+
+NAMESPACE = uuid.UUID("6f1c1d5e-9a51-4d55-8e2b-4a3c0b7f1e20")
+BENCH_SUBJECT_PREFIX = "bench-"
+INSERT_CHUNK = 5000
+
+HABIT_NAMES = (
+    "Run", "Read", "Meditate", "Stretch", "Journal", "Guitar", "Spanish",
+    "Swim", "Cook", "Sketch", "Strength", "Walk", "Piano", "Code kata",
+)
+GOAL_TITLES = ("Get fit", "Learn a language", "Read more", "Be mindful", "Make music")
+
+_DELETE_SQL = [
+    text(f"DELETE FROM {table} WHERE user_id IN (SELECT id FROM bench_users)")
+    for table in (
+        "goal_week_rollups", "habit_streaks", "habit_week_counts",
+        "completion_week_revisions", "user_change_counters", "habit_completions",
+    )
+] + [
+    text("DELETE FROM habit_versions WHERE habit_id IN "
+         "(SELECT id FROM habits WHERE user_id IN (SELECT id FROM bench_users))"),
+    text("DELETE FROM habits WHERE user_id IN (SELECT id FROM bench_users)"),
+    text("DELETE FROM goals WHERE user_id IN (SELECT id FROM bench_users)"),
+    text("DELETE FROM users WHERE id IN (SELECT id FROM bench_users)"),
+]
+
+
+def bench_subject(index: int) -> str:
+    return f"{BENCH_SUBJECT_PREFIX}{index}"
+
+
+def bench_email(index: int) -> str:
+    return f"bench{index}@example.com"
+
+
+def _id(*parts) -> str:
+    return str(uuid.uuid5(NAMESPACE, "/".join(str(part) for part in parts)))
+
+
+def generate_user(index: int, habits: int, versions: int, start: date, end: date, seed: int) -> dict:
+    """
+    Rows for one bench user, keyed by table: users, goals, habits,
+    habit_versions and habit_completions. Depends only on the arguments.
+    """
+    rng = random.Random(f"{seed}/{index}")
+    user_id = _id(seed, "user", index)
+    created = datetime.combine(start, datetime.min.time())
+    rows: dict[str, list[dict]] = {
+        "users": [{
+            "id": user_id, "google_user_id": bench_subject(index), "email": bench_email(index),
+            "created_at": created, "updated_at": created,
+        }],
+        "goals": [], "habits": [], "habit_versions": [], "habit_completions": [],
+    }
+
+    goals_by_year: dict[int, list[str]] = {}
+    for year in range(start.year, end.year + 1):
+        for n, title in enumerate(rng.sample(GOAL_TITLES, 3)):
+            goal_id = _id(seed, "goal", index, year, n)
+            goals_by_year.setdefault(year, []).append(goal_id)
+            rows["goals"].append({
+                "id": goal_id, "user_id": user_id, "title": f"{title} {year}", "year": year,
+                "description": None, "is_deleted": False, "created_at": created, "updated_at": created,
+            })
+
+    first_week = get_week_start(start)
+    weeks = (get_week_start(end) - first_week).days // 7 + 1
+    for h in range(habits):
+        habit_id = _id(seed, "habit", index, h)
+        rows["habits"].append({
+            "id": habit_id, "user_id": user_id, "name": f"{rng.choice(HABIT_NAMES)} {h + 1}",
+            "order_index": h, "is_deleted": False, "created_at": created, "updated_at": created,
+        })
+
+        # Version changes on distinct weeks after the first
+        change_weeks = sorted(rng.sample(range(1, weeks), min(versions, weeks) - 1)) if weeks > 1 else []
+        schedule = []
+        for v, week in enumerate([0] + change_weeks):
+            week_start = first_week + timedelta(weeks=week)
+            goals = goals_by_year.get(week_start.year) or goals_by_year[start.year]
+            version = {
+                "id": _id(seed, "version", index, h, v), "habit_id": habit_id,
+                "weekly_target": rng.randint(1, 7),
+                "requires_text_on_completion": rng.random() < 0.1,
+                "linked_goal_id": rng.choice(goals) if rng.random() < 0.6 else None,
+                "description": None, "effective_week_start": week_start,
+                "created_at": created, "updated_at": created,
+            }
+            rows["habit_versions"].append(version)
+            schedule.append(version)
+
+        adherence = rng.uniform(0.3, 0.95)
+        active = schedule[0]
+        for week in range(weeks):
+            week_start = first_week + timedelta(weeks=week)
+            while schedule and schedule[0]["effective_week_start"] <= week_start:
+                active = schedule.pop(0)
+            days = [week_start + timedelta(days=d) for d in range(7)]
+            days = [day for day in days if start <= day <= end]
+            if not days:
+                continue
+            done = sum(rng.random() < adherence for _ in range(active["weekly_target"]))
+            for n in range(done):
+                day = rng.choice(days)
+                stamp = datetime.combine(day, datetime.min.time()) + timedelta(
+                    hours=rng.randint(6, 22), minutes=rng.randint(0, 59), seconds=n,
+                )
+                rows["habit_completions"].append({
+                    "id": _id(seed, "completion", index, h, week, n), "user_id": user_id,
+                    "habit_id": habit_id, "date": day,
+                    "text": "bench note" if active["requires_text_on_completion"] else None,
+                    "created_at": stamp, "updated_at": stamp,
+                })
+    return rows
+
+
+def _insert(db, model, rows: list[dict]) -> None:
+    for offset in range(0, len(rows), INSERT_CHUNK):
+        db.execute(insert(model), rows[offset:offset + INSERT_CHUNK])
+
+
+def main(args: argparse.Namespace) -> None:
+    end = date.fromisoformat(args.end) if args.end else date.today()
+    start = end - timedelta(days=round(365.25 * args.years))
+    started = time.perf_counter()
+
+    db = SessionLocal()
+    try:
+        db.execute(text(
+            "CREATE TEMP TABLE bench_users ON COMMIT DROP AS "
+            "SELECT id FROM users WHERE google_user_id LIKE :prefix"
+        ), {"prefix": f"{BENCH_SUBJECT_PREFIX}%"})
+        for statement in _DELETE_SQL:
+            db.execute(statement)
+        db.commit()
+
+        totals = dict.fromkeys(("users", "goals", "habits", "habit_versions", "habit_completions"), 0)
+        user_ids = []
+        for index in range(args.users):
+            rows = generate_user(index, args.habits, args.versions, start, end, args.seed)
+            for model, table in (
+                (User, "users"), (Goal, "goals"), (Habit, "habits"),
+                (HabitVersion, "habit_versions"), (HabitCompletion, "habit_completions"),
+            ):
+                _insert(db, model, rows[table])
+                totals[table] += len(rows[table])
+            db.commit()
+            user_ids.append(rows["users"][0]["id"])
+
+        for user_id in user_ids:
+            rebuild_week_counts(db, user_id)
+            rebuild_streaks(db, user_id)
+            rebuild_goal_rollups(db, user_id)
+    finally:
+        db.close()
+
+    print(f"{start} .. {end}, seed {args.seed}, {time.perf_counter() - started:.1f}s")
+    for table, count in totals.items():
+        print(f"  {table:<18} {count:>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--habits", type=int, default=8, help="habits per user")
+    parser.add_argument("--versions", type=int, default=3, help="versions per habit")
+    parser.add_argument("--years", type=float, default=2, help="years of completion history")
+    parser.add_argument("--end", help="last day of history, YYYY-MM-DD (default: today)")
+    parser.add_argument("--seed", type=int, default=1)
+    main(parser.parse_args())
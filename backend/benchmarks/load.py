@@ -0,0 +1,306 @@
+"""
+Scripted load against the API for users created by benchmarks.datagen.
+
+Each of `--concurrency` workers repeatedly picks a bench user and an action
+from WORKLOAD (weighted) until `--requests` have been issued:
+
+    today            GET  /api/today                         daily page load
+    habits           GET  /api/habits?include_streaks=true   daily page load
+    goals            GET  /api/goals?include_progress=true   daily page load
+    tap              POST /api/completions                   completion tap
+    untap            DELETE /api/completions/{id}            undo a tap
+    range            GET  /api/completions?start=&end=       progress range
+    weekly           GET  /api/progress/weekly?start=&end=   progress range
+    goal_progress    GET  /api/goals/{id}/progress?year=     progress range
+    heatmap          GET  /api/habits/heatmap?year=          progress range
+    edit             PUT  /api/habits/{id}                   habit edit
+
+and the report gives count, errors, throughput and p50/p95/p99 latency
+per action. Requests are signed as the bench users with AUTH_SECRET, so it
+must match the server's. The action sequence depends only on `--seed`.
+
+With `--baseline FILE` the run fails (exit 1) when any action's p95 (p50
+for actions with fewer than MIN_P95_SAMPLES requests) is more than
+`--tolerance` slower than the baseline's (plus `--slack-ms`, so
+sub-millisecond noise does not count), its throughput drops by more than
+`--tolerance`, or it had errors. `--save-baseline FILE` writes this run's
+results as the new baseline; baselines are only comparable on the same
+machine, data size and concurrency.
+
+Usage (from backend/, after python -m benchmarks.datagen and with the API
+running):
+
+    python -m benchmarks.load --url http://localhost:8000 --users 50 --concurrency 20 --requests 5000
+    python -m benchmarks.load --in-process --users 20 --baseline benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from jose import jwt
+
+from app.core.config import settings
+from benchmarks.datagen import bench_email, bench_subject
+
+# action -> relative weight
+WORKLOAD = {
+    "today": 25,
+    "habits": 10,
+    "goals": 5,
+    "tap": 15,
+    "untap": 5,
+    "range": 15,
+    "weekly": 10,
+    "goal_progress": 5,
+    "heatmap": 5,
+    "edit": 5,
+}
+
+# Business rejections that are part of the workload, not failures: a tap on
+# a habit whose weekly target is already met, an untap racing another.
+EXPECTED_STATUS = {
+    "tap": {201, 400},
+    "untap": {200, 404},
+}
+
+RANGE_DAYS = (7, 28, 91, 365)
+
+# Below this many requests an action's p95 is its top few samples, so the
+# baseline check compares its p50 instead
+MIN_P95_SAMPLES = 100
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def bench_token(index: int) -> str:
+    payload = {"sub": bench_subject(index), "email": bench_email(index), "exp": int(time.time()) + 24 * 3600}
+    return jwt.encode(payload, settings.AUTH_SECRET, algorithm="HS256")
+
+
+class BenchUser:
+    """A bench user's auth header plus the ids the actions need"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.headers = {"Authorization": f"Bearer {bench_token(index)}", "Accept-Encoding": "gzip"}
+        self.habits: list[dict] = []
+        self.goal_ids: list[str] = []
+        self.taps: list[str] = []
+
+    async def load(self, client: httpx.AsyncClient) -> None:
+        habits = await client.get("/api/habits", headers=self.headers)
+        goals = await client.get("/api/goals", headers=self.headers)
+        habits.raise_for_status()
+        goals.raise_for_status()
+        self.habits = [habit for habit in habits.json() if not habit["is_deleted"]]
+        self.goal_ids = [goal["id"] for goal in goals.json()]
+        if not self.habits:
+            raise RuntimeError(f"{bench_subject(self.index)} has no habits; run benchmarks.datagen first")
+
+
+def resolve_action(action: str, user: BenchUser) -> str:
+    """The action actually run: untap needs an earlier tap, goal_progress a goal"""
+    if action == "untap" and not user.taps:
+        return "tap"
+    if action == "goal_progress" and not user.goal_ids:
+        return "heatmap"
+    return action
+
+
+def build_request(action: str, user: BenchUser, rng: random.Random, today: date) -> tuple[str, str, dict]:
+    """(method, url, extra request kwargs) for a resolved action"""
+    if action == "today":
+        return "GET", "/api/today", {}
+    if action == "habits":
+        return "GET", "/api/habits?include_streaks=true", {}
+    if action == "goals":
+        return "GET", "/api/goals?include_progress=true", {}
+    if action == "tap":
+        habit = rng.choice(user.habits)
+        body = {"habit_id": habit["id"], "date": today.isoformat(), "text": "bench tap"}
+        return "POST", "/api/completions", {"json": body}
+    if action == "untap":
+        return "DELETE", f"/api/completions/{user.taps.pop(rng.randrange(len(user.taps)))}", {}
+    if action in ("range", "weekly"):
+        start = today - timedelta(days=rng.choice(RANGE_DAYS))
+        path = "/api/progress/weekly" if action == "weekly" else "/api/completions"
+        return "GET", f"{path}?start={start.isoformat()}&end={today.isoformat()}", {}
+    if action == "goal_progress":
+        return "GET", f"/api/goals/{rng.choice(user.goal_ids)}/progress?year={today.year}", {}
+    if action == "heatmap":
+        return "GET", f"/api/habits/heatmap?year={today.year - rng.randint(0, 1)}", {}
+    if action == "edit":
+        habit = rng.choice(user.habits)
+        latest = habit["versions"][0]
+        body = {
+            "name": habit["name"],
+            "weekly_target": rng.randint(1, 7),
+            "requires_text_on_completion": latest["requires_text_on_completion"],
+            "linked_goal_id": latest["linked_goal_id"],
+            "description": latest["description"],
+            "order_index": habit["order_index"],
+        }
+        return "PUT", f"/api/habits/{habit['id']}", {"json": body}
+    raise ValueError(f"unknown action {action!r}")
+
+
+async def run(client: httpx.AsyncClient, args: argparse.Namespace) -> dict:
+    users = [BenchUser(index) for index in range(args.users)]
+    await asyncio.gather(*(user.load(client) for user in users))
+
+    rng = random.Random(args.seed)
+    actions, weights = zip(*WORKLOAD.items())
+    plan = [(rng.choice(users), rng.choices(actions, weights)[0], rng.random()) for _ in range(args.requests)]
+    today = date.today()
+
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    queue = iter(plan)
+
+    async def worker() -> None:
+        for user, action, salt in queue:
+            action = resolve_action(action, user)
+            method, url, kwargs = build_request(action, user, random.Random(salt), today)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, headers=user.headers, **kwargs)
+                ok = response.status_code in EXPECTED_STATUS.get(action, {200, 201, 304})
+            except Exception:
+                # Transport errors, or with --in-process the app's own exception
+                response, ok = None, False
+            latencies[action].append(time.perf_counter() - started)
+            if not ok:
+                errors[action] += 1
+            elif action == "tap" and response.status_code == 201:
+                user.taps.append(response.json()["id"])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    results = {}
+    for action in WORKLOAD:
+        ordered = sorted(latencies.get(action, []))
+        if not ordered:
+            continue
+        results[action] = {
+            "count": len(ordered),
+            "errors": errors.get(action, 0),
+            "rps": round(len(ordered) / elapsed, 2),
+            "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        }
+    return {
+        "config": {
+            "users": args.users, "concurrency": args.concurrency, "requests": args.requests,
+            "seed": args.seed, "target": "in-process" if args.in_process else args.url,
+            "machine": f"{platform.system()} {platform.machine()} py{platform.python_version()}",
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "rps": round(args.requests / elapsed, 2),
+        "actions": results,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float, slack_ms: float) -> list[str]:
+    """Regressions of `report` against `baseline`, as readable lines"""
+    problems = []
+    for action, current in report["actions"].items():
+        if current["errors"]:
+            problems.append(f"{action}: {current['errors']} error(s)")
+        before = baseline["actions"].get(action)
+        if before is None:
+            continue
+        stat = "p95_ms" if min(current["count"], before["count"]) >= MIN_P95_SAMPLES else "p50_ms"
+        allowed = before[stat] * (1 + tolerance) + slack_ms
+        if current[stat] > allowed:
+            problems.append(f"{action}: {stat[:3]} {current[stat]:.1f} ms > {allowed:.1f} ms allowed")
+        if current["rps"] < before["rps"] * (1 - tolerance):
+            problems.append(f"{action}: {current['rps']:.1f} req/s < {before['rps'] * (1 - tolerance):.1f} allowed")
+    return problems
+
+
+def print_report(report: dict) -> None:
+    config = report["config"]
+    print(
+        f"{config['target']}  users={config['users']} concurrency={config['concurrency']} "
+        f"requests={config['requests']}  {report['rps']:.1f} req/s in {report['elapsed_seconds']:.1f}s"
+    )
+    print(f"  {'action':<14} {'count':>6} {'errors':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for action, result in report["actions"].items():
+        print(
+            f"  {action:<14} {result['count']:>6} {result['errors']:>6} {result['rps']:>8.1f} "
+            f"{result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f}"
+        )
+
+
+async def main(args: argparse.Namespace) -> int:
+    if args.in_process:
+        # Client and server share one event loop here, so statements "run
+        # slow" while waiting for it; the per-statement warnings are noise
+        logging.getLogger("app.sql").setLevel(logging.ERROR)
+        from main import app
+        from app.core.database import async_engine
+
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+    else:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        client = httpx.AsyncClient(base_url=args.url, timeout=60, limits=limits)
+
+    async with client:
+        report = await run(client, args)
+    if args.in_process:
+        await async_engine.dispose()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(report, json.load(f), args.tolerance, args.slack_ms)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000", help="API base URL")
+    parser.add_argument("--in-process", action="store_true", help="drive main.app in this process instead of --url")
+    parser.add_argument("--users", type=int, default=50, help="bench users to spread load over (<= datagen --users)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the report as JSON")
+    parser.add_argument("--baseline", help="fail on regressions against this report")
+    parser.add_argument("--save-baseline", help="write this run's report as a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--slack-ms", type=float, default=2.0, help="allowed absolute p95 slowdown on top")
+    sys.exit(asyncio.run(main(parser.parse_args())))
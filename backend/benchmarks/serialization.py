@@ -0,0 +1,94 @@
+"""
+Serialization cost of list responses: response_model vs. the fast path.
+
+    model  ORM objects validated through response_model (from_attributes)
+           and rendered by JSONResponse, i.e. what FastAPI does for an
+           endpoint that returns the ORM result
+    fast   column tuples zipped into dicts and encoded by app.core.fast_json
+
+Rows are built in memory, so this measures serialization only (no database).
+Both paths must produce identical bytes; the benchmark fails otherwise.
+
+Usage (from backend/):
+
+    python -m benchmarks.serialization --rows 10000 --repeat 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.api.v1.endpoints.completions import COMPLETION_FIELDS
+from app.core.fast_json import encode, records
+from app.models.habit_completion import HabitCompletion
+from app.schemas.completion import CompletionResponse
+
+
+def make_rows(count: int) -> list[tuple]:
+    """Deterministic completion rows, roughly a year for a heavy user"""
+    habit_ids = [str(uuid.UUID(int=i + 1)) for i in range(25)]
+    started = datetime(2025, 1, 1, 7, 30)
+    rows = []
+    for i in range(count):
+        created = started + timedelta(minutes=53 * i, microseconds=(i * 7919) % 1_000_000)
+        rows.append((
+            str(uuid.UUID(int=10_000 + i)),
+            habit_ids[i % len(habit_ids)],
+            created.date(),
+            f"note {i} – ünïcode" if i % 3 == 0 else None,
+            created,
+            created,
+        ))
+    return rows
+
+
+def model_path(objects: list[HabitCompletion]) -> bytes:
+    field = create_model_field(name="Response", type_=List[CompletionResponse], mode="serialization")
+    content = asyncio.run(serialize_response(field=field, response_content=objects, is_coroutine=True))
+    return JSONResponse(content).body
+
+
+def fast_path(rows: list[tuple]) -> bytes:
+    return encode(records(COMPLETION_FIELDS, rows))
+
+
+def best_of(repeat: int, fn, *args) -> tuple[float, bytes]:
+    best, body = float("inf"), b""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, body
+
+
+def main(args: argparse.Namespace) -> None:
+    rows = make_rows(args.rows)
+    objects = [HabitCompletion(**dict(zip(COMPLETION_FIELDS, row))) for row in rows]
+
+    model_seconds, model_body = best_of(args.repeat, model_path, objects)
+    fast_seconds, fast_body = best_of(args.repeat, fast_path, rows)
+
+    if model_body != fast_body:
+        raise SystemExit("fast path output differs from response_model output")
+
+    print(f"rows={args.rows} bytes={len(fast_body)} (identical)")
+    print(f"  model  {model_seconds * 1000:8.2f} ms")
+    print(f"  fast   {fast_seconds * 1000:8.2f} ms")
+    print(f"  speedup {model_seconds / fast_seconds:7.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
@@ -1,13 +1,28 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from app.core.config import settings
+from app.core.database import async_engine
+from app.core.metrics import MetricsMiddleware, UncompressedSizeMiddleware
+from app.core.profiling import ProfilingMiddleware
+from app.core.query_stats import QueryStatsMiddleware
 from app.api.v1.api import api_router
+from app.api.v1.endpoints import metrics
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Close pooled connections cleanly on worker shutdown
+    await async_engine.dispose()
+
 
 app = FastAPI(
     title="Habit Tracker API",
     description="API for goal-linked habit tracking",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware (for development; adjust for production)
@@ -17,13 +32,43 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Keyset pagination cursor, readable by browser clients
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
 
+# Middleware added later wraps what was added before it
+if settings.METRICS_ENABLED:
+    app.add_middleware(UncompressedSizeMiddleware)
+
 # Gzip compression middleware
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
+# Per-route latency, in-flight, sizes and query counts for /metrics
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Query count, DB time and slowest statement per request (Server-Timing + log)
+if settings.SQL_INSTRUMENTATION:
+    app.add_middleware(QueryStatsMiddleware, strict=settings.SQL_STRICT_MODE)
+
+# Opt-in sampling profiler for single requests (X-Profile-Token / PROFILE_USERS)
+if settings.PROFILE_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        directory=settings.PROFILE_DIR,
+        secret=settings.PROFILE_SECRET,
+        users=tuple(settings.PROFILE_USERS),
+        output_format=settings.PROFILE_FORMAT,
+        interval_seconds=settings.PROFILE_INTERVAL_MS / 1000,
+        max_per_minute=settings.PROFILE_MAX_PER_MINUTE,
+        max_files=settings.PROFILE_MAX_FILES,
+    )
+
 app.include_router(api_router, prefix="/api")
 
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
+
 @app.get("/")
 async def root():
     return {"message": "Habit Tracker API"}
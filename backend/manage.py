@@ -0,0 +1,163 @@
+"""
+Maintenance commands for the habits backend.
+
+Usage (from backend/):
+    python manage.py week-counts check [--user-id UUID]
+    python manage.py week-counts rebuild [--user-id UUID]
+    python manage.py streaks rebuild [--user-id UUID]
+    python manage.py goal-rollups rebuild [--user-id UUID]
+    python manage.py versions compact [--user-id UUID]
+    python manage.py profile token [--ttl-minutes N]
+    python manage.py slow-queries top [--url URL] [--limit N] [--sort KEY] [--plans]
+"""
+import argparse
+import sys
+
+from app.core.database import SessionLocal
+
+
+def week_counts(args: argparse.Namespace) -> int:
+    from app.services.week_count_service import find_week_count_drift, rebuild_week_counts
+
+    db = SessionLocal()
+    try:
+        if args.action == "check":
+            drift = find_week_count_drift(db, args.user_id)
+            for row in drift:
+                print(
+                    f"user={row['user_id']} habit={row['habit_id']} "
+                    f"week={row['week_start']} stored={row['stored']} actual={row['actual']}"
+                )
+            print(f"{len(drift)} inconsistent habit-week counter(s)")
+            return 1 if drift else 0
+
+        written = rebuild_week_counts(db, args.user_id)
+        print(f"Rebuilt {written} habit-week counter(s)")
+        return 0
+    finally:
+        db.close()
+
+
+def streaks(args: argparse.Namespace) -> int:
+    from app.services.streak_service import rebuild_streaks
+
+    db = SessionLocal()
+    try:
+        written = rebuild_streaks(db, args.user_id)
+        print(f"Recomputed streaks for {written} habit(s)")
+        return 0
+    finally:
+        db.close()
+
+
+def goal_rollups(args: argparse.Namespace) -> int:
+    from app.services.goal_rollup_service import rebuild_goal_rollups
+
+    db = SessionLocal()
+    try:
+        written = rebuild_goal_rollups(db, args.user_id)
+        print(f"Rebuilt {written} goal-week rollup(s)")
+        return 0
+    finally:
+        db.close()
+
+
+def versions(args: argparse.Namespace) -> int:
+    from app.services.habit_service import compact_habit_versions
+
+    db = SessionLocal()
+    try:
+        removed = compact_habit_versions(db, args.user_id)
+        print(f"Removed {removed} redundant habit version(s)")
+        return 0
+    finally:
+        db.close()
+
+
+def profile(args: argparse.Namespace) -> int:
+    from app.core.config import settings
+    from app.core.profiling import PROFILE_HEADER, sign_profile_token
+
+    if not settings.PROFILE_SECRET:
+        print("PROFILE_SECRET is not set", file=sys.stderr)
+        return 1
+    print(f"{PROFILE_HEADER}: {sign_profile_token(settings.PROFILE_SECRET, args.ttl_minutes * 60)}")
+    return 0
+
+
+def slow_queries(args: argparse.Namespace) -> int:
+    import httpx
+    from app.core.config import settings
+
+    # Statistics live in the API workers, so ask one of them
+    if not settings.ADMIN_TOKEN:
+        print("ADMIN_TOKEN is not set", file=sys.stderr)
+        return 1
+    response = httpx.get(
+        f"{args.url.rstrip('/')}/api/admin/slow-queries",
+        params={"limit": args.limit, "sort": args.sort},
+        headers={"X-Admin-Token": settings.ADMIN_TOKEN},
+        timeout=10,
+    )
+    if response.status_code != 200:
+        print(f"{response.status_code}: {response.text}", file=sys.stderr)
+        return 1
+
+    report = response.json()
+    print(f"{'calls':>8} {'slow':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'total ms':>11}  fingerprint       sql")
+    for query in report["queries"]:
+        print(
+            f"{query['calls']:>8} {query['slow_calls']:>6} {query['p50_ms']:>9.2f} "
+            f"{query['p95_ms']:>9.2f} {query['p99_ms']:>9.2f} {query['total_ms']:>11.1f}  "
+            f"{query['fingerprint']}  {query['sql'][:120]}"
+        )
+        if args.plans and query["plan"]:
+            print(f"    plan captured at {query['plan_ms']} ms:")
+            for line in query["plan"].splitlines():
+                print(f"    {line}")
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Habits backend maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    counts = commands.add_parser("week-counts", help="Check or rebuild habit_week_counts")
+    counts.add_argument("action", choices=["check", "rebuild"])
+    counts.add_argument("--user-id", help="Limit to one user")
+    counts.set_defaults(handler=week_counts)
+
+    streak = commands.add_parser("streaks", help="Recompute habit_streaks")
+    streak.add_argument("action", choices=["rebuild"])
+    streak.add_argument("--user-id", help="Limit to one user")
+    streak.set_defaults(handler=streaks)
+
+    rollups = commands.add_parser("goal-rollups", help="Recompute goal_week_rollups")
+    rollups.add_argument("action", choices=["rebuild"])
+    rollups.add_argument("--user-id", help="Limit to one user")
+    rollups.set_defaults(handler=goal_rollups)
+
+    version = commands.add_parser("versions", help="Compact habit_versions")
+    version.add_argument("action", choices=["compact"])
+    version.add_argument("--user-id", help="Limit to one user")
+    version.set_defaults(handler=versions)
+
+    profiling = commands.add_parser("profile", help="Issue a request profiling token")
+    profiling.add_argument("action", choices=["token"])
+    profiling.add_argument("--ttl-minutes", type=int, default=30, help="Validity (max 24h)")
+    profiling.set_defaults(handler=profile)
+
+    slow = commands.add_parser("slow-queries", help="Show a worker's slowest statements")
+    slow.add_argument("action", choices=["top"])
+    slow.add_argument("--url", default="http://localhost:8000", help="API base URL")
+    slow.add_argument("--limit", type=int, default=20)
+    slow.add_argument("--sort", default="total", choices=["total", "p99", "p95", "calls", "max", "slow"])
+    slow.add_argument("--plans", action="store_true", help="Print captured EXPLAIN plans")
+    slow.set_defaults(handler=slow_queries)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
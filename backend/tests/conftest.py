@@ -0,0 +1,90 @@
+"""
+Shared fixtures.
+
+Database tests run against a real, disposable Postgres database named by
+TEST_DATABASE_URL: it is migrated to head once per session and every table
+is truncated after each test. Without TEST_DATABASE_URL they are skipped.
+
+Every request in the suite runs with SQL_STRICT_MODE on, so an endpoint
+that exceeds its query_budget or lazy loads a relationship in
+STRICT_LAZY_LOADS fails the test that called it.
+"""
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+TEST_AUTH_SECRET = "test-secret"
+
+# Settings are read at import time, so the environment is fixed before any
+# app module is imported
+if TEST_DATABASE_URL:
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+os.environ["APP_ENV"] = "test"
+os.environ["AUTH_SECRET"] = TEST_AUTH_SECRET
+os.environ["SQL_STRICT_MODE"] = "true"
+# pytest-asyncio runs each test in its own event loop, and pooled asyncpg
+# connections cannot move between loops
+os.environ["DB_POOL_MODE"] = "null"
+
+import httpx
+import pytest
+from jose import jwt
+from sqlalchemy import text
+
+from app.core.database import Base, SessionLocal
+from app.core.identity_cache import identity_cache, token_cache
+from main import app
+
+
+def auth_headers(subject: str = "user-1", email: str | None = None) -> dict[str, str]:
+    """Bearer header for a NextAuth-style token; the user is created on first use"""
+    payload = {
+        "sub": subject,
+        "email": email or f"{subject}@example.com",
+        "exp": int(time.time()) + 3600,
+    }
+    return {"Authorization": f"Bearer {jwt.encode(payload, TEST_AUTH_SECRET, algorithm='HS256')}"}
+
+
+@pytest.fixture(scope="session")
+def database():
+    """Migrate TEST_DATABASE_URL to head (alembic in a subprocess keeps its logging config out)"""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head"],
+        cwd=BACKEND_DIR,
+        env=os.environ.copy(),
+        check=True,
+        capture_output=True,
+    )
+    return TEST_DATABASE_URL
+
+
+@pytest.fixture
+def db(database):
+    """Sync session for arranging and inspecting rows; all tables are emptied afterwards"""
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+        session.execute(text(f"TRUNCATE {tables} CASCADE"))
+        session.commit()
+        session.close()
+        # Resolved identities point at users that no longer exist
+        token_cache.clear()
+        identity_cache.clear()
+
+
+@pytest.fixture
+async def client(db):
+    """HTTP client driving the app in-process"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        yield http
@@ -0,0 +1,263 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from app.core import cache
+from app.core.cache import MemoryCacheBackend, NullCacheBackend, RedisCacheBackend
+from app.services import completion_week_cache
+from tests.conftest import auth_headers
+
+BACKENDS = ["memory", "redis"]
+
+
+def make_backend(kind: str, max_entries: int = 1000, ttl_seconds: float = 300) -> cache.CacheBackend:
+    if kind == "memory":
+        return MemoryCacheBackend(max_entries, ttl_seconds)
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisCacheBackend(ttl_seconds=ttl_seconds, client=fakeredis.aioredis.FakeRedis())
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, monkeypatch):
+    """The response and completion-week caches, both of one kind"""
+    responses = make_backend(request.param)
+    monkeypatch.setattr(cache, "response_cache", responses)
+    monkeypatch.setattr(completion_week_cache, "week_cache", make_backend(request.param))
+    return responses
+
+
+# Backend-level behaviour
+
+
+@pytest.mark.parametrize("kind", BACKENDS)
+async def test_get_after_set_hits_and_unknown_keys_miss(kind):
+    store = make_backend(kind)
+    await store.set("user-a", "key", b"body")
+
+    assert await store.get("user-a", "key") == b"body"
+    assert await store.get("user-a", "other") is None
+    assert await store.get_many("user-a", ["key", "other"]) == [b"body", None]
+    assert (store.hits, store.misses) == (2, 2)
+
+
+@pytest.mark.parametrize("kind", BACKENDS)
+async def test_users_are_namespaced(kind):
+    store = make_backend(kind)
+    await store.set("user-a", "key", b"a")
+    await store.set("user-b", "key", b"b")
+
+    await store.invalidate("user-a")
+
+    assert await store.get("user-a", "key") is None
+    assert await store.get("user-b", "key") == b"b"
+    assert store.invalidations == 1
+
+
+async def test_memory_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("time.time", lambda: now[0])
+    store = MemoryCacheBackend(max_entries=10, ttl_seconds=60)
+    await store.set("user-a", "key", b"body")
+
+    now[0] += 59
+    assert await store.get("user-a", "key") == b"body"
+    now[0] += 1
+    assert await store.get("user-a", "key") is None
+    assert (store.hits, store.misses) == (1, 1)
+
+
+async def test_redis_entries_carry_the_ttl():
+    store = make_backend("redis", ttl_seconds=60)
+    await store.set("user-a", "key", b"body")
+
+    ttl_ms = await store.client.pttl(await store._key("user-a", "key"))
+    assert 59_000 < ttl_ms <= 60_000
+
+
+async def test_memory_evicts_least_recently_used():
+    store = MemoryCacheBackend(max_entries=2, ttl_seconds=60)
+    await store.set("user-a", "first", b"1")
+    await store.set("user-a", "second", b"2")
+    assert await store.get("user-a", "first") == b"1"
+
+    await store.set("user-a", "third", b"3")
+
+    assert await store.get("user-a", "second") is None
+    assert await store.get("user-a", "first") == b"1"
+    assert store.stats()["evictions"] == 1
+    assert store.stats()["entries"] == 2
+
+
+async def test_redis_errors_count_as_misses():
+    class Broken:
+        async def get(self, key):
+            raise ConnectionError("down")
+
+        async def set(self, *args, **kwargs):
+            raise ConnectionError("down")
+
+        async def mget(self, keys):
+            raise ConnectionError("down")
+
+        async def incr(self, key):
+            raise ConnectionError("down")
+
+    store = RedisCacheBackend(client=Broken())
+    await store.set("user-a", "key", b"body")
+    assert await store.get("user-a", "key") is None
+    assert await store.get_many("user-a", ["key"]) == [None]
+    await store.invalidate("user-a")
+    assert (store.misses, store.errors) == (2, 4)
+
+
+# Through the API
+
+
+async def _fresh(client, monkeypatch, url: str, headers: dict) -> bytes:
+    """The body built without any cache"""
+    with monkeypatch.context() as patch:
+        patch.setattr(cache, "response_cache", NullCacheBackend())
+        patch.setattr(completion_week_cache, "week_cache", NullCacheBackend())
+        response = await client.get(url, headers=headers)
+    assert response.status_code == 200
+    return response.content
+
+
+async def _seed(client, db, headers) -> dict:
+    """A goal, two habits (one backdated a few weeks) and completions in the past and today"""
+    today = date.today()
+    goal_id = (await client.post("/api/goals", json={"title": "Fit", "year": today.year}, headers=headers)).json()["id"]
+    habit_id = (await client.post(
+        "/api/habits", json={"name": "Run", "weekly_target": 7, "linked_goal_id": goal_id}, headers=headers
+    )).json()["id"]
+    other_id = (await client.post("/api/habits", json={"name": "Read", "weekly_target": 3}, headers=headers)).json()["id"]
+    db.execute(
+        text("UPDATE habit_versions SET effective_week_start = effective_week_start - 28 WHERE habit_id = :id"),
+        {"id": habit_id},
+    )
+    db.commit()
+
+    past = (today - timedelta(days=14)).isoformat()
+    completion_ids = [
+        (await client.post("/api/completions", json={"habit_id": habit_id, "date": day}, headers=headers)).json()["id"]
+        for day in (past, past, today.isoformat())
+    ]
+    return {
+        "goal_id": goal_id, "habit_id": habit_id, "other_id": other_id,
+        "completion_ids": completion_ids, "past": past, "today": today.isoformat(),
+    }
+
+
+def _urls(seeded: dict) -> list[str]:
+    start = (date.today() - timedelta(days=35)).isoformat()
+    return [
+        "/api/habits",
+        "/api/habits?include_streaks=true",
+        "/api/goals",
+        "/api/goals?include_progress=true",
+        f"/api/completions?start={start}&end={seeded['today']}",
+        f"/api/completions?start={start}&end={seeded['today']}&limit=2",
+        f"/api/completions/habits/{seeded['habit_id']}/completions",
+    ]
+
+
+# name -> (write, prefixes of the urls whose body it changes)
+WRITES = {
+    "create habit": (lambda s: ("POST", "/api/habits", {"name": "Swim", "weekly_target": 2}), ["/api/habits"]),
+    "update habit": (
+        lambda s: ("PUT", f"/api/habits/{s['other_id']}", {"name": "Read more", "weekly_target": 4}),
+        ["/api/habits"],
+    ),
+    "reorder habits": (
+        lambda s: ("PATCH", "/api/habits/order", {"habit_ids": [s["other_id"], s["habit_id"]]}),
+        ["/api/habits"],
+    ),
+    "delete habit": (lambda s: ("DELETE", f"/api/habits/{s['other_id']}", None), ["/api/habits"]),
+    "create goal": (lambda s: ("POST", "/api/goals", {"title": "Calm", "year": date.today().year}), ["/api/goals"]),
+    "update goal": (
+        lambda s: ("PUT", f"/api/goals/{s['goal_id']}", {"title": "Fitter", "year": date.today().year}),
+        ["/api/goals"],
+    ),
+    "delete goal": (lambda s: ("DELETE", f"/api/goals/{s['goal_id']}", None), ["/api/goals"]),
+    "create completion": (
+        lambda s: ("POST", "/api/completions", {"habit_id": s["habit_id"], "date": s["past"]}),
+        ["/api/completions", "/api/completions/habits"],
+    ),
+    "batch completions": (
+        lambda s: ("POST", "/api/completions/batch", {"items": [
+            {"habit_id": s["habit_id"], "date": s["past"]}, {"habit_id": s["habit_id"], "date": s["today"]},
+        ]}),
+        ["/api/completions", "/api/completions/habits"],
+    ),
+    "delete completion": (
+        lambda s: ("DELETE", f"/api/completions/{s['completion_ids'][0]}", None),
+        ["/api/completions", "/api/completions/habits"],
+    ),
+}
+
+
+async def test_repeated_get_is_served_from_the_cache(client, db, backend):
+    headers = auth_headers()
+    seeded = await _seed(client, db, headers)
+
+    for url in _urls(seeded):
+        first = await client.get(url, headers=headers)
+        hits = backend.hits
+        second = await client.get(url, headers=headers)
+        assert second.content == first.content, url
+        assert backend.hits == hits + 1, url
+
+
+@pytest.mark.parametrize("write", WRITES)
+async def test_no_stale_body_after_a_write(client, db, backend, monkeypatch, write):
+    headers = auth_headers()
+    seeded = await _seed(client, db, headers)
+    urls = _urls(seeded)
+    before = {url: (await client.get(url, headers=headers)).content for url in urls}
+
+    build, changed = WRITES[write]
+    method, path, body = build(seeded)
+    response = await client.request(method, path, json=body, headers=headers)
+    assert response.status_code in (200, 201), response.text
+
+    for url in urls:
+        after = (await client.get(url, headers=headers)).content
+        assert after == await _fresh(client, monkeypatch, url, headers), url
+        # A page of a list need not change, the whole list must
+        if url.startswith(tuple(changed)) and "limit=" not in url:
+            assert after != before[url], url
+
+
+async def test_users_do_not_see_each_others_cached_bodies(client, db, backend):
+    alice, bob = auth_headers("alice"), auth_headers("bob")
+    await client.post("/api/habits", json={"name": "Alice's", "weekly_target": 1}, headers=alice)
+    await client.post("/api/habits", json={"name": "Bob's", "weekly_target": 1}, headers=bob)
+
+    for _ in range(2):
+        assert "Alice's" in (await client.get("/api/habits", headers=alice)).text
+        assert "Bob's" in (await client.get("/api/habits", headers=bob)).text
+
+    # Alice's write leaves Bob's entry in place
+    await client.post("/api/habits", json={"name": "Alice's second", "weekly_target": 1}, headers=alice)
+    hits = backend.hits
+    assert "Alice's" not in (await client.get("/api/habits", headers=bob)).text
+    assert backend.hits == hits + 1
+
+
+async def test_memory_cache_stays_coherent_across_workers(client, db, monkeypatch):
+    """A write committed by another worker never invalidated this one's memory cache"""
+    this_worker, other_worker = MemoryCacheBackend(100, 300), MemoryCacheBackend(100, 300)
+    headers = auth_headers()
+    monkeypatch.setattr(cache, "response_cache", this_worker)
+    await client.post("/api/habits", json={"name": "Run", "weekly_target": 1}, headers=headers)
+    cached = (await client.get("/api/habits", headers=headers)).content
+
+    monkeypatch.setattr(cache, "response_cache", other_worker)
+    await client.post("/api/habits", json={"name": "Swim", "weekly_target": 1}, headers=headers)
+
+    monkeypatch.setattr(cache, "response_cache", this_worker)
+    invalidations = this_worker.invalidations
+    response = await client.get("/api/habits", headers=headers)
+    assert this_worker.invalidations == invalidations
+    assert b"Swim" in response.content and response.content != cached
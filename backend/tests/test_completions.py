@@ -0,0 +1,185 @@
+import uuid
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event, text
+
+from app.core.database import async_engine
+from app.utils.cursors import encode_cursor
+from app.utils.date_utils import get_client_today
+from tests.conftest import auth_headers
+
+_MALFORMED_CURSORS = [
+    {"date": "2024-01-01", "created_at": "2024-01-01T00:00:00", "id": 5},
+    {"date": 20240101, "created_at": "2024-01-01T00:00:00", "id": "00000000-0000-0000-0000-000000000000"},
+    {"date": "2024-01-01", "created_at": None, "id": "00000000-0000-0000-0000-000000000000"},
+    {"date": "2024-13-01", "created_at": "2024-01-01T00:00:00", "id": "00000000-0000-0000-0000-000000000000"},
+    {"date": "2024-01-01", "created_at": "2024-01-01T00:00:00"},
+]
+
+
+async def _habit(client, headers, weekly_target: int = 7) -> str:
+    response = await client.post("/api/habits", json={"name": "Run", "weekly_target": weekly_target}, headers=headers)
+    return response.json()["id"]
+
+
+@pytest.mark.parametrize("position", _MALFORMED_CURSORS)
+async def test_completion_listings_reject_malformed_cursors(client, position):
+    headers = auth_headers()
+    habit_id = await _habit(client, headers)
+    cursor = encode_cursor(position)
+
+    for url in (
+        f"/api/completions?start=2024-01-01&end=2024-12-31&limit=10&cursor={cursor}",
+        f"/api/completions/habits/{habit_id}/completions?limit=10&cursor={cursor}",
+    ):
+        response = await client.get(url, headers=headers)
+        assert response.status_code == 400, url
+        assert "Invalid cursor" in response.text
+
+
+async def test_completion_pages_follow_the_next_cursor(client):
+    headers = auth_headers()
+    habit_id = await _habit(client, headers)
+    today = date.today().isoformat()
+    created = [
+        (await client.post("/api/completions", json={"habit_id": habit_id, "date": today}, headers=headers)).json()["id"]
+        for _ in range(5)
+    ]
+
+    seen, cursor = [], None
+    while True:
+        url = f"/api/completions/habits/{habit_id}/completions?limit=2"
+        if cursor:
+            url += f"&cursor={cursor}"
+        response = await client.get(url, headers=headers)
+        assert response.status_code == 200
+        seen += [completion["id"] for completion in response.json()]
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            break
+
+    assert sorted(seen) == sorted(created)
+    assert len(seen) == len(set(seen))
+
+
+@pytest.mark.parametrize("offset", [10**12, -841, 841])
+async def test_offsets_out_of_range_are_rejected(client, db, offset):
+    headers = auth_headers()
+    habit_id = await _habit(client, headers)
+    today = date.today().isoformat()
+    item = {"habit_id": habit_id, "date": today, "client_tz_offset_minutes": offset}
+
+    response = await client.post("/api/completions", json=item, headers=headers)
+    assert response.status_code == 422
+
+    # Nothing from the batch is written, the good items included
+    good = {"habit_id": habit_id, "date": today}
+    response = await client.post("/api/completions/batch", json={"items": [good, item, good]}, headers=headers)
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "items", 1, "client_tz_offset_minutes"]
+    assert db.execute(text("SELECT count(*) FROM habit_completions")).scalar() == 0
+
+    response = await client.post(
+        "/api/habits", json={"name": "Swim", "weekly_target": 1, "client_tz_offset_minutes": offset}, headers=headers,
+    )
+    assert response.status_code == 422
+
+
+_WEEK_COUNTS_SQL = text("""
+SELECT w.habit_id::text, w.week_start, w.count, (
+    SELECT count(*) FROM habit_completions c
+    WHERE c.habit_id = w.habit_id AND date_trunc('week', c.date)::date = w.week_start
+) AS actual
+FROM habit_week_counts w
+WHERE w.count > 0
+ORDER BY w.habit_id, w.week_start
+""")
+
+
+@pytest.fixture
+def completion_inserts():
+    """INSERT statements into habit_completions issued by the app"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT INTO HABIT_COMPLETIONS"):
+            statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+
+async def test_batch_reports_each_item(client, db, completion_inserts):
+    headers = auth_headers()
+    # The day the future-date guard compares against
+    today = get_client_today(None, 0)
+    capped = await _habit(client, headers, weekly_target=2)
+    response = await client.post(
+        "/api/habits", json={"name": "Journal", "weekly_target": 3, "requires_text_on_completion": True}, headers=headers,
+    )
+    journal = response.json()["id"]
+    deleted = await _habit(client, headers)
+    await client.delete(f"/api/habits/{deleted}", headers=headers)
+    foreign = await _habit(client, auth_headers("someone-else"))
+
+    items = [
+        (capped, today, None, {"remaining": 1}),
+        (capped, today, None, {"remaining": 0}),
+        (capped, today, None, {"errorCode": "WEEKLY_TARGET_ALREADY_MET"}),
+        (journal, today, None, {"errorCode": "TEXT_REQUIRED"}),
+        (journal, today, "  read  ", {"remaining": 2}),
+        (journal.upper(), today, "more", {"remaining": 1}),
+        (deleted, today, None, {"errorCode": "HABIT_DELETED"}),
+        (foreign, today, None, {"errorCode": "HABIT_NOT_FOUND"}),
+        (str(uuid.uuid4()), today, None, {"errorCode": "HABIT_NOT_FOUND"}),
+        ("not-a-uuid", today, None, {"errorCode": "HABIT_NOT_FOUND"}),
+        (capped, today + timedelta(days=2), None, {"errorCode": "INVALID_DATE"}),
+        (capped, "2024-13-01", None, {"errorCode": "INVALID_DATE"}),
+        (capped, today - timedelta(weeks=2), None, {"errorCode": "HABIT_NOT_ACTIVE_FOR_WEEK"}),
+    ]
+    payload = [
+        {"habit_id": habit_id, "date": str(day), "text": note, "client_tz_offset_minutes": 0}
+        for habit_id, day, note, _ in items
+    ]
+    completion_inserts.clear()
+
+    response = await client.post("/api/completions/batch", json={"items": payload}, headers=headers)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["created"] == 4
+    for (_, _, _, expected), result in zip(items, body["results"]):
+        assert {key: result[key] for key in expected} == expected, result
+        assert (result["id"] is not None) == ("remaining" in expected), result
+    assert [result["index"] for result in body["results"]] == list(range(len(items)))
+    assert len(completion_inserts) == 1
+
+    week = today - timedelta(days=today.weekday())
+    assert db.execute(_WEEK_COUNTS_SQL).all() == sorted([(capped, week, 2, 2), (journal, week, 2, 2)])
+    stored = db.execute(text("SELECT text FROM habit_completions WHERE habit_id = :id ORDER BY text"), {"id": journal})
+    assert stored.scalars().all() == ["more", "read"]
+
+
+async def test_batch_counts_on_from_earlier_completions(client, db):
+    headers = auth_headers()
+    today = get_client_today()
+    habit_id = await _habit(client, headers, weekly_target=3)
+    db.execute(
+        text("UPDATE habit_versions SET effective_week_start = effective_week_start - 7 WHERE habit_id = :id"),
+        {"id": habit_id},
+    )
+    db.commit()
+    last_week = today - timedelta(weeks=1)
+    await client.post("/api/completions", json={"habit_id": habit_id, "date": str(today)}, headers=headers)
+    await client.post("/api/completions", json={"habit_id": habit_id, "date": str(last_week)}, headers=headers)
+
+    items = [{"habit_id": habit_id, "date": str(day)} for day in (today, last_week, today, last_week, today, last_week)]
+    response = await client.post("/api/completions/batch", json={"items": items}, headers=headers)
+
+    results = response.json()["results"]
+    assert [result["remaining"] for result in results] == [1, 1, 0, 0, None, None]
+    assert [result["errorCode"] for result in results[4:]] == ["WEEKLY_TARGET_ALREADY_MET"] * 2
+    assert [row.count for row in db.execute(_WEEK_COUNTS_SQL)] == [3, 3]
+    assert all(row.count == row.actual for row in db.execute(_WEEK_COUNTS_SQL))
@@ -0,0 +1,125 @@
+from datetime import date, timedelta
+
+import pytest
+
+from tests.conftest import auth_headers
+
+
+async def _seed(client, headers) -> dict:
+    """A goal with a linked habit and a completion, plus a spare habit and goal to write to"""
+    year = date.today().year
+    goal_id = (await client.post("/api/goals", json={"title": "Fit", "year": year}, headers=headers)).json()["id"]
+    spare_goal_id = (await client.post("/api/goals", json={"title": "Calm", "year": year}, headers=headers)).json()["id"]
+    habit_id = (await client.post(
+        "/api/habits", json={"name": "Run", "weekly_target": 5, "linked_goal_id": goal_id}, headers=headers,
+    )).json()["id"]
+    spare_id = (await client.post("/api/habits", json={"name": "Read", "weekly_target": 2}, headers=headers)).json()["id"]
+    completion_id = (await client.post(
+        "/api/completions", json={"habit_id": habit_id, "date": date.today().isoformat()}, headers=headers,
+    )).json()["id"]
+    return {
+        "goal_id": goal_id, "spare_goal_id": spare_goal_id, "habit_id": habit_id,
+        "spare_id": spare_id, "completion_id": completion_id,
+    }
+
+
+def _urls(seeded: dict) -> dict[str, set[str]]:
+    """Conditional GETs and the change counters their check_not_modified call lists"""
+    today = date.today()
+    start = (today - timedelta(days=28)).isoformat()
+    return {
+        "/api/habits": {"habits"},
+        "/api/habits?include_streaks=true": {"habits", "completions"},
+        f"/api/habits/active-versions?start={start}&end={today}": {"habits"},
+        "/api/habits/heatmap": {"habits", "completions"},
+        "/api/goals": {"goals"},
+        "/api/goals?include_progress=true": {"goals", "habits", "completions"},
+        f"/api/goals/{seeded['goal_id']}/progress": {"goals", "habits", "completions"},
+        f"/api/completions?start={start}&end={today}": {"completions"},
+        f"/api/completions/habits/{seeded['habit_id']}/completions": {"habits", "completions"},
+        f"/api/progress/weekly?start={start}&end={today}": {"habits", "completions"},
+        "/api/today": {"habits", "goals", "completions"},
+    }
+
+
+# name -> (write, the counter it bumps)
+WRITES = {
+    "create completion": (
+        lambda s: ("POST", "/api/completions", {"habit_id": s["spare_id"], "date": date.today().isoformat()}),
+        "completions",
+    ),
+    "batch completions": (
+        lambda s: ("POST", "/api/completions/batch", {"items": [
+            {"habit_id": s["spare_id"], "date": date.today().isoformat()},
+        ]}),
+        "completions",
+    ),
+    "delete completion": (lambda s: ("DELETE", f"/api/completions/{s['completion_id']}", None), "completions"),
+    "create habit": (lambda s: ("POST", "/api/habits", {"name": "Swim", "weekly_target": 1}), "habits"),
+    "update habit": (
+        lambda s: ("PUT", f"/api/habits/{s['spare_id']}", {"name": "Read more", "weekly_target": 3}),
+        "habits",
+    ),
+    "reorder habits": (
+        lambda s: ("PATCH", "/api/habits/order", {"habit_ids": [s["spare_id"], s["habit_id"]]}),
+        "habits",
+    ),
+    "delete habit": (lambda s: ("DELETE", f"/api/habits/{s['spare_id']}", None), "habits"),
+    "create goal": (lambda s: ("POST", "/api/goals", {"title": "Rest", "year": date.today().year}), "goals"),
+    "update goal": (
+        lambda s: ("PUT", f"/api/goals/{s['spare_goal_id']}", {"title": "Calmer", "year": date.today().year}),
+        "goals",
+    ),
+    "delete goal": (lambda s: ("DELETE", f"/api/goals/{s['spare_goal_id']}", None), "goals"),
+}
+
+
+async def test_current_etag_gets_an_empty_304(client):
+    headers = auth_headers()
+    seeded = await _seed(client, headers)
+
+    for url in _urls(seeded):
+        response = await client.get(url, headers=headers)
+        assert response.status_code == 200, url
+        etag = response.headers["etag"]
+        assert etag.startswith('W/"'), url
+        assert response.headers["cache-control"] == "private, no-cache"
+
+        for if_none_match in (etag, etag.removeprefix("W/"), f'"stale", {etag}', "*"):
+            revalidated = await client.get(url, headers={**headers, "If-None-Match": if_none_match})
+            assert revalidated.status_code == 304, (url, if_none_match)
+            assert revalidated.content == b""
+            assert revalidated.headers["etag"] == etag
+
+        response = await client.get(url, headers={**headers, "If-None-Match": 'W/"stale"'})
+        assert response.status_code == 200, url
+        assert response.content
+
+
+async def test_etags_are_per_user(client):
+    alice, bob = auth_headers("alice"), auth_headers("bob")
+    etag = (await client.get("/api/habits", headers=alice)).headers["etag"]
+
+    response = await client.get("/api/habits", headers={**bob, "If-None-Match": etag})
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("write", WRITES)
+async def test_write_changes_the_etag_of_endpoints_listing_its_counter(client, write):
+    headers = auth_headers()
+    seeded = await _seed(client, headers)
+    urls = _urls(seeded)
+    before = {url: (await client.get(url, headers=headers)).headers["etag"] for url in urls}
+
+    build, bumped = WRITES[write]
+    method, path, body = build(seeded)
+    response = await client.request(method, path, json=body, headers=headers)
+    assert response.status_code in (200, 201), response.text
+
+    for url, scopes in urls.items():
+        response = await client.get(url, headers={**headers, "If-None-Match": before[url]})
+        if bumped in scopes:
+            assert response.status_code == 200, url
+            assert response.headers["etag"] != before[url], url
+        else:
+            assert response.status_code == 304, url
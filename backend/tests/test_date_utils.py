@@ -0,0 +1,35 @@
+from datetime import date
+
+import pytest
+
+from app.utils.date_utils import MAX_RANGE_WEEKS, count_week_starts, iter_week_starts
+from tests.conftest import auth_headers
+
+
+def test_iter_week_starts_covers_partial_weeks():
+    assert iter_week_starts(date(2024, 1, 3), date(2024, 1, 15)) == [
+        date(2024, 1, 1), date(2024, 1, 8), date(2024, 1, 15),
+    ]
+    assert count_week_starts(date(2024, 1, 3), date(2024, 1, 15)) == 3
+
+
+def test_iter_week_starts_stops_at_the_last_week_before_date_max():
+    assert iter_week_starts(date(9999, 12, 20), date.max) == [date(9999, 12, 20), date(9999, 12, 27)]
+
+
+def test_count_week_starts_does_not_expand_the_range():
+    assert count_week_starts(date.min, date(9999, 12, 1)) == 521719
+    assert count_week_starts(date(2024, 2, 1), date(2024, 1, 1)) == 0
+
+
+@pytest.mark.parametrize("path", ["/api/habits/active-versions", "/api/progress/weekly"])
+async def test_week_range_endpoints_at_the_calendar_edges(client, path):
+    headers = auth_headers()
+    await client.post("/api/habits", json={"name": "Run", "weekly_target": 2}, headers=headers)
+
+    response = await client.get(f"{path}?start=9999-12-01&end=9999-12-31", headers=headers)
+    assert response.status_code == 200
+
+    response = await client.get(f"{path}?start=0001-01-01&end=9999-12-01", headers=headers)
+    assert response.status_code == 400
+    assert str(MAX_RANGE_WEEKS) in response.text
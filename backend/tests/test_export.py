@@ -0,0 +1,32 @@
+import pytest
+
+from app.utils.cursors import encode_cursor
+from tests.conftest import auth_headers
+
+
+@pytest.mark.parametrize("position", [
+    {"resource": "goals", "after": 5},
+    {"resource": "goals", "after": None},
+    {"resource": ["goals"], "after": "00000000-0000-0000-0000-000000000000"},
+    {"resource": "goals", "after": "not-a-uuid"},
+    {"resource": "goals"},
+])
+async def test_export_rejects_malformed_cursors(client, position):
+    response = await client.get(f"/api/export?cursor={encode_cursor(position)}", headers=auth_headers())
+    assert response.status_code == 400
+    assert "Invalid cursor" in response.text
+
+
+async def test_export_resumes_after_cursor(client):
+    headers = auth_headers()
+    ids = [
+        (await client.post("/api/goals", json={"title": f"Goal {n}", "year": 2024}, headers=headers)).json()["id"]
+        for n in range(3)
+    ]
+    first = sorted(ids)[0]
+
+    cursor = encode_cursor({"resource": "goals", "after": first})
+    response = await client.get(f"/api/export?resource=goals&cursor={cursor}", headers=headers)
+    assert response.status_code == 200
+    assert first not in response.text
+    assert all(goal_id in response.text for goal_id in sorted(ids)[1:])
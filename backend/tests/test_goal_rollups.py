@@ -0,0 +1,49 @@
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from app.services.goal_rollup_service import _REFRESH_SQL
+from app.utils.date_utils import get_week_start
+from tests.conftest import auth_headers
+
+_ROLLUPS_SQL = text("""
+SELECT goal_id, week_start, target, achieved
+FROM goal_week_rollups
+ORDER BY goal_id, week_start
+""")
+
+
+async def test_roll_forward_matches_full_recompute(client, db):
+    headers = auth_headers()
+    today = date.today()
+    habit_ids = []
+    for weeks_back in (3, 7):
+        response = await client.post("/api/goals", json={"title": f"Goal {weeks_back}", "year": today.year}, headers=headers)
+        goal_id = response.json()["id"]
+        response = await client.post(
+            "/api/habits", json={"name": f"Habit {weeks_back}", "weekly_target": 2, "linked_goal_id": goal_id},
+            headers=headers,
+        )
+        habit_ids.append(response.json()["id"])
+        # Linked since an earlier week, with no rollup rows for the weeks between
+        db.execute(
+            text("UPDATE habit_versions SET effective_week_start = effective_week_start - :days WHERE habit_id = :id"),
+            {"days": 7 * weeks_back, "id": habit_ids[-1]},
+        )
+    db.commit()
+
+    for habit_id in habit_ids:
+        for days_back in (0, 8, 9, 15):
+            day = max(today - timedelta(days=days_back), get_week_start(today) - timedelta(weeks=3))
+            await client.post("/api/completions", json={"habit_id": habit_id, "date": day.isoformat()}, headers=headers)
+
+    response = await client.get("/api/goals?include_progress=true", headers=headers)
+    assert response.status_code == 200
+
+    rolled = db.execute(_ROLLUPS_SQL).all()
+    db.execute(_REFRESH_SQL, {"user_id": None, "goal_ids": None, "from_week": None, "to_week": get_week_start(today)})
+    recomputed = db.execute(_ROLLUPS_SQL).all()
+    db.rollback()
+    assert rolled == recomputed
+    # Every week since each goal's first link is materialized
+    assert len(rolled) == (3 + 1) + (7 + 1)
@@ -0,0 +1,42 @@
+from tests.conftest import auth_headers
+
+
+async def _habits(client, headers, count: int) -> list[str]:
+    return [
+        (await client.post("/api/habits", json={"name": f"Habit {n}", "weekly_target": 1}, headers=headers)).json()["id"]
+        for n in range(count)
+    ]
+
+
+async def test_reorder_sets_order_index_from_position(client):
+    headers = auth_headers()
+    first, second, third = await _habits(client, headers, 3)
+
+    response = await client.patch(
+        "/api/habits/order", json={"habit_ids": [third, first.upper(), second]}, headers=headers
+    )
+    assert response.status_code == 200
+
+    habits = (await client.get("/api/habits", headers=headers)).json()
+    assert [habit["id"] for habit in sorted(habits, key=lambda habit: habit["order_index"])] == [third, first, second]
+
+
+async def test_reorder_rejects_the_same_id_in_two_spellings(client):
+    headers = auth_headers()
+    first, second = await _habits(client, headers, 2)
+
+    response = await client.patch(
+        "/api/habits/order", json={"habit_ids": [first, first.upper(), second]}, headers=headers
+    )
+    assert response.status_code == 400
+    assert "duplicates" in response.text
+
+
+async def test_reorder_of_unknown_or_malformed_ids_is_not_found(client):
+    headers = auth_headers()
+    first, = await _habits(client, headers, 1)
+    other = (await _habits(client, auth_headers("user-2"), 1))[0]
+
+    for habit_ids in ([first, other], [first, "not-a-uuid"]):
+        response = await client.patch("/api/habits/order", json={"habit_ids": habit_ids}, headers=headers)
+        assert response.status_code == 404
@@ -0,0 +1,155 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+
+from app.core.database import AsyncSessionLocal
+from app.services.habit_service import (
+    compact_habit_versions,
+    get_active_version_async,
+    resolve_version_targets_async,
+    version_values,
+)
+from app.utils.date_utils import get_week_start
+from tests.conftest import auth_headers
+
+THIS_WEEK = get_week_start(date.today())
+WEEKS = [THIS_WEEK + timedelta(weeks=n) for n in range(-12, 2)]
+
+_INSERT_VERSION_SQL = text("""
+INSERT INTO habit_versions (
+    id, habit_id, effective_week_start, weekly_target, requires_text_on_completion,
+    linked_goal_id, description, created_at, updated_at
+)
+VALUES (gen_random_uuid(), :habit_id, :week, :target, :requires_text, :goal_id, :description, :created_at, :created_at)
+""")
+
+
+async def _resolve(habit_ids: list[str]) -> dict:
+    """What every week in WEEKS resolves to, through both resolvers"""
+    pairs = [(habit_id, week) for habit_id in habit_ids for week in WEEKS]
+    async with AsyncSessionLocal() as session:
+        targets = await resolve_version_targets_async(session, pairs)
+        return {
+            pair: (targets.get(pair), version_values(await get_active_version_async(session, *pair)))
+            for pair in pairs
+        }
+
+
+def _settings(target: int) -> tuple:
+    """Resolution of a version with only a target set"""
+    return (target, False, None), {
+        "weekly_target": target, "requires_text_on_completion": False, "linked_goal_id": None, "description": None,
+    }
+
+
+async def _habit(client, headers, **fields) -> str:
+    body = {"name": "Run", "weekly_target": 3, **fields}
+    return (await client.post("/api/habits", json=body, headers=headers)).json()["id"]
+
+
+async def _goal(client, headers) -> str:
+    return (await client.post("/api/goals", json={"title": "Fit", "year": THIS_WEEK.year}, headers=headers)).json()["id"]
+
+
+def _history(db, habit_id: str, versions: list[tuple]) -> None:
+    """Replace a habit's versions with (weeks back, target, goal, description), created in list order"""
+    db.execute(text("DELETE FROM habit_versions WHERE habit_id = :id"), {"id": habit_id})
+    created = datetime(2024, 1, 1)
+    for weeks_back, target, goal_id, description in versions:
+        created += timedelta(minutes=1)
+        db.execute(_INSERT_VERSION_SQL, {
+            "habit_id": habit_id, "week": THIS_WEEK - timedelta(weeks=weeks_back), "target": target,
+            "requires_text": False, "goal_id": goal_id, "description": description, "created_at": created,
+        })
+    db.commit()
+
+
+def _version_count(db, habit_id: str) -> int:
+    return db.execute(text("SELECT count(*) FROM habit_versions WHERE habit_id = :id"), {"id": habit_id}).scalar()
+
+
+async def test_compaction_keeps_what_every_week_resolves_to(client, db):
+    headers, other = auth_headers(), auth_headers("someone-else")
+    goal_id = await _goal(client, headers)
+    busy, plain, foreign = await _habit(client, headers), await _habit(client, headers), await _habit(client, other)
+    _history(db, busy, [
+        (10, 3, None, None),
+        (10, 4, None, None),            # same week, newer: shadows the first
+        (8, 4, None, None),             # repeats the settings before it
+        (6, 4, None, "harder"),         # a change...
+        (5, 4, None, None),             # ...reverted the week after
+        (5, 4, None, None),
+        (3, 2, goal_id, None),
+        (2, 2, goal_id, None),
+        (0, 5, goal_id, None),
+        (0, 2, goal_id, None),          # newer than the 5, back to the settings before
+    ])
+    _history(db, foreign, [(4, 1, None, None), (4, 1, None, None), (1, 1, None, None)])
+    habit_ids = [busy, plain, foreign]
+    before = await _resolve(habit_ids)
+
+    removed = compact_habit_versions(db)
+
+    assert removed == 6 + 2
+    assert await _resolve(habit_ids) == before
+    assert [_version_count(db, habit_id) for habit_id in habit_ids] == [4, 1, 1]
+    # Nothing redundant is left
+    assert compact_habit_versions(db) == 0
+
+
+async def test_compaction_can_be_limited_to_one_user(client, db):
+    mine, theirs = await _habit(client, auth_headers()), await _habit(client, auth_headers("someone-else"))
+    for habit_id in (mine, theirs):
+        _history(db, habit_id, [(2, 3, None, None), (1, 3, None, None)])
+    user_id = db.execute(text("SELECT user_id::text FROM habits WHERE id = :id"), {"id": mine}).scalar()
+
+    assert compact_habit_versions(db, user_id) == 1
+    assert [_version_count(db, habit_id) for habit_id in (mine, theirs)] == [1, 2]
+
+
+async def test_second_edit_in_a_week_updates_this_weeks_version(client, db):
+    headers = auth_headers()
+    habit_id = await _habit(client, headers)
+    _history(db, habit_id, [(3, 3, None, None), (0, 4, None, None)])
+    before = await _resolve([habit_id])
+
+    response = await client.put(f"/api/habits/{habit_id}", json={"name": "Run", "weekly_target": 6}, headers=headers)
+
+    assert response.status_code == 200
+    assert _version_count(db, habit_id) == 2
+    after = await _resolve([habit_id])
+    assert after == {
+        (habit_id, week): before[(habit_id, week)] if week < THIS_WEEK else _settings(6) for week in WEEKS
+    }
+
+
+async def test_edit_restoring_last_weeks_settings_removes_all_of_this_weeks_versions(client, db):
+    headers = auth_headers()
+    habit_id = await _habit(client, headers)
+    # Two versions this week, as habits edited before same-week edits collapsed have
+    _history(db, habit_id, [(3, 3, None, None), (0, 4, None, None), (0, 6, None, None)])
+    before = await _resolve([habit_id])
+
+    response = await client.put(f"/api/habits/{habit_id}", json={"name": "Run", "weekly_target": 3}, headers=headers)
+
+    assert response.status_code == 200
+    assert _version_count(db, habit_id) == 1
+    last_week = before[(habit_id, THIS_WEEK - timedelta(weeks=1))]
+    after = await _resolve([habit_id])
+    assert after == {(habit_id, week): before[(habit_id, week)] if week < THIS_WEEK else last_week for week in WEEKS}
+
+
+async def test_respelled_goal_id_is_not_a_change(client, db):
+    headers = auth_headers()
+    goal_id = await _goal(client, headers)
+    habit_id = await _habit(client, headers, linked_goal_id=goal_id)
+    _history(db, habit_id, [(3, 3, goal_id, None)])
+
+    for spelling in (goal_id.upper(), goal_id.replace("-", "")):
+        response = await client.put(
+            f"/api/habits/{habit_id}",
+            json={"name": "Run", "weekly_target": 3, "linked_goal_id": spelling},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        assert _version_count(db, habit_id) == 1
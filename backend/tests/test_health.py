@@ -0,0 +1,31 @@
+import httpx
+import pytest
+
+from app.core.config import settings
+from main import app
+
+
+@pytest.fixture
+async def http():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def test_health_is_public(http):
+    response = await http.get("/api/health")
+    assert response.json() == {"status": "ok"}
+
+
+@pytest.mark.parametrize("path", ["/api/health/db-pool", "/api/health/cache"])
+async def test_health_details_need_admin_token(http, monkeypatch, path):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "admin-secret")
+
+    assert (await http.get(path)).status_code == 403
+    assert (await http.get(path, headers={"X-Admin-Token": "wrong"})).status_code == 403
+    assert (await http.get(path, headers={"X-Admin-Token": "admin-secret"})).status_code == 200
+
+
+async def test_health_details_disabled_without_admin_token(http, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "")
+    response = await http.get("/api/health/cache", headers={"X-Admin-Token": ""})
+    assert response.status_code == 403
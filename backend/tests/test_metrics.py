@@ -0,0 +1,63 @@
+import re
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.core.metrics import CONTENT_TYPE
+from main import app
+
+ADMIN = {"Authorization": "Bearer admin-secret"}
+
+
+@pytest.fixture
+async def http(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "admin-secret")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+def _sample(body: str, name: str, labels: str) -> float:
+    """Value of one sample, 0 if it is not exposed yet"""
+    match = re.search(rf"^{name}\{{{re.escape(labels)}\}} (\S+)$", body, re.MULTILINE)
+    return float(match.group(1)) if match else 0
+
+
+async def test_metrics_need_admin_token(http):
+    assert (await http.get("/metrics")).status_code == 403
+    assert (await http.get("/metrics", headers={"Authorization": "Bearer wrong"})).status_code == 403
+    assert (await http.get("/metrics", headers=ADMIN)).status_code == 200
+    assert (await http.get("/metrics", headers={"X-Admin-Token": "admin-secret"})).status_code == 200
+
+
+async def test_metrics_disabled_without_admin_token(http, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "")
+    assert (await http.get("/metrics", headers={"Authorization": "Bearer "})).status_code == 403
+
+
+async def test_exposition_counts_requests_by_route_template(http):
+    before = (await http.get("/metrics", headers=ADMIN)).text
+    await http.get("/api/health")
+    await http.get("/api/health")
+
+    response = await http.get("/metrics", headers=ADMIN)
+
+    assert response.headers["content-type"] == CONTENT_TYPE
+    body = response.text
+    assert "# TYPE http_requests_total counter" in body
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert "# TYPE db_pool_checkout_timeouts_total counter" in body
+    labels = 'method="GET",route="/api/health",status="200"'
+    assert _sample(body, "http_requests_total", labels) == _sample(before, "http_requests_total", labels) + 2
+
+
+async def test_unmatched_paths_share_one_route_label(http):
+    labels = 'method="GET",route="unmatched",status="404"'
+    before = _sample((await http.get("/metrics", headers=ADMIN)).text, "http_requests_total", labels)
+    for path in ("/wp-login.php", "/api/nope/12345"):
+        assert (await http.get(path)).status_code == 404
+
+    body = (await http.get("/metrics", headers=ADMIN)).text
+
+    assert _sample(body, "http_requests_total", labels) == before + 2
+    assert "wp-login" not in body and "12345" not in body
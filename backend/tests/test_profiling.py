@@ -0,0 +1,65 @@
+import httpx
+import pytest
+
+from app.core.profiling import (
+    PROFILE_FILE_HEADER,
+    PROFILE_HEADER,
+    ProfileRateLimiter,
+    ProfilingMiddleware,
+    sign_profile_token,
+    verify_profile_token,
+)
+
+SECRET = "profile-secret"
+
+
+def test_signed_token_verifies_until_it_expires():
+    token = sign_profile_token(SECRET, ttl_seconds=60, now=1000)
+    assert verify_profile_token(token, SECRET, now=1059)
+    assert not verify_profile_token(token, SECRET, now=1060)
+    assert not verify_profile_token(token, "other-secret", now=1000)
+    assert not verify_profile_token(token, "", now=1000)
+
+
+def test_token_ttl_is_capped():
+    token = sign_profile_token(SECRET, ttl_seconds=10**9, now=0)
+    assert int(token.partition(".")[0]) == 24 * 3600
+
+
+@pytest.mark.parametrize("token", [
+    "", ".", "abc", "12.", "-5.x", "²." + "0" * 64, "١٢٣.x", "9" * 5000 + ".x", "1e9.x",
+])
+def test_malformed_tokens_are_rejected_without_raising(token):
+    assert not verify_profile_token(token, SECRET, now=0)
+
+
+def test_rate_limiter_allows_one_profile_at_a_time():
+    limiter = ProfileRateLimiter(per_minute=2)
+    assert limiter.acquire()
+    assert not limiter.acquire()
+    limiter.release()
+    assert limiter.acquire()
+    limiter.release()
+    # Two starts used up this minute
+    assert not limiter.acquire()
+    assert limiter.rejected == 2
+
+
+async def _ok(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def test_middleware_profiles_only_valid_tokens(tmp_path):
+    pytest.importorskip("pyinstrument")
+    middleware = ProfilingMiddleware(_ok, directory=str(tmp_path), secret=SECRET)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=middleware), base_url="http://test") as client:
+        # Starlette decodes headers as latin-1, so "²" reaches the token check
+        response = await client.get("/", headers={PROFILE_HEADER: "².x".encode("latin-1")})
+        assert response.status_code == 200
+        assert PROFILE_FILE_HEADER not in response.headers
+
+        response = await client.get("/", headers={PROFILE_HEADER: sign_profile_token(SECRET, 60)})
+        assert response.status_code == 200
+        assert (tmp_path / response.headers[PROFILE_FILE_HEADER]).exists()
@@ -0,0 +1,174 @@
+import re
+from datetime import date, timedelta
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import cache
+from app.core.cache import NullCacheBackend
+from app.core.database import SessionLocal, get_async_db
+from app.core.identity_cache import identity_cache, token_cache
+from app.core.query_stats import (
+    LazyLoadError,
+    QueryBudgetExceeded,
+    QueryStatsMiddleware,
+    query_budget,
+    track_queries,
+)
+from app.models import Habit
+from app.services import completion_week_cache
+from tests.conftest import auth_headers
+
+_QUERY_COUNT = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+async def _seed(client, db, headers) -> dict:
+    """
+    Worst case for the budgeted reads: goals linked in different past weeks
+    with no rollups since, habits with backdated versions and a version
+    change, and completions in past weeks and today
+    """
+    today = date.today()
+    goal_ids, habit_ids = [], []
+    for weeks_back in (2, 5, 9):
+        goal_id = (await client.post(
+            "/api/goals", json={"title": f"Goal {weeks_back}", "year": today.year}, headers=headers,
+        )).json()["id"]
+        habit_id = (await client.post(
+            "/api/habits", json={"name": f"Habit {weeks_back}", "weekly_target": 3, "linked_goal_id": goal_id},
+            headers=headers,
+        )).json()["id"]
+        goal_ids.append(goal_id)
+        habit_ids.append(habit_id)
+        db.execute(
+            text("UPDATE habit_versions SET effective_week_start = effective_week_start - :days WHERE habit_id = :id"),
+            {"days": 7 * weeks_back, "id": habit_id},
+        )
+    db.commit()
+    response = await client.put(
+        f"/api/habits/{habit_ids[0]}",
+        json={"name": "Habit 2", "weekly_target": 5, "linked_goal_id": goal_ids[0]},
+        headers=headers,
+    )
+    assert response.status_code == 200
+
+    for habit_id in habit_ids:
+        for days_back in (0, 1, 10, 17):
+            day = max(today - timedelta(days=days_back), date(today.year, 1, 1))
+            await client.post("/api/completions", json={"habit_id": habit_id, "date": day.isoformat()}, headers=headers)
+
+    return {"goal_ids": goal_ids, "habit_ids": habit_ids}
+
+
+def _go_stale(db) -> None:
+    """Keep rollups only up to the week before last, as if the app sat idle since"""
+    today = date.today()
+    db.execute(text("DELETE FROM goal_week_rollups WHERE week_start >= :week"), {
+        "week": today - timedelta(days=today.weekday() + 7),
+    })
+    db.commit()
+    # Resolved identities too, the first request of a session is the costliest
+    token_cache.clear()
+    identity_cache.clear()
+
+
+def _urls(seeded: dict) -> list[str]:
+    today = date.today()
+    start = (today - timedelta(days=70)).isoformat()
+    return [
+        "/api/habits",
+        "/api/habits?include_streaks=true",
+        f"/api/habits/active-versions?start={start}&end={today.isoformat()}",
+        f"/api/habits/heatmap?year={today.year}",
+        "/api/goals",
+        "/api/goals?include_progress=true",
+        f"/api/goals/{seeded['goal_ids'][-1]}/progress?year={today.year}",
+        f"/api/completions?start={start}&end={today.isoformat()}",
+        f"/api/completions?start={start}&end={today.isoformat()}&limit=2",
+        f"/api/completions/habits/{seeded['habit_ids'][-1]}/completions",
+        f"/api/completions/habits/{seeded['habit_ids'][-1]}/completions?limit=2",
+        "/api/today",
+        f"/api/progress/weekly?start={start}&end={today.isoformat()}",
+    ]
+
+
+async def test_budgeted_reads_stay_within_budget_with_cold_caches(client, db, monkeypatch):
+    headers = auth_headers()
+    seeded = await _seed(client, db, headers)
+    monkeypatch.setattr(cache, "response_cache", NullCacheBackend())
+    monkeypatch.setattr(completion_week_cache, "week_cache", NullCacheBackend())
+
+    for url in _urls(seeded):
+        # Strict mode fails the request itself if it goes over
+        _go_stale(db)
+        response = await client.get(url, headers=headers)
+        assert response.status_code == 200, url
+        assert _QUERY_COUNT.search(response.headers["server-timing"]), url
+
+        # The next page, where there is one
+        cursor = response.headers.get("x-next-cursor")
+        if cursor:
+            _go_stale(db)
+            response = await client.get(f"{url}&cursor={cursor}", headers=headers)
+            assert response.status_code == 200, url
+
+
+async def test_rolling_goals_forward_does_not_grow_with_stale_goals(client, db, monkeypatch):
+    headers = auth_headers()
+    seeded = await _seed(client, db, headers)
+    monkeypatch.setattr(cache, "response_cache", NullCacheBackend())
+    await client.get("/api/goals", headers=headers)
+
+    counts = []
+    for goals in (seeded["goal_ids"][:1], seeded["goal_ids"]):
+        db.execute(text("DELETE FROM goal_week_rollups WHERE goal_id::text = ANY(:ids)"), {"ids": goals})
+        db.commit()
+        response = await client.get("/api/goals?include_progress=true", headers=headers)
+        counts.append(int(_QUERY_COUNT.search(response.headers["server-timing"]).group(1)))
+
+    assert counts[0] == counts[1]
+
+
+# The guards themselves
+
+
+def _strict_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/two", dependencies=[query_budget(1)])
+    async def two(db: AsyncSession = Depends(get_async_db)):
+        await db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 2"))
+        return {}
+
+    return QueryStatsMiddleware(app, strict=True)
+
+
+async def test_request_over_its_budget_fails(database):
+    transport = httpx.ASGITransport(app=_strict_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        with pytest.raises(QueryBudgetExceeded, match="2 queries issued, budget is 1"):
+            await http.get("/two")
+
+
+def test_track_queries_over_budget_raises(database):
+    with SessionLocal() as session:
+        with pytest.raises(QueryBudgetExceeded):
+            with track_queries(budget=1):
+                session.execute(text("SELECT 1"))
+                session.execute(text("SELECT 2"))
+
+
+async def test_lazy_load_in_strict_block_raises(client, db):
+    response = await client.post("/api/habits", json={"name": "Run", "weekly_target": 2}, headers=auth_headers())
+    habit_id = response.json()["id"]
+
+    with SessionLocal() as session:
+        habit = session.scalar(select(Habit).where(Habit.id == habit_id))
+        with track_queries() as stats:
+            with pytest.raises(LazyLoadError, match="Habit.versions"):
+                habit.versions
+        assert stats.lazy_loads == ["Habit.versions"]
@@ -0,0 +1,42 @@
+import pytest
+
+from app.core.slow_queries import SlowQueryLog, _explainable, normalize_sql
+from app.services.completion_service import _LOCK_WEEK_COUNTS_SQL
+from app.services.goal_rollup_service import _LOCK_SQL as _LOCK_ROLLUPS_SQL
+from app.services.streak_service import _LOCK_SQL as _LOCK_STREAKS_SQL
+
+
+def test_normalize_sql_collapses_values_and_lists():
+    assert normalize_sql(
+        "SELECT * FROM habits -- all\nWHERE id IN ($1::UUID, $2::UUID, $3::UUID) AND name = 'x' LIMIT 10"
+    ) == "SELECT * FROM habits WHERE id IN (...) AND name = ? LIMIT ?"
+    assert normalize_sql("SELECT :a::date, %(b)s, %s") == "SELECT ?::date, ?, ?"
+    assert normalize_sql("INSERT INTO t VALUES (1, 2), (3, 4)") == normalize_sql("INSERT INTO t VALUES (5, 6)")
+
+
+@pytest.mark.parametrize("statement", [
+    str(_LOCK_WEEK_COUNTS_SQL), str(_LOCK_ROLLUPS_SQL), str(_LOCK_STREAKS_SQL),
+    "SELECT 1 FROM t FOR UPDATE", "select 1 from t\nfor   no key update",
+    "SELECT 1 FROM t FOR SHARE SKIP LOCKED", "SELECT 1 FROM t\nFOR KEY SHARE",
+    "UPDATE t SET x = 1", "DELETE FROM t",
+])
+def test_locking_reads_and_writes_are_never_explained(statement):
+    assert not _explainable(statement)
+
+
+def test_plain_selects_are_explained():
+    assert _explainable("\n  SELECT id FROM habits WHERE user_id = $1")
+    assert _explainable("SELECT updated_for FROM t")
+
+
+def test_top_ranks_fingerprints():
+    log = SlowQueryLog(threshold_seconds=0.1, window=10)
+    for _ in range(3):
+        log.record("SELECT 1 FROM a WHERE id = 1", 0.01)
+    log.record("SELECT 1 FROM b WHERE id = 2", 0.5)
+
+    assert [item["calls"] for item in log.top(sort="calls")] == [3, 1]
+    assert log.top(sort="max")[0]["sql"] == "SELECT ? FROM b WHERE id = ?"
+    assert log.top(sort="slow")[0]["slow_calls"] == 1
+    with pytest.raises(ValueError):
+        log.top(sort="nope")
@@ -0,0 +1,126 @@
+import asyncio
+import random
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from app.services.streak_service import _RECOMPUTE_SQL
+from tests.conftest import auth_headers
+
+_STATE_SQL = text("""
+SELECT current_streak, best_streak, last_qualifying_week
+FROM habit_streaks
+WHERE habit_id = :habit_id
+""")
+
+
+def _state(db, habit_id: str) -> tuple:
+    # The row is created by the first change in qualification
+    row = db.execute(_STATE_SQL, {"habit_id": habit_id}).first()
+    return tuple(row) if row else (0, 0, None)
+
+
+def _incremental_and_recomputed(db, user_id: str, habit_id: str) -> tuple[tuple, tuple]:
+    """Stored streak state, and what a full recompute gives (rolled back)"""
+    incremental = _state(db, habit_id)
+    db.execute(_RECOMPUTE_SQL, {"user_id": user_id, "habit_ids": [habit_id]})
+    recomputed = _state(db, habit_id)
+    db.rollback()
+    return incremental, recomputed
+
+
+async def test_incremental_streaks_match_full_recompute(client, db):
+    headers = auth_headers()
+    response = await client.post("/api/habits", json={"name": "Run", "weekly_target": 2}, headers=headers)
+    habit_id = response.json()["id"]
+    # Let the first version cover ten weeks of history
+    db.execute(
+        text("UPDATE habit_versions SET effective_week_start = effective_week_start - 70 WHERE habit_id = :id"),
+        {"id": habit_id},
+    )
+    db.commit()
+    user_id = db.execute(text("SELECT user_id FROM habits WHERE id = :id"), {"id": habit_id}).scalar_one()
+
+    rng = random.Random(1)
+    today = date.today()
+    completion_ids: list[str] = []
+
+    def some_day() -> str:
+        return (today - timedelta(days=rng.randrange(70))).isoformat()
+
+    for step in range(120):
+        if completion_ids and rng.random() < 0.35:
+            completion_id = completion_ids.pop(rng.randrange(len(completion_ids)))
+            response = await client.delete(f"/api/completions/{completion_id}", headers=headers)
+            assert response.status_code == 200
+        elif rng.random() < 0.3:
+            items = [{"habit_id": habit_id, "date": some_day()} for _ in range(3)]
+            response = await client.post("/api/completions/batch", json={"items": items}, headers=headers)
+            assert response.status_code == 200
+            completion_ids += [item["id"] for item in response.json()["results"] if item.get("id")]
+        else:
+            response = await client.post(
+                "/api/completions", json={"habit_id": habit_id, "date": some_day()}, headers=headers
+            )
+            # 400: the week's target is already met
+            assert response.status_code in (201, 400)
+            if response.status_code == 201:
+                completion_ids.append(response.json()["id"])
+        if step == 60:
+            # A new target from this week on
+            response = await client.put(
+                f"/api/habits/{habit_id}", json={"name": "Run", "weekly_target": 1}, headers=headers
+            )
+            assert response.status_code == 200
+
+        incremental, recomputed = _incremental_and_recomputed(db, user_id, habit_id)
+        assert incremental == recomputed, f"step {step}"
+
+    assert recomputed[1] > 0
+
+
+
+async def test_concurrent_edit_and_tap_do_not_deadlock(client, db):
+    """An edit and a qualifying tap both lock the counter and streak rows"""
+    headers = auth_headers()
+    response = await client.post("/api/habits", json={"name": "Run", "weekly_target": 2}, headers=headers)
+    habit_id = response.json()["id"]
+    today = date.today().isoformat()
+
+    for target in (1, 2) * 10:
+        responses = await asyncio.gather(
+            client.put(f"/api/habits/{habit_id}", json={"name": "Run", "weekly_target": target}, headers=headers),
+            client.post("/api/completions", json={"habit_id": habit_id, "date": today}, headers=headers),
+        )
+        assert [response.status_code for response in responses] == [200, 201]
+        response = await client.delete(f"/api/completions/{responses[1].json()['id']}", headers=headers)
+        assert response.status_code == 200
+
+
+async def test_concurrent_taps_stop_at_the_weekly_target(client, db):
+    """Racing creates and batches queue on the week's counter row, so exactly target succeed"""
+    headers = auth_headers()
+    response = await client.post("/api/habits", json={"name": "Run", "weekly_target": 3}, headers=headers)
+    habit_id = response.json()["id"]
+    item = {"habit_id": habit_id, "date": date.today().isoformat()}
+
+    responses = await asyncio.gather(
+        *(client.post("/api/completions", json=item, headers=headers) for _ in range(10)),
+        *(client.post("/api/completions/batch", json={"items": [item] * 3}, headers=headers) for _ in range(2)),
+    )
+
+    singles, batches = responses[:10], [response.json() for response in responses[10:]]
+    accepted = sum(response.status_code == 201 for response in singles) + sum(batch["created"] for batch in batches)
+    assert accepted == 3
+    rejected = [response.json()["detail"] for response in singles if response.status_code != 201]
+    rejected += [result for batch in batches for result in batch["results"] if result["id"] is None]
+    assert len(rejected) == 10 + 6 - 3
+    assert {error["errorCode"] for error in rejected} == {"WEEKLY_TARGET_ALREADY_MET"}
+
+    counted, actual = db.execute(text("""
+        SELECT (SELECT count FROM habit_week_counts WHERE habit_id = :id),
+               (SELECT count(*) FROM habit_completions WHERE habit_id = :id)
+    """), {"id": habit_id}).one()
+    assert counted == actual == 3
+    # The week qualified exactly once
+    assert _state(db, habit_id)[:2] == (1, 1)
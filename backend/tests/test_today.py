@@ -0,0 +1,15 @@
+from tests.conftest import auth_headers
+
+
+async def test_today_accepts_real_utc_offsets(client):
+    headers = auth_headers()
+    for offset in (-720, 0, 330, 840):
+        response = await client.get(f"/api/today?tz_offset_minutes={offset}", headers=headers)
+        assert response.status_code == 200
+
+
+async def test_today_rejects_out_of_range_offsets(client):
+    headers = auth_headers()
+    for offset in (-841, 841, 1000000000000):
+        response = await client.get(f"/api/today?tz_offset_minutes={offset}", headers=headers)
+        assert response.status_code == 422
@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+from sqlalchemy import text
+
+from app.services.week_count_service import find_week_count_drift, rebuild_week_counts
+from app.utils.date_utils import get_client_today
+from manage import main as manage
+from tests.conftest import auth_headers
+
+
+async def _habit(client, headers, weekly_target: int) -> str:
+    response = await client.post("/api/habits", json={"name": "Run", "weekly_target": weekly_target}, headers=headers)
+    return response.json()["id"]
+
+
+async def test_every_write_path_keeps_counters_in_step(client, db):
+    headers = auth_headers()
+    today = get_client_today()
+    last_week = today - timedelta(weeks=1)
+    kept, dropped = await _habit(client, headers, 3), await _habit(client, headers, 2)
+    db.execute(text("UPDATE habit_versions SET effective_week_start = effective_week_start - 7"))
+    db.commit()
+
+    created = [
+        (await client.post("/api/completions", json={"habit_id": habit_id, "date": str(day)}, headers=headers)).json()
+        for habit_id, day in [(kept, today), (kept, last_week), (dropped, today), (dropped, last_week)]
+    ]
+    response = await client.post("/api/completions/batch", json={"items": [
+        {"habit_id": habit_id, "date": str(day)}
+        for habit_id in (kept, dropped) for day in (today, today, last_week, last_week)
+    ]}, headers=headers)
+    assert response.json()["created"] == 6
+    assert find_week_count_drift(db) == []
+
+    for completion in created[:2]:
+        assert (await client.delete(f"/api/completions/{completion['id']}", headers=headers)).status_code == 200
+    assert (await client.delete(f"/api/habits/{dropped}", headers=headers)).status_code == 200
+    # A deleted habit's completions can still be removed
+    assert (await client.delete(f"/api/completions/{created[2]['id']}", headers=headers)).status_code == 200
+
+    assert find_week_count_drift(db) == []
+    totals = db.execute(text("SELECT sum(count) FROM habit_week_counts")).scalar()
+    assert totals == db.execute(text("SELECT count(*) FROM habit_completions")).scalar() == 4 + 6 - 3
+
+
+async def test_check_reports_drift_and_rebuild_repairs_it(client, db, capsys):
+    headers = auth_headers()
+    habit_id = await _habit(client, headers, 3)
+    for _ in range(2):
+        await client.post("/api/completions", json={"habit_id": habit_id, "date": str(get_client_today())}, headers=headers)
+    db.execute(text("UPDATE habit_week_counts SET count = 7"))
+    db.execute(text("""
+        INSERT INTO habit_week_counts (user_id, habit_id, week_start, count)
+        SELECT user_id, habit_id, week_start - 7, 1 FROM habit_week_counts
+    """))
+    db.commit()
+
+    drift = find_week_count_drift(db)
+    assert sorted((row["stored"], row["actual"]) for row in drift) == [(1, 0), (7, 2)]
+    assert manage(["week-counts", "check"]) == 1
+    assert "2 inconsistent habit-week counter(s)" in capsys.readouterr().out
+
+    assert rebuild_week_counts(db) == 1
+    assert find_week_count_drift(db) == []
+    assert manage(["week-counts", "check"]) == 0
+
+
+def test_completion_listings_have_keyset_indexes(db):
+    """Migration 006 swaps the (user_id, date) and (habit_id, date) indexes for COMPLETION_ORDER ones"""
+    indexes = dict(db.execute(text(
+        "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = 'habit_completions'"
+    )).all())
+
+    assert "idx_completions_user_date" not in indexes
+    assert "idx_completions_habit_date" not in indexes
+    for name, leading in (("idx_completions_user_keyset", "user_id"), ("idx_completions_habit_keyset", "habit_id")):
+        assert indexes[name].endswith(f"({leading}, date DESC, created_at DESC, id DESC)")
+